@@ -1,29 +1,39 @@
 import os
-import httpx
+import json
+import base64
+import bisect
+import time
+import threading
+from collections import Counter, OrderedDict
 import asyncio
-from datetime import datetime, date
+import gzip
+from decimal import Decimal
+from datetime import datetime, date, timedelta, timezone
 from typing import Optional, List
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 import pathlib
 from pydantic import BaseModel, EmailStr
-import sqlite3, os
 from typing import Optional
 from pydantic import BaseModel, EmailStr
-import bleach, sqlite3, os
 from fastapi import HTTPException
 
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel, EmailStr, validator
+from pydantic import BaseModel, EmailStr, ValidationError, validator
 from sqlalchemy import (
     create_engine, Column, Integer, String, Date, DateTime,
-    DECIMAL, Text, func, text
+    DECIMAL, Float, Text, Index, UniqueConstraint, func, text, select, insert, update, delete, extract, event,
+    case, tuple_, inspect,
 )
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import declarative_base, Session, sessionmaker
-import bleach
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from contextlib import asynccontextmanager
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -44,6 +54,11 @@ class Room(Base):
 
 class Reservation(Base):
     __tablename__ = "reservations"
+    __table_args__ = (
+        # Filtros por fecha de creación y ETL incremental (orden created_at, id)
+        Index("ix_reservations_created_at", "created_at", "id"),
+        Index("ix_reservations_room_type", "room_type"),
+    )
     id = Column(Integer, primary_key=True)
     first_name = Column(String(100))
     last_name = Column(String(100))
@@ -68,6 +83,7 @@ class ContactMessage(Base):
 
 class WeatherData(Base):
     __tablename__ = "weather_data"
+    __table_args__ = (Index("ix_weather_data_recorded_at", "recorded_at"),)
     id = Column(Integer, primary_key=True)
     city = Column(String(100))
     temperature = Column(DECIMAL(5, 2))
@@ -75,8 +91,43 @@ class WeatherData(Base):
     humidity = Column(Integer)
     recorded_at = Column(DateTime, default=datetime.utcnow)
 
+# Agregados del clima por ciudad (los llena WeatherRollup)
+class WeatherHourly(Base):
+    __tablename__ = "weather_hourly"
+    __table_args__ = (UniqueConstraint("city", "hour"),)
+    id = Column(Integer, primary_key=True)
+    city = Column(String(100), nullable=False)
+    hour = Column(DateTime, nullable=False)
+    t_min = Column(DECIMAL(5, 2))
+    t_max = Column(DECIMAL(5, 2))
+    t_sum = Column(Float)
+    samples = Column(Integer, default=0)
+    cond_text = Column(String(80))
+
+class WeatherDaily(Base):
+    __tablename__ = "weather_daily"
+    __table_args__ = (UniqueConstraint("city", "day"),)
+    id = Column(Integer, primary_key=True)
+    city = Column(String(100), nullable=False)
+    day = Column(Date, nullable=False)
+    t_min = Column(DECIMAL(5, 2))
+    t_max = Column(DECIMAL(5, 2))
+    t_sum = Column(Float)
+    samples = Column(Integer, default=0)
+    cond_text = Column(String(80))
+
+class WeatherRollupState(Base):
+    __tablename__ = "weather_rollup_state"
+    name = Column(String(50), primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+
 class CleanedReservation(Base):
     __tablename__ = "cleaned_reservations"
+    __table_args__ = (
+        Index("ix_cleaned_reservations_processed_at", "processed_at"),
+        # Upsert del ETL por original_id
+        Index("ix_cleaned_reservations_original_id", "original_id"),
+    )
     id = Column(Integer, primary_key=True)
     original_id = Column(Integer)
     first_name = Column(String(100))
@@ -93,6 +144,28 @@ class CleanedReservation(Base):
     processed_at = Column(DateTime, default=datetime.utcnow)
     data_quality_score = Column(DECIMAL(3, 2))
 
+# Versión por tabla: cada escritura (API o ETL) la incrementa en su misma
+# transacción; los GET la usan como ETag
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+    name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class RoomInventory(Base):
+    """Habitaciones por tipo. Solo los tipos con fila aquí controlan
+    disponibilidad; ``lock_version`` serializa sus reservas entre procesos."""
+    __tablename__ = "room_inventory"
+    room_type = Column(String(100), primary_key=True)
+    rooms = Column(Integer, nullable=False)
+    lock_version = Column(Integer, nullable=False, default=0, server_default="0")
+
+class ReservationStat(Base):
+    """Contador de reservas por dimensión: total, mes de creación o tipo de habitación"""
+    __tablename__ = "reservation_stats"
+    dimension = Column(String(16), primary_key=True)
+    bucket = Column(String(100), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
 
 
 # Conexión única leyendo .env (SQLite por defecto)
@@ -104,8 +177,191 @@ connect_args = {"check_same_thread": False} if DB_URL.startswith("sqlite") else
 engine = create_engine(DB_URL, echo=False, pool_pre_ping=True, connect_args=connect_args)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
-# Crear tablas (ya con los modelos definidos)
-Base.metadata.create_all(bind=engine)
+# Perfil de rendimiento de SQLite, aplicado a cada conexión nueva del pool
+# (también a las del motor asíncrono). WAL permite lecturas concurrentes con
+# una escritura; synchronous=NORMAL es seguro ante caídas del proceso en WAL.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    # Negativo = KiB (64 MiB por conexión)
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),
+    "temp_store": "MEMORY",
+}
+
+def _apply_sqlite_profile(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+def use_sqlite_profile(target_engine):
+    """Registra el perfil en un motor SQLite (síncrono o asíncrono)"""
+    sync_engine = getattr(target_engine, "sync_engine", target_engine)
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _apply_sqlite_profile)
+
+use_sqlite_profile(engine)
+
+# Acciones en memoria que solo deben aplicarse si la transacción se confirma
+def on_commit(db: Session, callback):
+    db.info.setdefault("on_commit", []).append(callback)
+
+def _run_callbacks(callbacks):
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception as e:
+            print(f"⚠️ Error en acción post-commit: {e}")
+
+@event.listens_for(Session, "after_commit")
+def _run_on_commit(db):
+    callbacks = db.info.pop("on_commit", [])
+    # ThreadpoolSession confirma en un hilo del threadpool: los callbacks
+    # tocan estado del event loop (asyncio.Event, colas), así que se
+    # programan en su loop en lugar de correr aquí
+    loop = db.info.get("event_loop")
+    if callbacks and loop is not None:
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not loop:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_run_callbacks, callbacks)
+            return
+    _run_callbacks(callbacks)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_commit(db):
+    db.info.pop("on_commit", None)
+
+# ---------------------------------------------------------------------
+# 2b) Migraciones versionadas
+# ---------------------------------------------------------------------
+# Cada paso es idempotente (checkfirst / IF NOT EXISTS): si un paso se
+# interrumpe o dos procesos migran a la vez, volver a ejecutarlo es seguro.
+def _migrate_base_tables(conn):
+    Base.metadata.create_all(bind=conn)
+
+def _migrate_indexes(*names: str):
+    def step(conn):
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name in names:
+                    index.create(bind=conn, checkfirst=True)
+    return step
+
+def _migrate_users_table(conn):
+    # Tabla de /register (antes la creaba el evento de arranque)
+    id_column = ("INT AUTO_INCREMENT PRIMARY KEY" if conn.dialect.name == "mysql"
+                 else "INTEGER PRIMARY KEY AUTOINCREMENT")
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS users (
+            id {id_column},
+            username VARCHAR(100) UNIQUE NOT NULL,
+            email VARCHAR(200) UNIQUE NOT NULL,
+            comment TEXT
+        )
+    """))
+
+# Tablas cuyo contenido se sirve con ETag (ver sección 3e)
+VERSIONED_TABLES = ("rooms", "reservations", "cleaned_reservations", "weather_data")
+
+def _migrate_data_versions(conn):
+    DataVersion.__table__.create(bind=conn, checkfirst=True)
+    present = set(conn.execute(select(DataVersion.name)).scalars())
+    missing = [{"name": name, "version": 0} for name in VERSIONED_TABLES if name not in present]
+    if missing:
+        conn.execute(insert(DataVersion), missing)
+
+def _migrate_reservation_stats(conn):
+    ReservationStat.__table__.create(bind=conn, checkfirst=True)
+    reservation_stats.rebuild(conn)
+
+def _migrate_room_inventory(conn):
+    # Inventario inicial: las habitaciones ya registradas en rooms, por tipo
+    RoomInventory.__table__.create(bind=conn, checkfirst=True)
+    present = set(conn.execute(select(RoomInventory.room_type)).scalars())
+    counts = conn.execute(
+        select(Room.room_type, func.count(Room.id)).where(Room.room_type.isnot(None)).group_by(Room.room_type)
+    ).all()
+    missing = [{"room_type": t, "rooms": n, "lock_version": 0} for t, n in counts if t not in present]
+    if missing:
+        conn.execute(insert(RoomInventory), missing)
+
+def _migrate_weather_daily_by_city(conn):
+    # schema.sql anterior: weather_daily(day UNIQUE) sin city/t_sum/samples.
+    # create_all no altera tablas existentes: se aparta la tabla vieja (sus
+    # filas no tienen ciudad) y se reconstruye desde weather_hourly, que
+    # cubre exactamente lo agregado hasta weather_rollup_state.last_id
+    columns = {c["name"] for c in inspect(conn).get_columns("weather_daily")}
+    if {"city", "t_sum", "samples"} <= columns:
+        return
+    conn.execute(text("DROP TABLE IF EXISTS weather_daily_legacy"))
+    conn.execute(text("ALTER TABLE weather_daily RENAME TO weather_daily_legacy"))
+    WeatherDaily.__table__.create(bind=conn)
+    day = func.date(WeatherHourly.hour)
+    conn.execute(insert(WeatherDaily).from_select(
+        ["city", "day", "t_min", "t_max", "t_sum", "samples", "cond_text"],
+        select(WeatherHourly.city, day, func.min(WeatherHourly.t_min), func.max(WeatherHourly.t_max),
+               func.sum(WeatherHourly.t_sum), func.sum(WeatherHourly.samples), func.max(WeatherHourly.cond_text))
+        .group_by(WeatherHourly.city, day),
+    ))
+
+MIGRATIONS = [
+    (1, "tablas base", _migrate_base_tables),
+    (2, "índices de columnas consultadas", _migrate_indexes(
+        "ix_reservations_created_at", "ix_reservations_room_type",
+        "ix_weather_data_recorded_at", "ix_cleaned_reservations_processed_at",
+        "ix_cleaned_reservations_original_id",
+    )),
+    (3, "tabla users", _migrate_users_table),
+    (4, "versiones de datos para ETag", _migrate_data_versions),
+    (5, "contadores de reservas", _migrate_reservation_stats),
+    (6, "inventario de habitaciones por tipo", _migrate_room_inventory),
+    (7, "weather_daily por ciudad", _migrate_weather_daily_by_city),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def _ensure_migrations_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version    INTEGER PRIMARY KEY,
+            name       VARCHAR(200) NOT NULL,
+            applied_at DATETIME NULL
+        )
+    """))
+
+def schema_version(conn) -> int:
+    """Última migración aplicada (0 si no hay ninguna)"""
+    _ensure_migrations_table(conn)
+    return conn.execute(text("SELECT MAX(version) FROM schema_migrations")).scalar() or 0
+
+def run_migrations(bind) -> int:
+    """Aplica en orden las migraciones pendientes; devuelve la versión final"""
+    with bind.begin() as conn:
+        _ensure_migrations_table(conn)
+        applied = set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+    for version, name, step in MIGRATIONS:
+        if version in applied:
+            continue
+        try:
+            with bind.begin() as conn:
+                step(conn)
+                conn.execute(
+                    text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                    {"v": version, "n": name, "t": datetime.utcnow()},
+                )
+            print(f"🧱 Migración {version} aplicada: {name}")
+        except IntegrityError:
+            # Otro proceso la registró primero
+            pass
+    with bind.connect() as conn:
+        return schema_version(conn)
 
 # (Opcional) Semilla mínima si no hay reservas
 def _seed_if_empty():
@@ -118,24 +374,113 @@ def _seed_if_empty():
                     checkin_date=date(2025, 9, 1), checkout_date=date(2025, 9, 4),
                     guests=2, room_type="Suite Vista al Mar", comments="Demo"
                 ))
+                db.flush()
+                reservation_stats.rebuild(db.connection())
                 db.commit()
                 print("📝 Semilla insertada")
     except Exception as e:
         print(f"⚠️ Seed error: {e}")
 
-_seed_if_empty()
-
-
-
-# Crea las tablas si no existen (solo si hay conexión)
-if engine:
+def prepare_database() -> bool:
+    """Paso de arranque: migra solo si la versión guardada es anterior a
+    SCHEMA_VERSION y siembra la BD cuando el esquema se crea desde cero.
+    Sin BD utilizable deja la app en modo demo y devuelve False."""
+    global engine, SessionLocal
+    if not engine:
+        return False
     try:
-        Base.metadata.create_all(bind=engine)
-        print("✅ Tablas de BD verificadas/creadas")
+        with engine.begin() as conn:
+            current = schema_version(conn)
+        if current < SCHEMA_VERSION:
+            run_migrations(engine)
+            print(f"✅ Esquema actualizado: versión {current} → {SCHEMA_VERSION}")
+            if current == 0:
+                _seed_if_empty()
+        return True
     except Exception as e:
-        print(f"⚠️ Error creando tablas: {e}")
+        print(f"⚠️ Error preparando la BD: {e}")
         engine = None
         SessionLocal = None
+        return False
+
+# Motor asíncrono (aiosqlite / asyncmy, ambos en requirements.txt). Si el
+# driver falta se avisa al arrancar y se usa la sesión síncrona en el
+# threadpool; DB_ASYNC=0 elige el threadpool a propósito.
+def _async_url(url: str) -> Optional[str]:
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("mysql"):
+        return "mysql+asyncmy://" + url.split("://", 1)[1]
+    return None
+
+ASYNC_DB_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DB_URL)
+async_engine = None
+AsyncSessionLocal = None
+if engine and ASYNC_DB_URL and os.getenv("DB_ASYNC", "1") == "1":
+    try:
+        async_engine = create_async_engine(ASYNC_DB_URL, pool_pre_ping=True, connect_args=connect_args)
+        use_sqlite_profile(async_engine)
+        AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+        print(f"✅ Motor asíncrono activo ({async_engine.dialect.driver})")
+    except Exception as e:
+        print(f"❌ Motor asíncrono NO disponible ({ASYNC_DB_URL.split('://', 1)[0]}): {e}")
+        print("   Los endpoints async correrán en el threadpool. Instalar el driver "
+              "(pip install -r backend/requirements.txt) o DB_ASYNC=0 para elegirlo a propósito")
+
+
+class ThreadpoolSession:
+    """Sesión síncrona con la interfaz awaitable de AsyncSession; cada
+    operación de BD corre en el threadpool para no bloquear el event loop."""
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+        self.info = session.info
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, *args, **kwargs):
+        def _run():
+            result = self.sync_session.execute(statement, *args, **kwargs)
+            return result.freeze()() if getattr(statement, "is_select", False) else result
+        return await run_in_threadpool(_run)
+
+    async def scalar(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, *args, **kwargs)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        # Loop donde deben correr los callbacks post-commit (ver on_commit)
+        self.info["event_loop"] = asyncio.get_running_loop()
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, instance):
+        await run_in_threadpool(self.sync_session.refresh, instance)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+
+@asynccontextmanager
+async def async_session_scope():
+    """Sesión asíncrona (nativa o sobre threadpool)"""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = ThreadpoolSession(SessionLocal(expire_on_commit=False))
+        try:
+            yield db
+        finally:
+            await db.close()
 
 # ---------------------------------------------------------------------
 # 3) Esquemas Pydantic
@@ -146,6 +491,13 @@ class WeatherResponse(BaseModel):
     description: str
     humidity: int
 
+# Máximo de lecturas por lote en /api/weather/readings
+WEATHER_INGEST_MAX = int(os.getenv("WEATHER_INGEST_MAX", "1000"))
+
+def sanitize_text(v: str) -> str:
+    import bleach  # diferido: no se carga al importar el módulo
+    return bleach.clean(v)
+
 class ReservationCreate(BaseModel):
     first_name: str
     last_name: str
@@ -161,11 +513,11 @@ class ReservationCreate(BaseModel):
 
     @validator('first_name', 'last_name')
     def sanitize_names(cls, v):
-        return bleach.clean(v.strip()) if v else v
+        return sanitize_text(v.strip()) if v else v
     
     @validator('comments')
     def sanitize_comments(cls, v):
-        return bleach.clean(v.strip()) if v else v
+        return sanitize_text(v.strip()) if v else v
     
     @validator('guests')
     def validate_guests(cls, v):
@@ -173,6 +525,50 @@ class ReservationCreate(BaseModel):
             raise ValueError('Número de huéspedes debe estar entre 1 y 10')
         return v
 
+    @validator('checkout_date')
+    def validate_dates(cls, v, values):
+        checkin = values.get('checkin_date')
+        if checkin and v <= checkin:
+            raise ValueError('La fecha de salida debe ser posterior a la de entrada')
+        return v
+
+def naive_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    """Las fechas se guardan en UTC sin zona horaria"""
+    if moment is not None and moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+class WeatherReading(WeatherResponse):
+    recorded_at: Optional[datetime] = None
+
+    @validator('city', 'description')
+    def sanitize_weather_text(cls, v):
+        v = sanitize_text(v.strip())
+        if not v:
+            raise ValueError('El campo no puede estar vacío')
+        return v
+
+    @validator('humidity')
+    def validate_humidity(cls, v):
+        if v < 0 or v > 100:
+            raise ValueError('La humedad debe estar entre 0 y 100')
+        return v
+
+    @validator('recorded_at')
+    def recorded_at_utc(cls, v):
+        return naive_utc(v)
+
+class WeatherReadingBatch(BaseModel):
+    readings: List[WeatherReading]
+
+    @validator('readings')
+    def validate_batch_size(cls, v):
+        if not v:
+            raise ValueError('El lote no puede estar vacío')
+        if len(v) > WEATHER_INGEST_MAX:
+            raise ValueError(f'Máximo {WEATHER_INGEST_MAX} lecturas por lote')
+        return v
+
 class ContactCreate(BaseModel):
     full_name: str
     email: EmailStr
@@ -180,16 +576,872 @@ class ContactCreate(BaseModel):
     
     @validator('full_name')
     def sanitize_name(cls, v):
-        return bleach.clean(v.strip())
+        return sanitize_text(v.strip())
     
     @validator('message')
     def sanitize_message(cls, v):
-        return bleach.clean(v.strip())
+        return sanitize_text(v.strip())
+
+# Esquemas de respuesta de los listados. Documentan la API (OpenAPI) y
+# definen las columnas que se leen: los endpoints seleccionan exactamente
+# estos campos y devuelven filas planas, sin hidratar objetos ORM.
+class RoomOut(BaseModel):
+    id: int
+    room_type: Optional[str] = None
+    capacity: Optional[int] = None
+    price_per_night: Optional[float] = None
+    status: Optional[str] = None
+
+class ReservationOut(BaseModel):
+    id: int
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    country: Optional[str] = None
+    city: Optional[str] = None
+    checkin_date: Optional[date] = None
+    checkout_date: Optional[date] = None
+    guests: Optional[int] = None
+    room_type: Optional[str] = None
+    comments: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+class CleanedReservationOut(BaseModel):
+    id: int
+    original_id: Optional[int] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    country: Optional[str] = None
+    city: Optional[str] = None
+    checkin_date: Optional[date] = None
+    checkout_date: Optional[date] = None
+    guests: Optional[int] = None
+    room_type: Optional[str] = None
+    comments: Optional[str] = None
+    processed_at: Optional[datetime] = None
+    data_quality_score: Optional[float] = None
+
+class WeatherDataOut(BaseModel):
+    id: int
+    city: Optional[str] = None
+    temperature: Optional[float] = None
+    description: Optional[str] = None
+    humidity: Optional[int] = None
+    recorded_at: Optional[datetime] = None
+
+def schema_columns(model, schema) -> tuple:
+    """Columnas de ``model`` que corresponden a los campos de ``schema``"""
+    return tuple(getattr(model, name) for name in schema.model_fields)
+
+def rows_as_dicts(result) -> list:
+    """Filas de un Result como dicts planos (sin objetos ORM)"""
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+# ---------------------------------------------------------------------
+# 3b) Motor de disponibilidad (ocupación por tipo de habitación)
+# ---------------------------------------------------------------------
+class OccupancyCalendar:
+    """Ocupación de un tipo de habitación como función escalonada: ``days``
+    son los días (ordinales, ordenados) en que cambia y ``levels[i]`` las
+    estancias activas en [days[i], days[i+1]). Antes del primer día es 0."""
+
+    def __init__(self):
+        self.days: List[int] = []
+        self.levels: List[int] = []
+
+    def _split(self, day: int) -> int:
+        i = bisect.bisect_left(self.days, day)
+        if i == len(self.days) or self.days[i] != day:
+            self.days.insert(i, day)
+            self.levels.insert(i, self.levels[i - 1] if i > 0 else 0)
+        return i
+
+    def peak(self, start: int, end: int) -> int:
+        """Máximo de estancias simultáneas en [start, end)"""
+        i = max(bisect.bisect_right(self.days, start) - 1, 0)
+        peak = 0
+        while i < len(self.days) and self.days[i] < end:
+            peak = max(peak, self.levels[i])
+            i += 1
+        return peak
+
+    def add(self, start: int, end: int, delta: int = 1):
+        i = self._split(start)
+        j = self._split(end)
+        for k in range(i, j):
+            self.levels[k] += delta
+
+    def remove(self, start: int, end: int):
+        self.add(start, end, -1)
+
+
+class BookingIndex:
+    """Índice en memoria de estancias activas por tipo de habitación.
+
+    Cada tipo con fila en room_inventory tiene un calendario de ocupación;
+    una reserva se acepta si en ningún día de [entrada, salida) las
+    estancias simultáneas alcanzan el número de habitaciones. No se asigna
+    habitación concreta: el resultado no depende del orden de carga. Los
+    tipos sin inventario no se controlan: se aceptan siempre.
+
+    Entre procesos manda la BD: ``sync`` incrementa room_inventory.lock_version
+    dentro de la transacción de la reserva (bloqueo de fila en MySQL, de
+    escritura en SQLite) y, si la versión no es la que este proceso dejó,
+    recarga el tipo desde reservations. El candado local hace atómica la
+    verificación y el registro dentro del proceso.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inventory = {}
+        self._versions = {}
+        self._calendars = {}
+
+    def _fill(self, room_type: str, rooms: int, stays) -> int:
+        """Calendario nuevo para ``room_type``; devuelve cuántas estancias
+        existentes ya excedían el inventario (se registran igualmente)"""
+        self._inventory[room_type] = max(0, rooms)
+        calendar = self._calendars[room_type] = OccupancyCalendar()
+        oversold = 0
+        for checkin, checkout in stays:
+            start, end = checkin.toordinal(), checkout.toordinal()
+            if calendar.peak(start, end) >= self._inventory[room_type]:
+                oversold += 1
+            calendar.add(start, end)
+        return oversold
+
+    @staticmethod
+    def _stays(room_types):
+        return select(
+            Reservation.room_type, Reservation.checkin_date, Reservation.checkout_date
+        ).where(
+            Reservation.room_type.in_(room_types),
+            Reservation.checkin_date.isnot(None),
+            Reservation.checkout_date > Reservation.checkin_date,
+        ).order_by(Reservation.checkin_date)
+
+    def load(self, db: Session):
+        """Reconstruye el índice desde la BD"""
+        inventory = db.execute(
+            select(RoomInventory.room_type, RoomInventory.rooms, RoomInventory.lock_version)
+        ).all()
+        by_type = {room_type: [] for room_type, _, _ in inventory}
+        rooms_by_type = {room_type: rooms for room_type, rooms, _ in inventory}
+        for room_type, checkin, checkout in db.execute(
+            self._stays(list(by_type)).execution_options(yield_per=1000)
+        ):
+            by_type[room_type].append((checkin, checkout))
+
+        with self._lock:
+            self._inventory = {}
+            self._versions = {room_type: version for room_type, _, version in inventory}
+            self._calendars = {}
+            oversold = sum(self._fill(room_type, rooms_by_type[room_type], stays)
+                           for room_type, stays in by_type.items())
+        if oversold:
+            print(f"⚠️ {oversold} reservas existentes exceden el inventario (sobreventa previa)")
+
+    async def sync(self, db, room_type: str):
+        """Bloquea ``room_type`` en la BD hasta el fin de la transacción de
+        ``db`` y pone al día el índice si otro proceso reservó ese tipo"""
+        result = await db.execute(
+            update(RoomInventory)
+            .where(RoomInventory.room_type == room_type)
+            .values(lock_version=RoomInventory.lock_version + 1)
+        )
+        if result.rowcount == 0:
+            with self._lock:
+                self._inventory.pop(room_type, None)
+                self._calendars.pop(room_type, None)
+            return
+        rooms, version = (await db.execute(
+            select(RoomInventory.rooms, RoomInventory.lock_version).where(RoomInventory.room_type == room_type)
+        )).one()
+        stays = None
+        if self._versions.get(room_type) != version - 1 or self._inventory.get(room_type) != rooms:
+            stays = [(r.checkin_date, r.checkout_date) for r in (await db.execute(self._stays([room_type]))).all()]
+        with self._lock:
+            if stays is not None:
+                self._fill(room_type, rooms, stays)
+            # Hasta el commit la versión vista es desconocida: si la
+            # transacción se deshace, la próxima reserva recarga el tipo
+            self._versions[room_type] = None
+        on_commit(db, lambda: self._seen(room_type, version))
+
+    def _seen(self, room_type: str, version: int):
+        with self._lock:
+            self._versions[room_type] = version
+
+    def _place(self, room_type: str, start: int, end: int):
+        calendar = self._calendars.get(room_type)
+        if calendar is None:
+            # Tipo sin inventario: no se controla
+            return (room_type, False, start, end)
+        if calendar.peak(start, end) >= self._inventory[room_type]:
+            return None
+        calendar.add(start, end)
+        return (room_type, True, start, end)
+
+    def reserve(self, room_type: str, checkin: date, checkout: date):
+        """Registra la estancia si cabe; devuelve el bloqueo o None si no hay habitación"""
+        with self._lock:
+            return self._place(room_type, checkin.toordinal(), checkout.toordinal())
+
+    def release(self, hold):
+        """Deshace un bloqueo (p. ej. si falla el commit)"""
+        room_type, counted, start, end = hold
+        if not counted:
+            return
+        with self._lock:
+            calendar = self._calendars.get(room_type)
+            if calendar is not None:
+                calendar.remove(start, end)
+
+
+booking_index = BookingIndex()
+
+# ---------------------------------------------------------------------
+# 3c) Agregado de estadísticas de reservas
+# ---------------------------------------------------------------------
+class ReservationStats:
+    """Conteos de reservas (total, por mes de creación y por tipo de
+    habitación) guardados en reservation_stats.
+
+    Cada escritura de reservas suma sus filas con ``record`` dentro de su
+    propia transacción, así que todos los workers leen los mismos valores.
+    ``rebuild`` los recalcula desde reservations (migración y semilla).
+    ``snapshot`` relee la tabla solo cuando cambia la versión de
+    reservations (data_versions, que esas mismas escrituras incrementan)."""
+
+    TOTAL = "total"
+    MONTH = "month"
+    ROOM_TYPE = "room_type"
+
+    def __init__(self):
+        self._cached = None
+
+    @staticmethod
+    def month_key(moment: Optional[datetime]) -> Optional[str]:
+        return moment.strftime("%Y-%m") if moment else None
+
+    def deltas(self, rows: list) -> Counter:
+        """(dimensión, bucket) -> reservas nuevas; ``rows`` con room_type y created_at"""
+        counts = Counter()
+        for row in rows:
+            counts[(self.TOTAL, "")] += 1
+            key = self.month_key(row.get("created_at"))
+            if key:
+                counts[(self.MONTH, key)] += 1
+            if row.get("room_type"):
+                counts[(self.ROOM_TYPE, row["room_type"])] += 1
+        return counts
+
+    async def record(self, db, rows: list):
+        """Suma ``rows`` a los contadores en la transacción de ``db`` con un
+        solo UPDATE (la transacción de escritura sigue corta); los buckets
+        que aún no existen (mes o tipo nuevo) se insertan."""
+        deltas = self.deltas(rows)
+        if not deltas:
+            return
+        key = tuple_(ReservationStat.dimension, ReservationStat.bucket)
+        result = await db.execute(
+            update(ReservationStat)
+            .where(key.in_(list(deltas)))
+            .values(count=ReservationStat.count + case(
+                *[((ReservationStat.dimension == d) & (ReservationStat.bucket == b), n)
+                  for (d, b), n in deltas.items()],
+                else_=0,
+            ))
+        )
+        if result.rowcount == len(deltas):
+            return
+        present = {tuple(row) for row in (await db.execute(
+            select(ReservationStat.dimension, ReservationStat.bucket).where(key.in_(list(deltas)))
+        )).all()}
+        await db.execute(insert(ReservationStat), [
+            {"dimension": d, "bucket": b, "count": n}
+            for (d, b), n in deltas.items() if (d, b) not in present
+        ])
+
+    def rebuild(self, conn):
+        """Recalcula la tabla desde reservations con la conexión síncrona ``conn``"""
+        total = conn.execute(select(func.count(Reservation.id))).scalar() or 0
+        year = extract("year", Reservation.created_at)
+        month = extract("month", Reservation.created_at)
+        rows = [{"dimension": self.TOTAL, "bucket": "", "count": total}]
+        rows += [
+            {"dimension": self.MONTH, "bucket": f"{int(y):04d}-{int(m):02d}", "count": n}
+            for y, m, n in conn.execute(
+                select(year, month, func.count(Reservation.id))
+                .where(Reservation.created_at.isnot(None))
+                .group_by(year, month)
+            )
+        ]
+        rows += [
+            {"dimension": self.ROOM_TYPE, "bucket": room_type, "count": n}
+            for room_type, n in conn.execute(
+                select(Reservation.room_type, func.count(Reservation.id)).group_by(Reservation.room_type)
+            )
+            if room_type
+        ]
+        conn.execute(delete(ReservationStat))
+        conn.execute(insert(ReservationStat), rows)
+        conn.execute(update(DataVersion).where(DataVersion.name == "reservations")
+                     .values(version=DataVersion.version + 1))
+
+    async def _read(self) -> tuple:
+        async with async_session_scope() as db:
+            rows = (await db.execute(
+                select(ReservationStat.dimension, ReservationStat.bucket, ReservationStat.count)
+            )).all()
+        total = 0
+        by_month = {}
+        by_room_type = Counter()
+        for dimension, bucket, n in rows:
+            if dimension == self.TOTAL:
+                total = n
+            elif dimension == self.MONTH:
+                by_month[bucket] = n
+            elif dimension == self.ROOM_TYPE:
+                by_room_type[bucket] = n
+        return total, by_month, by_room_type
+
+    async def snapshot(self) -> dict:
+        version = await data_versions.get("reservations")
+        if self._cached is None or self._cached[0] != version:
+            self._cached = (version, await self._read())
+        total, by_month, by_room_type = self._cached[1]
+        popular = by_room_type.most_common(1)
+        return {
+            "total_reservations": total,
+            "monthly_reservations": by_month.get(self.month_key(datetime.utcnow()), 0),
+            "most_popular_room": list(popular[0]) if popular else ["Sin reservas", 0],
+            "reservations_by_room_type": dict(by_room_type),
+            "reservations_by_month": dict(sorted(by_month.items())),
+        }
+
+
+reservation_stats = ReservationStats()
+
+# ---------------------------------------------------------------------
+# 3d) Agregados horarios y diarios del clima
+# ---------------------------------------------------------------------
+WEATHER_ROLLUP_BATCH = int(os.getenv("WEATHER_ROLLUP_BATCH", "5000"))
+# Además de tras cada escritura local, para lecturas de otros procesos
+WEATHER_ROLLUP_INTERVAL = float(os.getenv("WEATHER_ROLLUP_INTERVAL", "60"))
+
+def _hour_bucket(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+def _day_bucket(moment: datetime) -> date:
+    return moment.date()
+
+class WeatherRollup:
+    """Mantiene weather_hourly y weather_daily (min/max/promedio por ciudad).
+
+    ``refresh`` es incremental: procesa solo las lecturas de weather_data
+    con id mayor al último agregado (guardado en weather_rollup_state) y
+    fusiona sus valores en los buckets existentes. Lo ejecuta una tarea de
+    fondo (tras cada escritura y cada ``interval``), nunca una petición GET.
+    """
+
+    STATE_NAME = "weather"
+    BUCKETS = (
+        (WeatherHourly, "hour", _hour_bucket),
+        (WeatherDaily, "day", _day_bucket),
+    )
+
+    def __init__(self, batch_size: int = WEATHER_ROLLUP_BATCH, interval: float = WEATHER_ROLLUP_INTERVAL):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _aggregate(rows, key_fn) -> dict:
+        buckets = {}
+        for row in rows:
+            if row.temperature is None or row.recorded_at is None or not row.city:
+                continue
+            temp = float(row.temperature)
+            key = (row.city, key_fn(row.recorded_at))
+            agg = buckets.get(key)
+            if agg is None:
+                buckets[key] = {"t_min": temp, "t_max": temp, "t_sum": temp, "samples": 1,
+                                "cond_text": (row.description or "")[:80]}
+            else:
+                agg["t_min"] = min(agg["t_min"], temp)
+                agg["t_max"] = max(agg["t_max"], temp)
+                agg["t_sum"] += temp
+                agg["samples"] += 1
+                agg["cond_text"] = (row.description or "")[:80]
+        return buckets
+
+    async def _merge(self, db, model, column: str, buckets: dict):
+        if not buckets:
+            return
+        bucket_col = getattr(model, column)
+        keys = [key for _, key in buckets]
+        existing = {
+            (r.city, getattr(r, column)): r
+            for r in (await db.execute(
+                select(model.id, model.city, bucket_col, model.t_min, model.t_max, model.t_sum, model.samples)
+                .where(model.city.in_({city for city, _ in buckets}))
+                .where(bucket_col.between(min(keys), max(keys)))
+            )).all()
+        }
+        new_rows = []
+        for (city, key), agg in buckets.items():
+            old = existing.get((city, key))
+            if old is None:
+                new_rows.append({"city": city, column: key, **agg})
+                continue
+            await db.execute(update(model).where(model.id == old.id).values(
+                t_min=min(float(old.t_min), agg["t_min"]),
+                t_max=max(float(old.t_max), agg["t_max"]),
+                t_sum=(old.t_sum or 0) + agg["t_sum"],
+                samples=(old.samples or 0) + agg["samples"],
+                cond_text=agg["cond_text"],
+            ))
+        if new_rows:
+            await db.execute(insert(model), new_rows)
+
+    async def refresh(self) -> int:
+        """Agrega las lecturas nuevas hasta ponerse al día; devuelve cuántas procesó.
+
+        Varios procesos pueden ejecutarlo a la vez: la marca avanza con
+        compare-and-set en la misma transacción que los buckets; quien
+        pierde descarta su lote y continúa desde la marca del ganador."""
+        processed = 0
+        async with async_session_scope() as db:
+            while True:
+                last_id = await db.scalar(
+                    select(WeatherRollupState.last_id).where(WeatherRollupState.name == self.STATE_NAME)
+                )
+                if last_id is None:
+                    try:
+                        await db.execute(insert(WeatherRollupState), [{"name": self.STATE_NAME, "last_id": 0}])
+                        await db.commit()
+                    except IntegrityError:
+                        await db.rollback()
+                    continue
+                rows = (await db.execute(
+                    select(WeatherData.id, WeatherData.city, WeatherData.temperature,
+                           WeatherData.description, WeatherData.recorded_at)
+                    .where(WeatherData.id > last_id)
+                    .order_by(WeatherData.id)
+                    .limit(self.batch_size)
+                )).all()
+                if not rows:
+                    await db.commit()
+                    break
+                try:
+                    for model, column, key_fn in self.BUCKETS:
+                        await self._merge(db, model, column, self._aggregate(rows, key_fn))
+                    advanced = (await db.execute(
+                        update(WeatherRollupState)
+                        .where(WeatherRollupState.name == self.STATE_NAME, WeatherRollupState.last_id == last_id)
+                        .values(last_id=rows[-1].id)
+                    )).rowcount
+                except IntegrityError:
+                    # El otro proceso creó los mismos buckets antes
+                    advanced = 0
+                if advanced != 1:
+                    # Otro proceso ya agregó este lote
+                    await db.rollback()
+                    continue
+                # Las series con ETag dependen también de los agregados
+                await bump_data_version(db, "weather_rollup")
+                await db.commit()
+                processed += len(rows)
+        return processed
+
+    def notify(self):
+        """Hay lecturas nuevas: agregarlas en la próxima vuelta"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"⚠️ Error agregando lecturas del clima: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            # Ponerse al día con lo guardado mientras el proceso no corría
+            self._wake.set()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._wake = None
+
+
+weather_rollup = WeatherRollup()
+
+# ---------------------------------------------------------------------
+# 3e) Versiones de datos y GET condicional (ETag / If-None-Match)
+# ---------------------------------------------------------------------
+# El ETL corre en otro proceso: sus cargas se ven a más tardar tras este TTL.
+# Las escrituras de la API invalidan el caché al confirmar.
+DATA_VERSION_TTL = float(os.getenv("DATA_VERSION_TTL", "1"))
+API_CACHE_CONTROL = os.getenv("API_CACHE_CONTROL", "no-cache")
+
+async def bump_data_version(db, *tables: str):
+    """Incrementa la versión de ``tables`` en la transacción de ``db`` (la
+    fila se crea si falta) e invalida el caché de versiones al confirmar"""
+    for table in tables:
+        result = await db.execute(
+            update(DataVersion).where(DataVersion.name == table).values(version=DataVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            await db.execute(insert(DataVersion), [{"name": table, "version": 1}])
+    on_commit(db, data_versions.invalidate)
+
+class DataVersions:
+    """Copia en memoria de data_versions, releída como mucho cada ``ttl`` segundos"""
+
+    def __init__(self, ttl: float = DATA_VERSION_TTL):
+        self.ttl = ttl
+        self._versions = {}
+        self._loaded_at = None
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    async def get(self, *tables: str) -> str:
+        now = time.monotonic()
+        if self._loaded_at is None or now - self._loaded_at >= self.ttl:
+            async with async_session_scope() as db:
+                rows = (await db.execute(select(DataVersion.name, DataVersion.version))).all()
+            self._versions = {name: version for name, version in rows}
+            self._loaded_at = now
+        return ".".join(str(self._versions.get(table, 0)) for table in tables)
+
+
+data_versions = DataVersions()
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip() for tag in if_none_match.split(",")}
+    # Comparación débil: W/"x" y "x" son equivalentes
+    return "*" in candidates or etag in candidates or etag[2:] in candidates
+
+def drop_etag(response: Response):
+    if "etag" in response.headers:
+        del response.headers["etag"]
+
+async def conditional_get(request: Request, response: Response, *tables: str,
+                          variant: str = "") -> Optional[Response]:
+    """Fija ETag y Cache-Control en ``response`` según la versión de
+    ``tables``; si el cliente ya tiene esa versión devuelve un 304 listo
+    para retornar (el endpoint no ejecuta su consulta).
+
+    ``variant`` distingue respuestas que dependen de algo más que los datos
+    (p. ej. el mes actual en las estadísticas)."""
+    if not engine or not SessionLocal:
+        return None
+    try:
+        version = await data_versions.get(*tables)
+    except Exception as e:
+        print(f"⚠️ No se pudo leer data_versions: {e}")
+        return None
+    etag = f'W/"{"+".join(tables)}-{version}{"-" + variant if variant else ""}"'
+    headers = {"ETag": etag, "Cache-Control": API_CACHE_CONTROL}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
+
+# ---------------------------------------------------------------------
+# 3f) Canal de eventos del dashboard (pub/sub en proceso, SSE)
+# ---------------------------------------------------------------------
+DASHBOARD_QUEUE_SIZE = int(os.getenv("DASHBOARD_QUEUE_SIZE", "100"))
+DASHBOARD_KEEPALIVE = float(os.getenv("DASHBOARD_KEEPALIVE", "15"))
+# Las cargas del ETL llegan desde otro proceso: se detectan por data_versions
+DASHBOARD_WATCH_INTERVAL = float(os.getenv("DASHBOARD_WATCH_INTERVAL", "5"))
+
+class DashboardBroker:
+    """Pub/sub en proceso para /api/dashboard/stream.
+
+    Cada cambio se serializa una sola vez como mensaje SSE y se copia a la
+    cola de cada suscriptor. Un cliente lento cuya cola se llena se
+    desconecta (EventSource reconecta y recibe un snapshot nuevo)."""
+
+    def __init__(self, queue_size: int = DASHBOARD_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._seq = 0
+        self._watch_task: Optional[asyncio.Task] = None
+        self.published = 0
+        self.dropped = 0
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def message(self, event: str, data: dict) -> str:
+        self._seq += 1
+        payload = json.dumps(data, default=_json_default, ensure_ascii=False)
+        return f"id: {self._seq}\nevent: {event}\ndata: {payload}\n\n"
+
+    def _disconnect(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    def _fan_out(self, message: Optional[str]):
+        for queue in list(self._subscribers):
+            if message is None:
+                self._disconnect(queue)
+                continue
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                self._disconnect(queue)
+
+    def _dispatch(self, message: Optional[str]):
+        # Los callbacks post-commit de ThreadpoolSession corren en el threadpool
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._fan_out(message)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._fan_out, message)
+
+    def publish(self, event: str, data: dict):
+        """Publica un cambio; sin suscriptores no hace nada"""
+        if not self._subscribers or self._loop is None:
+            return
+        self.published += 1
+        self._dispatch(self.message(event, data))
+
+    def close(self):
+        """Termina todas las suscripciones abiertas (apagado)"""
+        if self._subscribers and self._loop is not None:
+            self._dispatch(None)
+
+    async def _watch_versions(self, tables: tuple):
+        last = {}
+        while True:
+            await asyncio.sleep(DASHBOARD_WATCH_INTERVAL)
+            if not self._subscribers:
+                continue
+            try:
+                for table in tables:
+                    version = await data_versions.get(table)
+                    if table in last and last[table] != version:
+                        self.publish(table, {"version": version})
+                    last[table] = version
+            except Exception as e:
+                print(f"⚠️ Error vigilando data_versions: {e}")
+
+    def start(self, watch: tuple = ("cleaned_reservations",)):
+        if self._watch_task is None:
+            self._watch_task = asyncio.ensure_future(self._watch_versions(watch))
+
+    async def stop(self):
+        self.close()
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+
+dashboard_broker = DashboardBroker()
+
+async def publish_reservations(rows: list):
+    """Delta de reservas nuevas + estadísticas ya actualizadas (tras el commit)"""
+    if not dashboard_broker.subscribers:
+        return
+    dashboard_broker.publish("reservations", {
+        "count": len(rows),
+        "reservations": [
+            {key: row.get(key) for key in ("id", "room_type", "checkin_date", "checkout_date", "guests",
+                                           "country", "created_at")}
+            for row in rows[:50]
+        ],
+        "stats": await reservation_stats.snapshot(),
+    })
+
+def publish_weather(rows: list):
+    dashboard_broker.publish("weather", {"readings": [
+        {key: row.get(key) for key in ("city", "temperature", "description", "humidity", "recorded_at")}
+        for row in rows
+    ]})
 
 # ---------------------------------------------------------------------
 # 4) App FastAPI
 # ---------------------------------------------------------------------
-app = FastAPI(title="Hotel Costa Bella API")
+def _load_in_memory_state():
+    """Índice de disponibilidad desde la BD"""
+    if not SessionLocal:
+        return
+    try:
+        with SessionLocal() as db:
+            booking_index.load(db)
+        print("✅ Índice de disponibilidad cargado")
+    except Exception as e:
+        print(f"⚠️ Error cargando índice de disponibilidad: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Arranque y apagado: importar el módulo no toca la BD"""
+    prepare_database()
+    _load_in_memory_state()
+    if SessionLocal:
+        weather_recorder.start()
+        weather_rollup.start()
+        dashboard_broker.start()
+    yield
+    await dashboard_broker.stop()
+    await weather_recorder.stop()
+    await weather_rollup.stop()
+    if http_client is not None:
+        await http_client.aclose()
+    if async_engine is not None:
+        await async_engine.dispose()
+
+# Serialización: orjson (si está instalado) sobre dicts/tuplas planas.
+# Decimal, date y datetime se convierten igual que con jsonable_encoder.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, default=_json_default)
+        return json.dumps(content, default=_json_default, ensure_ascii=False,
+                          separators=(",", ":")).encode("utf-8")
+
+def fast_json(content, response: Optional[Response] = None) -> FastJSONResponse:
+    """Respuesta serializada sin pasar por jsonable_encoder. Una Response
+    devuelta directamente no hereda las cabeceras de ``response`` (ETag,
+    X-Next-Cursor...), así que se copian aquí."""
+    return FastJSONResponse(content, headers=dict(response.headers) if response is not None else None)
+
+# Compresión de respuestas grandes: brotli si el cliente lo acepta y el
+# paquete está instalado, si no gzip
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+# A partir de este tamaño se comprime en el threadpool (no bloquea el loop)
+COMPRESS_THREADPOOL_SIZE = int(os.getenv("COMPRESS_THREADPOOL_SIZE", str(256 * 1024)))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+class CompressionMiddleware:
+    """Comprime respuestas completas de al menos ``minimum_size`` bytes.
+
+    Las respuestas en streaming (SSE, NDJSON) pasan sin tocar: comprimirlas
+    retendría cada evento hasta llenar un bloque del compresor."""
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        try:
+            import brotli
+        except ImportError:
+            brotli = None
+        self.brotli = brotli
+
+    def negotiate(self, accept_encoding: str) -> Optional[str]:
+        accepted = {part.split(";")[0].strip() for part in accept_encoding.lower().split(",")}
+        if self.brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return self.brotli.compress(body, quality=BROTLI_QUALITY)
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+    async def __call__(self, scope, receive, send):
+        encoding = None
+        if scope["type"] == "http":
+            encoding = self.negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        pending_start = None
+
+        async def send_compressed(message):
+            nonlocal pending_start
+            if message["type"] == "http.response.start":
+                # Se retiene hasta ver el primer bloque del cuerpo
+                pending_start = message
+                return
+            if pending_start is None:
+                await send(message)
+                return
+            start, pending_start = pending_start, None
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            if (message.get("more_body", False) or len(body) < self.minimum_size
+                    or "content-encoding" in headers):
+                await send(start)
+                await send(message)
+                return
+            if len(body) >= COMPRESS_THREADPOOL_SIZE:
+                body = await run_in_threadpool(self.compress, body, encoding)
+            else:
+                body = self.compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+app = FastAPI(title="Hotel Costa Bella API", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -198,6 +1450,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
 
 # Ubicación de la carpeta frontend
 BACKEND_DIR = pathlib.Path(__file__).resolve().parent
@@ -223,120 +1476,540 @@ def get_db():
     finally:
         db.close()
 
+# Dependencia asíncrona para los endpoints calientes
+async def get_async_db():
+    if not SessionLocal:
+        raise HTTPException(status_code=503, detail="Base de datos no disponible")
+    async with async_session_scope() as db:
+        yield db
+
 # Configuración de variables de entorno
 WEATHER_API_KEY = os.getenv("WEATHER_API_KEY", "demo_key")  # Obtener de variables de entorno
 security = HTTPBearer()
 
-# Función para obtener datos del clima (API externa)
-async def get_weather_data(city: str = "San José") -> Optional['WeatherResponse']:
-    """Consume API de OpenWeatherMap para obtener datos del clima"""
-    
-    # Datos demo específicos para ciudades de Costa Rica
-    costa_rica_weather = {
-        "San José": {"temp": 24, "desc": "parcialmente nublado", "humidity": 75},
-        "Alajuela": {"temp": 27, "desc": "soleado", "humidity": 68},
-        "Cartago": {"temp": 20, "desc": "fresco y nublado", "humidity": 82},
-        "Heredia": {"temp": 22, "desc": "templado", "humidity": 78},
-        "Liberia": {"temp": 32, "desc": "caluroso y seco", "humidity": 55},
-        "Puntarenas": {"temp": 29, "desc": "húmedo y cálido", "humidity": 85},
-        "Puerto Limón": {"temp": 28, "desc": "tropical húmedo", "humidity": 88}
-    }
-    
-    try:
-        if WEATHER_API_KEY == "demo_key":
-            # Usar datos específicos para Costa Rica
-            print(f"🌡️ Generando datos de clima demo para {city}")
-            
-            # Buscar datos específicos de la ciudad o usar San José por defecto
-            city_data = costa_rica_weather.get(city, costa_rica_weather["San José"])
-            
-            # Agregar variación pequeña basada en la hora actual
-            import random
-            temp_variation = random.uniform(-2, 2)
-            humidity_variation = random.randint(-5, 5)
-            
-            return WeatherResponse(
-                city=city,
-                temperature=city_data["temp"] + temp_variation,
-                description=city_data["desc"],
-                humidity=max(30, min(95, city_data["humidity"] + humidity_variation))
-            )
-        
-        # Si tenemos API key real, usar OpenWeatherMap
-        # Mapear nombres de ciudades para mejor compatibilidad con API
-        city_mapping = {
-            "San José": "San Jose, CR",
-            "Alajuela": "Alajuela, CR", 
-            "Cartago": "Cartago, CR",
-            "Heredia": "Heredia, CR",
-            "Liberia": "Liberia, CR",
-            "Puntarenas": "Puntarenas, CR",
-            "Puerto Limón": "Limon, CR"
-        }
-        
-        api_city = city_mapping.get(city, f"{city}, Costa Rica")
-        
-        url = f"http://api.openweathermap.org/data/2.5/weather"
-        params = {
-            "q": api_city,
-            "appid": WEATHER_API_KEY,
-            "units": "metric",
-            "lang": "es"
-        }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                return WeatherResponse(
-                    city=city,  # Usar el nombre original
-                    temperature=data["main"]["temp"],
-                    description=data["weather"][0]["description"],
-                    humidity=data["main"]["humidity"]
-                )
-            else:
-                print(f"⚠️ Error API OpenWeatherMap: {response.status_code}")
-                # Fallback a datos demo
-                city_data = costa_rica_weather.get(city, costa_rica_weather["San José"])
-                return WeatherResponse(
-                    city=city,
-                    temperature=city_data["temp"],
-                    description=city_data["desc"],
-                    humidity=city_data["humidity"]
-                )
-    except Exception as e:
-        print(f"Error obteniendo datos del clima: {e}")
-        # Fallback a datos demo en caso de error
-        city_data = costa_rica_weather.get(city, costa_rica_weather["San José"])
+# Datos demo específicos para ciudades de Costa Rica
+COSTA_RICA_WEATHER = {
+    "San José": {"temp": 24, "desc": "parcialmente nublado", "humidity": 75},
+    "Alajuela": {"temp": 27, "desc": "soleado", "humidity": 68},
+    "Cartago": {"temp": 20, "desc": "fresco y nublado", "humidity": 82},
+    "Heredia": {"temp": 22, "desc": "templado", "humidity": 78},
+    "Liberia": {"temp": 32, "desc": "caluroso y seco", "humidity": 55},
+    "Puntarenas": {"temp": 29, "desc": "húmedo y cálido", "humidity": 85},
+    "Puerto Limón": {"temp": 28, "desc": "tropical húmedo", "humidity": 88}
+}
+
+# Mapear nombres de ciudades para mejor compatibilidad con API
+CITY_MAPPING = {
+    "San José": "San Jose, CR",
+    "Alajuela": "Alajuela, CR",
+    "Cartago": "Cartago, CR",
+    "Heredia": "Heredia, CR",
+    "Liberia": "Liberia, CR",
+    "Puntarenas": "Puntarenas, CR",
+    "Puerto Limón": "Limon, CR"
+}
+
+OPENWEATHER_URL = "http://api.openweathermap.org/data/2.5/weather"
+
+# Caché del clima: vigencia, edad máxima servible como "stale" y timeout
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))
+WEATHER_STALE_TTL = float(os.getenv("WEATHER_STALE_TTL", "3600"))
+WEATHER_UPSTREAM_TIMEOUT = float(os.getenv("WEATHER_UPSTREAM_TIMEOUT", "5"))
+# La ciudad llega del path sin validar: el caché guarda como mucho este número
+WEATHER_CACHE_MAX_CITIES = int(os.getenv("WEATHER_CACHE_MAX_CITIES", "256"))
+_KNOWN_CITIES = {name.casefold(): name for name in COSTA_RICA_WEATHER}
+
+def normalize_city(city: str) -> str:
+    """Espacios colapsados y, si es una ciudad conocida, su nombre canónico"""
+    city = " ".join(city.split())
+    return _KNOWN_CITIES.get(city.casefold(), city)
+
+# Cliente HTTP compartido (se crea con la primera consulta real a la API;
+# httpx se importa recién entonces)
+http_client: Optional["httpx.AsyncClient"] = None
+
+def _new_http_client() -> "httpx.AsyncClient":
+    import httpx
+    return httpx.AsyncClient(
+        timeout=WEATHER_UPSTREAM_TIMEOUT,
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+    )
+
+def _get_http_client() -> "httpx.AsyncClient":
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = _new_http_client()
+    return http_client
+
+def _demo_weather(city: str, vary: bool = True) -> 'WeatherResponse':
+    """Datos demo de la ciudad (San José por defecto)"""
+    city_data = COSTA_RICA_WEATHER.get(city, COSTA_RICA_WEATHER["San José"])
+    if not vary:
         return WeatherResponse(
             city=city,
             temperature=city_data["temp"],
             description=city_data["desc"],
             humidity=city_data["humidity"]
         )
-    
-    return None
+    # Agregar variación pequeña basada en la hora actual
+    import random
+    temp_variation = random.uniform(-2, 2)
+    humidity_variation = random.randint(-5, 5)
+    return WeatherResponse(
+        city=city,
+        temperature=city_data["temp"] + temp_variation,
+        description=city_data["desc"],
+        humidity=max(30, min(95, city_data["humidity"] + humidity_variation))
+    )
+
+async def fetch_weather_upstream(city: str) -> Optional['WeatherResponse']:
+    """Consulta OpenWeatherMap (o genera datos demo); None si la API falla"""
+    if WEATHER_API_KEY == "demo_key":
+        print(f"🌡️ Generando datos de clima demo para {city}")
+        return _demo_weather(city)
+
+    params = {
+        "q": CITY_MAPPING.get(city, f"{city}, Costa Rica"),
+        "appid": WEATHER_API_KEY,
+        "units": "metric",
+        "lang": "es"
+    }
+    import httpx
+    try:
+        response = await _get_http_client().get(OPENWEATHER_URL, params=params)
+    except httpx.HTTPError as e:
+        print(f"Error obteniendo datos del clima: {e}")
+        return None
+    if response.status_code != 200:
+        print(f"⚠️ Error API OpenWeatherMap: {response.status_code}")
+        return None
+    data = response.json()
+    return WeatherResponse(
+        city=city,  # Usar el nombre original
+        temperature=data["main"]["temp"],
+        description=data["weather"][0]["description"],
+        humidity=data["main"]["humidity"]
+    )
+
+
+class WeatherCache:
+    """Caché por ciudad con TTL, una sola consulta en vuelo por ciudad
+    (single-flight) y stale-while-revalidate.
+
+    Acotado a ``maxsize`` ciudades (LRU; primero se descartan las entradas
+    ya no servibles) y a ``maxsize`` consultas en vuelo: con el límite
+    alcanzado, una ciudad nueva no genera otra llamada a la API."""
+
+    def __init__(self, fetch, ttl: float = WEATHER_CACHE_TTL, stale_ttl: float = WEATHER_STALE_TTL,
+                 maxsize: int = WEATHER_CACHE_MAX_CITIES):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+
+    async def _refresh(self, city: str):
+        self.upstream_calls += 1
+        try:
+            value = await self.fetch(city)
+        except Exception as e:
+            print(f"⚠️ Error refrescando clima de {city}: {e}")
+            value = None
+        finally:
+            self._inflight.pop(city, None)
+        if value is None:
+            self.upstream_errors += 1
+        else:
+            self._store(city, value)
+        return value
+
+    def _store(self, city: str, value):
+        now = time.monotonic()
+        self._entries[city] = (now, value)
+        self._entries.move_to_end(city)
+        if len(self._entries) <= self.maxsize:
+            return
+        for key in [k for k, (at, _) in self._entries.items() if now - at >= self.stale_ttl]:
+            del self._entries[key]
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get(self, city: str) -> Optional['WeatherResponse']:
+        entry = self._entries.get(city)
+        age = time.monotonic() - entry[0] if entry else None
+        if entry and age < self.ttl:
+            self.hits += 1
+            self._entries.move_to_end(city)
+            return entry[1]
+
+        self.misses += 1
+        task = self._inflight.get(city)
+        if task is None:
+            if len(self._inflight) >= self.maxsize:
+                return entry[1] if entry and age < self.stale_ttl else None
+            task = self._inflight[city] = asyncio.ensure_future(self._refresh(city))
+        if entry and age < self.stale_ttl:
+            # Servir el dato anterior mientras se revalida en segundo plano
+            self.stale_hits += 1
+            return entry[1]
+
+        value = await asyncio.shield(task)
+        if value is None and entry:
+            self.stale_hits += 1
+            return entry[1]
+        return value
+
+    def stats(self) -> dict:
+        return {
+            "cities_cached": len(self._entries),
+            "max_cities": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "upstream_calls": self.upstream_calls,
+            "upstream_errors": self.upstream_errors,
+            "ttl_seconds": self.ttl,
+        }
+
+    def clear(self):
+        self._entries.clear()
+
+
+weather_cache = WeatherCache(fetch_weather_upstream)
+
+# Persistencia de lecturas: una por ciudad cada WEATHER_RECORD_INTERVAL
+WEATHER_RECORD_INTERVAL = float(os.getenv("WEATHER_RECORD_INTERVAL", "600"))
+WEATHER_WRITER_BATCH = int(os.getenv("WEATHER_WRITER_BATCH", "100"))
+WEATHER_WRITER_FLUSH = float(os.getenv("WEATHER_WRITER_FLUSH", "2"))
+
+
+class WeatherRecorder:
+    """Escritor en segundo plano de lecturas del clima.
+
+    ``submit`` descarta lecturas repetidas de una ciudad dentro del
+    intervalo y encola el resto sin esperar; la tarea de fondo las inserta
+    en lotes (una transacción por lote). La marca por ciudad se poda tras
+    cada lote (las vencidas ya no deduplican nada) y se acota a
+    ``max_cities``, como el caché del clima.
+    """
+
+    def __init__(self, interval: float = WEATHER_RECORD_INTERVAL,
+                 batch_size: int = WEATHER_WRITER_BATCH, flush_every: float = WEATHER_WRITER_FLUSH,
+                 max_cities: int = WEATHER_CACHE_MAX_CITIES):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.flush_every = flush_every
+        self.max_cities = max_cities
+        self._last_recorded = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.skipped = 0
+
+    def submit(self, weather: 'WeatherResponse', recorded_at: Optional[datetime] = None) -> bool:
+        now = time.monotonic()
+        last = self._last_recorded.get(weather.city)
+        if last is not None and now - last < self.interval:
+            self.skipped += 1
+            return False
+        if self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait({
+                "city": weather.city,
+                "temperature": weather.temperature,
+                "description": weather.description,
+                "humidity": weather.humidity,
+                "recorded_at": recorded_at or datetime.utcnow(),
+            })
+        except asyncio.QueueFull:
+            print("⚠️ Cola de lecturas del clima llena, lectura descartada")
+            return False
+        # Reinsertar mantiene el dict en orden de última lectura
+        self._last_recorded.pop(weather.city, None)
+        self._last_recorded[weather.city] = now
+        if len(self._last_recorded) > self.max_cities:
+            self._prune(now)
+        return True
+
+    def _prune(self, now: float):
+        """Olvida las marcas vencidas y, si aún sobran, las más antiguas"""
+        for city in [c for c, at in self._last_recorded.items() if now - at >= self.interval]:
+            del self._last_recorded[city]
+        while len(self._last_recorded) > self.max_cities:
+            del self._last_recorded[next(iter(self._last_recorded))]
+
+    async def _write(self, batch: list):
+        try:
+            async with async_session_scope() as db:
+                await db.execute(insert(WeatherData), batch)
+                on_commit(db, lambda: publish_weather(batch))
+                on_commit(db, weather_rollup.notify)
+                await bump_data_version(db, "weather_data")
+                await db.commit()
+            self.written += len(batch)
+        except Exception as e:
+            print(f"⚠️ No se pudieron guardar datos del clima: {e}")
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.flush_every
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._write(batch)
+            self._prune(time.monotonic())
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=10000)
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """Detiene la tarea y guarda lo que quede en la cola"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        pending = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        if pending:
+            await self._write(pending)
+        self._queue = None
+
+
+weather_recorder = WeatherRecorder()
+
+# Función para obtener datos del clima (API externa)
+async def get_weather_data(city: str = "San José") -> Optional['WeatherResponse']:
+    """Clima de la ciudad desde caché; datos demo si la API externa falla"""
+    city = normalize_city(city)
+    weather = await weather_cache.get(city)
+    if weather is None:
+        # Fallback a datos demo
+        weather = _demo_weather(city, vary=False)
+    return weather
 
 # ----------------------------- Endpoints -----------------------------
 @app.get("/")
 def root():
     return {"message": "Hotel Costa Bella API"}
 
-@app.get("/rooms")
-def get_rooms(db: Session = Depends(get_db)):
-    return db.query(Room).all()
+@app.get("/rooms", response_model=List[RoomOut])
+async def get_rooms(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    not_modified = await conditional_get(request, response, "rooms")
+    if not_modified:
+        return not_modified
+    result = await db.execute(select(*schema_columns(Room, RoomOut)))
+    return fast_json(rows_as_dicts(result), response)
 
 @app.post("/reservations")
-def create_reservation(payload: ReservationCreate, db: Session = Depends(get_db)):
-    db_res = Reservation(**payload.dict())
-    db.add(db_res)
-    db.commit()
-    db.refresh(db_res)
-    return {"ok": True, "reservation_id": db_res.id}
-
-@app.get("/reservations")
-def list_reservations():
-    """Lista todas las reservas"""
+async def create_reservation(payload: ReservationCreate, db: AsyncSession = Depends(get_async_db)):
+    try:
+        await booking_index.sync(db, payload.room_type)
+    except Exception:
+        await db.rollback()
+        raise
+    hold = booking_index.reserve(payload.room_type, payload.checkin_date, payload.checkout_date)
+    if hold is None:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="La habitación no está disponible para ese rango")
+    try:
+        db_res = Reservation(**payload.dict())
+        db.add(db_res)
+        await db.flush()
+        reservation_id = db_res.id
+        created = dict(payload.dict(), id=reservation_id, created_at=db_res.created_at)
+        await reservation_stats.record(db, [created])
+        await bump_data_version(db, "reservations")
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        booking_index.release(hold)
+        raise
+    await publish_reservations([created])
+    return {"ok": True, "reservation_id": reservation_id}
+
+# Importación masiva (channel managers / OTAs)
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "50000"))
+
+def _parse_bulk_body(raw: bytes, content_type: str) -> list:
+    """Acepta un arreglo JSON o NDJSON (un objeto por línea)"""
+    body = raw.decode("utf-8").strip()
+    if not body:
+        return []
+    if "ndjson" not in content_type and body.startswith("["):
+        items = json.loads(body)
+    else:
+        items = [json.loads(line) for line in body.splitlines() if line.strip()]
+    if not isinstance(items, list):
+        raise ValueError("Se esperaba un arreglo de reservas")
+    return items
+
+async def _insert_reservation_chunk(db, chunk: list) -> list:
+    """Inserta un lote con un INSERT multi-fila en su propia transacción.
+    ``chunk`` es una lista de (índice, fila, bloqueo); devuelve los ids."""
+    rows = [row for _, row, _ in chunk]
+    dialect = db.sync_session.get_bind().dialect
+    if dialect.insert_executemany_returning:
+        result = await db.execute(insert(Reservation).returning(Reservation.id), rows)
+        # Los ids autoincrementales se asignan en el orden de VALUES, así que
+        # ordenarlos evita pedir sort_by_parameter_order (que inserta fila a fila)
+        ids = sorted(result.scalars())
+    else:
+        # MySQL no tiene RETURNING: un único INSERT multi-fila, cuyo
+        # LAST_INSERT_ID() es el id de la primera fila; InnoDB asigna ids
+        # consecutivos a un INSERT con número de filas conocido
+        result = await db.execute(insert(Reservation).values(rows))
+        if dialect.name == "mysql":
+            ids = list(range(result.lastrowid, result.lastrowid + result.rowcount))
+        else:
+            ids = [None] * len(rows)
+    await reservation_stats.record(db, rows)
+    await bump_data_version(db, "reservations")
+    await db.commit()
+    await publish_reservations([dict(r, id=i) for r, i in zip(rows, ids)])
+    return ids
+
+@app.post("/reservations/bulk")
+async def create_reservations_bulk(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Importa un lote de reservas (JSON array o NDJSON) con resultado por fila"""
+    try:
+        items = _parse_bulk_body(await request.body(), request.headers.get("content-type", ""))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Cuerpo inválido: {e}")
+    if len(items) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Máximo {BULK_MAX_ROWS} reservas por lote")
+
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            payload = ReservationCreate.parse_obj(item)
+        except ValidationError as e:
+            results[index] = {"index": index, "ok": False, "status": 422,
+                              "error": e.errors(include_url=False, include_context=False)}
+            continue
+        valid.append((index, dict(payload.dict(), created_at=datetime.utcnow())))
+
+    for start in range(0, len(valid), BULK_CHUNK_SIZE):
+        accepted = []
+        try:
+            # Tipos en orden fijo: dos lotes concurrentes bloquean igual
+            for room_type in sorted({row["room_type"] for _, row in valid[start:start + BULK_CHUNK_SIZE]}):
+                await booking_index.sync(db, room_type)
+            for index, row in valid[start:start + BULK_CHUNK_SIZE]:
+                hold = booking_index.reserve(row["room_type"], row["checkin_date"], row["checkout_date"])
+                if hold is None:
+                    results[index] = {"index": index, "ok": False, "status": 409,
+                                      "error": "La habitación no está disponible para ese rango"}
+                else:
+                    accepted.append((index, row, hold))
+            if not accepted:
+                await db.rollback()  # libera los bloqueos de inventario
+                continue
+            ids = await _insert_reservation_chunk(db, accepted)
+        except Exception as e:
+            await db.rollback()
+            print(f"⚠️ Error insertando lote de reservas: {e}")
+            for index, row in valid[start:start + BULK_CHUNK_SIZE]:
+                if results[index] is None:
+                    results[index] = {"index": index, "ok": False, "status": 500,
+                                      "error": "Error al guardar el lote"}
+            for _, _, hold in accepted:
+                booking_index.release(hold)
+            continue
+        for (index, _, _), reservation_id in zip(accepted, ids):
+            results[index] = {"index": index, "ok": True, "reservation_id": reservation_id}
+
+    inserted = sum(1 for r in results if r["ok"])
+    return {"ok": inserted == len(items), "inserted": inserted,
+            "failed": len(items) - inserted, "results": results}
+
+# Columnas expuestas por el listado (evita hidratar objetos ORM completos)
+RESERVATION_LIST_COLUMNS = (
+    Reservation.id, Reservation.first_name, Reservation.last_name,
+    Reservation.email, Reservation.phone, Reservation.country, Reservation.city,
+    Reservation.checkin_date, Reservation.checkout_date, Reservation.guests,
+    Reservation.room_type, Reservation.comments, Reservation.created_at,
+)
+RESERVATIONS_PAGE_MAX = 1000
+RESERVATIONS_STREAM_BATCH = int(os.getenv("RESERVATIONS_STREAM_BATCH", "1000"))
+
+def _encode_cursor(last_id: int) -> str:
+    """Cursor opaco a partir del último id entregado"""
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+def _reservations_select(created_from: Optional[datetime], created_to: Optional[datetime],
+                         room_type: Optional[str], before_id: Optional[int]):
+    """Consulta keyset: orden por id descendente (id crece junto con created_at)"""
+    stmt = select(*RESERVATION_LIST_COLUMNS)
+    if created_from is not None:
+        stmt = stmt.where(Reservation.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(Reservation.created_at < created_to)
+    if room_type:
+        stmt = stmt.where(Reservation.room_type == room_type)
+    if before_id is not None:
+        stmt = stmt.where(Reservation.id < before_id)
+    return stmt.order_by(Reservation.id.desc())
+
+def _stream_reservations_ndjson(stmt, batch_size: int):
+    """Genera NDJSON leyendo la consulta en lotes del lado del servidor"""
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=batch_size))
+        for partition in result.partitions():
+            yield "".join(
+                json.dumps(dict(row._mapping), default=_json_default, ensure_ascii=False) + "\n"
+                for row in partition
+            )
+    finally:
+        db.close()
+
+@app.get("/reservations", response_model=List[ReservationOut])
+async def list_reservations(
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=RESERVATIONS_PAGE_MAX),
+    cursor: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    room_type: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    """Lista reservas paginadas por cursor (keyset sobre id).
+
+    - ``cursor``: valor de ``X-Next-Cursor`` de la página anterior.
+    - ``format=ndjson``: transmite todas las filas que cumplen los filtros,
+      una por línea, leyendo la tabla en lotes (memoria constante).
+    """
+    before_id = _decode_cursor(cursor) if cursor else None
     try:
         if not engine or not SessionLocal:
             # Si no hay conexión de BD, retornar datos demo
@@ -375,14 +2048,29 @@ def list_reservations():
                     "created_at": "2025-08-08T09:15:00"
                 }
             ]
-            
-        db = SessionLocal()
-        try:
-            return db.query(Reservation).all()
-        finally:
-            db.close()
+
+        not_modified = await conditional_get(request, response, "reservations")
+        if not_modified:
+            return not_modified
+        stmt = _reservations_select(created_from, created_to, room_type, before_id)
+        if format == "ndjson":
+            # Una Response devuelta directamente no hereda las cabeceras de ``response``
+            return StreamingResponse(
+                _stream_reservations_ndjson(stmt, RESERVATIONS_STREAM_BATCH),
+                media_type="application/x-ndjson",
+                headers=dict(response.headers),
+            )
+
+        async with async_session_scope() as db:
+            rows = rows_as_dicts(await db.execute(stmt.limit(limit + 1)))
+        if len(rows) > limit:
+            rows = rows[:limit]
+            response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1]["id"])
+        return fast_json(rows, response)
     except Exception as e:
         print(f"Error en reservations endpoint: {e}")
+        # Los datos de respaldo no deben quedar cacheados con la versión real
+        drop_etag(response)
         # En caso de error, retornar datos demo
         return [
             {
@@ -394,17 +2082,16 @@ def list_reservations():
         ]
 
 @app.post("/contact")
-def create_contact(payload: ContactCreate, db: Session = Depends(get_db)):
+async def create_contact(payload: ContactCreate, db: AsyncSession = Depends(get_async_db)):
     db_msg = ContactMessage(**payload.dict())
     db.add(db_msg)
-    db.commit()
-    db.refresh(db_msg)
+    await db.commit()
     return {"ok": True, "message_id": db_msg.id}
 
 # Nuevos endpoints para API externa y pipeline
 @app.get("/api/weather/{city}", response_model=WeatherResponse)
 async def get_weather(city: str):
-    """Obtiene datos del clima y opcionalmente los almacena en BD"""
+    """Obtiene datos del clima y los encola para almacenarlos en BD"""
     print(f"🌤️ Solicitando clima para: {city}")
     weather_data = await get_weather_data(city)
     
@@ -417,30 +2104,94 @@ async def get_weather(city: str):
             humidity=70
         )
     
-    # Intentar guardar en base de datos si está disponible
+    # Encolar para guardado en BD (deduplicado por ciudad e intervalo)
     if engine and SessionLocal:
-        try:
-            db = SessionLocal()
-            try:
-                db_weather = WeatherData(
-                    city=weather_data.city,
-                    temperature=weather_data.temperature,
-                    description=weather_data.description,
-                    humidity=weather_data.humidity
-                )
-                db.add(db_weather)
-                db.commit()
-                print(f"✅ Datos del clima guardados en BD: {weather_data.city}")
-            finally:
-                db.close()
-        except Exception as e:
-            print(f"⚠️ No se pudieron guardar datos del clima: {e}")
+        weather_recorder.submit(weather_data)
     
     return weather_data
 
+@app.post("/api/weather/readings")
+async def ingest_weather_readings(batch: WeatherReadingBatch, db: AsyncSession = Depends(get_async_db)):
+    """Guarda un lote de lecturas ya obtenidas (p. ej. por WeatherService)
+    en una sola transacción, sin volver a consultar la API externa"""
+    now = datetime.utcnow()
+    rows = [
+        {
+            "city": reading.city,
+            "temperature": reading.temperature,
+            "description": reading.description,
+            "humidity": reading.humidity,
+            "recorded_at": reading.recorded_at or now,
+        }
+        for reading in batch.readings
+    ]
+    try:
+        await db.execute(insert(WeatherData), rows)
+        on_commit(db, lambda: publish_weather(rows))
+        on_commit(db, weather_rollup.notify)
+        await bump_data_version(db, "weather_data")
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        print(f"⚠️ Error guardando lecturas del clima: {e}")
+        raise HTTPException(status_code=500, detail="No se pudieron guardar las lecturas")
+    return {"ok": True, "inserted": len(rows)}
+
+@app.get("/api/weather-cache")
+def get_weather_cache_stats():
+    """Contadores de aciertos/fallos del caché del clima"""
+    return weather_cache.stats()
+
+# Resolución automática del historial según el rango pedido
+WEATHER_HISTORY_RAW_SPAN = timedelta(days=2)
+WEATHER_HISTORY_HOURLY_SPAN = timedelta(days=62)
+WEATHER_HISTORY_DEFAULT_SPAN = timedelta(days=7)
+
+def _history_resolution(start: datetime, end: datetime) -> str:
+    span = end - start
+    if span <= WEATHER_HISTORY_RAW_SPAN:
+        return "raw"
+    if span <= WEATHER_HISTORY_HOURLY_SPAN:
+        return "hour"
+    return "day"
+
+def _rollup_point(row, when) -> dict:
+    return {
+        "city": row.city,
+        "time": when.isoformat(),
+        "temperature": round(row.t_sum / row.samples, 2) if row.samples else None,
+        "t_min": float(row.t_min) if row.t_min is not None else None,
+        "t_max": float(row.t_max) if row.t_max is not None else None,
+        "samples": row.samples,
+    }
+
 @app.get("/api/weather-history")
-def get_weather_history():
-    """Obtiene historial de datos del clima"""
+async def get_weather_history(
+    request: Request,
+    response: Response,
+    city: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: str = Query("auto", pattern="^(auto|raw|hour|day)$"),
+):
+    """Historial del clima.
+
+    Sin rango devuelve las últimas 50 lecturas. Con ``start``/``end``
+    devuelve una serie cuya resolución (raw, hour o day) se elige según el
+    rango: los rangos largos salen de los agregados, no de weather_data.
+
+    Solo lleva ETag si la respuesta depende únicamente de los datos: sin
+    rango o con ``end`` explícito (sin ``end`` la ventana avanza con el reloj).
+    Las series con rango dependen además de los agregados, que se ponen al
+    día en segundo plano."""
+    if end is not None:
+        not_modified = await conditional_get(request, response, "weather_data", "weather_rollup")
+        if not_modified:
+            return not_modified
+    elif start is None and resolution == "auto":
+        not_modified = await conditional_get(request, response, "weather_data")
+        if not_modified:
+            return not_modified
     try:
         if not engine or not SessionLocal:
             # Retornar historial demo
@@ -454,88 +2205,77 @@ def get_weather_history():
                     "recorded_at": "2025-08-10T12:00:00"
                 }
             ]
-            
-        db = SessionLocal()
-        try:
-            return db.query(WeatherData).order_by(WeatherData.recorded_at.desc()).limit(50).all()
-        finally:
-            db.close()
+        
+        if start is None and end is None and resolution == "auto":
+            async with async_session_scope() as db:
+                stmt = (select(*schema_columns(WeatherData, WeatherDataOut))
+                        .order_by(WeatherData.recorded_at.desc()).limit(50))
+                if city:
+                    stmt = stmt.where(WeatherData.city == city)
+                return fast_json(rows_as_dicts(await db.execute(stmt)), response)
     except Exception as e:
         print(f"Error en weather-history endpoint: {e}")
+        # Los datos de respaldo no deben quedar cacheados con la versión real
+        drop_etag(response)
         return []
 
+    end = naive_utc(end) or datetime.utcnow()
+    start = naive_utc(start) or end - WEATHER_HISTORY_DEFAULT_SPAN
+    if start > end:
+        raise HTTPException(status_code=400, detail="start debe ser anterior a end")
+    if resolution == "auto":
+        resolution = _history_resolution(start, end)
+
+    async with async_session_scope() as db:
+        if resolution == "raw":
+            stmt = (
+                select(WeatherData.city, WeatherData.temperature, WeatherData.recorded_at)
+                .where(WeatherData.recorded_at.between(start, end))
+                .order_by(WeatherData.recorded_at, WeatherData.id)
+            )
+            if city:
+                stmt = stmt.where(WeatherData.city == city)
+            points = [
+                {"city": r.city, "time": r.recorded_at.isoformat(),
+                 "temperature": float(r.temperature) if r.temperature is not None else None,
+                 "t_min": None, "t_max": None, "samples": 1}
+                for r in (await db.execute(stmt)).all()
+            ]
+        else:
+            model, column = (WeatherHourly, "hour") if resolution == "hour" else (WeatherDaily, "day")
+            bucket = getattr(model, column)
+            lo, hi = (_hour_bucket(start), end) if resolution == "hour" else (start.date(), end.date())
+            stmt = (
+                select(model.city, bucket, model.t_min, model.t_max, model.t_sum, model.samples)
+                .where(bucket.between(lo, hi))
+                .order_by(bucket, model.city)
+            )
+            if city:
+                stmt = stmt.where(model.city == city)
+            points = [_rollup_point(r, getattr(r, column)) for r in (await db.execute(stmt)).all()]
+
+    return {"resolution": resolution, "start": start.isoformat(), "end": end.isoformat(), "points": points}
+
 @app.get("/api/stats/reservations")
-def get_reservation_stats():
-    """Estadísticas de reservas para el dashboard"""
-    try:
-        # Verificar si tenemos conexión a la base de datos
-        if not engine or not SessionLocal:
-            print("⚠️ Sin conexión a BD, usando datos demo en stats")
-            return {
-                "total_reservations": 24,
-                "monthly_reservations": 8,
-                "most_popular_room": ["Suite Vista al Mar", 6]
-            }
-            
-        # Intentar conectar a la base de datos
-        db = SessionLocal()
-        try:
-            print("🔍 Consultando estadísticas reales desde MySQL...")
-            total_reservations = db.query(func.count(Reservation.id)).scalar() or 0
-            print(f"📊 Total reservas encontradas: {total_reservations}")
-            
-            # Para reservas mensuales, usar un filtro más simple
-            try:
-                recent_reservations = db.query(func.count(Reservation.id)).filter(
-                    Reservation.created_at >= datetime.utcnow().replace(day=1)
-                ).scalar() or 0
-                print(f"📊 Reservas del mes: {recent_reservations}")
-            except Exception as e:
-                print(f"⚠️ Error calculando reservas mensuales: {e}")
-                # Si falla, usar total/4 como estimado mensual
-                recent_reservations = max(1, total_reservations // 4) if total_reservations > 0 else 0
-            
-            # Obtener la habitación más popular
-            try:
-                popular_room_query = db.query(
-                    Reservation.room_type, 
-                    func.count(Reservation.room_type).label('count')
-                ).group_by(Reservation.room_type).order_by(
-                    func.count(Reservation.room_type).desc()
-                ).first()
-                
-                most_popular_room = None
-                if popular_room_query:
-                    most_popular_room = [popular_room_query[0], popular_room_query[1]]
-                    print(f"📊 Habitación más popular: {most_popular_room}")
-                else:
-                    most_popular_room = ["Sin reservas", 0]
-                    print("📊 No hay habitaciones populares aún")
-            except Exception as e:
-                print(f"⚠️ Error calculando habitación popular: {e}")
-                most_popular_room = ["Suite Vista al Mar", 0]
-            
-            result = {
-                "total_reservations": total_reservations,
-                "monthly_reservations": recent_reservations,
-                "most_popular_room": most_popular_room
-            }
-            print(f"✅ Estadísticas reales calculadas: {result}")
-            return result
-        finally:
-            db.close()
-            
-    except Exception as e:
-        print(f"❌ Error en stats endpoint: {e}")
-        # Retornar datos por defecto en caso de error
+async def get_reservation_stats(request: Request, response: Response):
+    """Estadísticas de reservas para el dashboard (tabla reservation_stats)"""
+    # Verificar si tenemos conexión a la base de datos
+    if not engine or not SessionLocal:
+        print("⚠️ Sin conexión a BD, usando datos demo en stats")
         return {
-            "total_reservations": 0,
-            "monthly_reservations": 0,
-            "most_popular_room": ["Error", 0]
+            "total_reservations": 24,
+            "monthly_reservations": 8,
+            "most_popular_room": ["Suite Vista al Mar", 6]
         }
+    # monthly_reservations cambia con el mes aunque no haya reservas nuevas
+    not_modified = await conditional_get(request, response, "reservations",
+                                         variant=datetime.utcnow().strftime("%Y%m"))
+    if not_modified:
+        return not_modified
+    return await reservation_stats.snapshot()
 
-@app.get("/api/cleaned-reservations")
-def get_cleaned_reservations():
+@app.get("/api/cleaned-reservations", response_model=List[CleanedReservationOut])
+async def get_cleaned_reservations(request: Request, response: Response):
     """Obtiene reservas procesadas por el pipeline"""
     try:
         if not engine or not SessionLocal:
@@ -561,13 +2301,17 @@ def get_cleaned_reservations():
                 }
             ]
             
-        db = SessionLocal()
-        try:
-            return db.query(CleanedReservation).order_by(CleanedReservation.processed_at.desc()).limit(100).all()
-        finally:
-            db.close()
+        not_modified = await conditional_get(request, response, "cleaned_reservations")
+        if not_modified:
+            return not_modified
+        async with async_session_scope() as db:
+            stmt = (select(*schema_columns(CleanedReservation, CleanedReservationOut))
+                    .order_by(CleanedReservation.processed_at.desc()).limit(100))
+            return fast_json(rows_as_dicts(await db.execute(stmt)), response)
     except Exception as e:
         print(f"Error en cleaned-reservations endpoint: {e}")
+        # Los datos de respaldo no deben quedar cacheados con la versión real
+        drop_etag(response)
         # Si la tabla no existe o hay error, retornar lista con datos demo
         return [
             {
@@ -585,15 +2329,142 @@ def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
-        "message": "Hotel Costa Bella API is running"
+        "message": "Hotel Costa Bella API is running",
+        "db_async": async_engine.dialect.driver if async_engine is not None else "threadpool",
+    }
+
+@app.get("/api/dashboard/stream")
+async def dashboard_stream(request: Request):
+    """Server-Sent Events con los cambios del dashboard.
+
+    Al conectar envía ``snapshot`` (estadísticas actuales); después
+    ``reservations`` (reservas nuevas + estadísticas), ``weather`` (lecturas
+    guardadas) y ``cleaned_reservations`` (carga del ETL, con su versión)."""
+    async def events():
+        # Todo dentro del generador: si el snapshot falla o el cliente se va
+        # antes de empezar, el finally da de baja la cola igualmente.
+        # Suscribirse antes del snapshot evita perder cambios entre ambos.
+        queue = dashboard_broker.subscribe()
+        try:
+            snapshot = dashboard_broker.message("snapshot", {
+                "stats": await reservation_stats.snapshot() if SessionLocal else None,
+                "timestamp": datetime.utcnow().isoformat(),
+            })
+            yield "retry: 5000\n\n" + snapshot
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), DASHBOARD_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # Comentario SSE: mantiene viva la conexión en proxies
+                    yield ": ping\n\n"
+                    continue
+                if message is None:
+                    break
+                yield message
+        finally:
+            dashboard_broker.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Resumen del dashboard: una sola petición con todas las secciones
+DASHBOARD_SUMMARY_LIMIT = int(os.getenv("DASHBOARD_SUMMARY_LIMIT", "100"))
+DASHBOARD_TREND_SPAN = timedelta(hours=24)
+
+async def _summary_stats(city: str, limit: int) -> dict:
+    return await reservation_stats.snapshot()
+
+async def _summary_reservations(city: str, limit: int) -> list:
+    async with async_session_scope() as db:
+        stmt = _reservations_select(None, None, None, None).limit(limit)
+        return [dict(row._mapping) for row in await db.execute(stmt)]
+
+async def _summary_weather(city: str, limit: int) -> dict:
+    return (await get_weather_data(city)).dict()
+
+async def _summary_quality(city: str, limit: int) -> dict:
+    async with async_session_scope() as db:
+        row = (await db.execute(select(
+            func.count(CleanedReservation.id),
+            func.avg(CleanedReservation.data_quality_score),
+            func.min(CleanedReservation.data_quality_score),
+            func.max(CleanedReservation.processed_at),
+        ))).one()
+    total, avg_score, min_score, last_processed = row
+    return {
+        "cleaned_reservations": total,
+        "avg_quality_score": round(float(avg_score), 3) if avg_score is not None else None,
+        "min_quality_score": float(min_score) if min_score is not None else None,
+        "last_processed_at": last_processed,
     }
 
+async def _summary_weather_trend(city: str, limit: int) -> list:
+    """Serie horaria de las últimas 24 h (desde los agregados)"""
+    since = _hour_bucket(datetime.utcnow() - DASHBOARD_TREND_SPAN)
+    async with async_session_scope() as db:
+        stmt = (
+            select(WeatherHourly.city, WeatherHourly.hour, WeatherHourly.t_min, WeatherHourly.t_max,
+                   WeatherHourly.t_sum, WeatherHourly.samples)
+            .where(WeatherHourly.city == city, WeatherHourly.hour >= since)
+            .order_by(WeatherHourly.hour)
+        )
+        return [_rollup_point(r, r.hour) for r in (await db.execute(stmt)).all()]
+
+DASHBOARD_SECTIONS = {
+    "stats": _summary_stats,
+    "reservations": _summary_reservations,
+    "weather": _summary_weather,
+    "quality": _summary_quality,
+    "weather_trend": _summary_weather_trend,
+}
+# Secciones que no necesitan BD (el resto queda en None en modo demo)
+DASHBOARD_NO_DB_SECTIONS = {"weather"}
+
+@app.get("/api/dashboard/summary")
+async def dashboard_summary(
+    fields: Optional[str] = Query(None, description="Secciones separadas por coma (por defecto todas)"),
+    city: str = "San José",
+    limit: int = Query(DASHBOARD_SUMMARY_LIMIT, ge=1, le=RESERVATIONS_PAGE_MAX),
+):
+    """Todo lo que el dashboard pinta al cargar, en una sola respuesta.
+
+    Las secciones pedidas se calculan en paralelo; si una falla su valor es
+    None y el motivo queda en ``errors``, sin afectar a las demás."""
+    names = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(DASHBOARD_SECTIONS)
+    unknown = [name for name in names if name not in DASHBOARD_SECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Secciones desconocidas: {', '.join(unknown)}. "
+                                                    f"Disponibles: {', '.join(DASHBOARD_SECTIONS)}")
+    names = list(dict.fromkeys(names))
+    has_db = bool(engine and SessionLocal)
+    runnable = [name for name in names if has_db or name in DASHBOARD_NO_DB_SECTIONS]
+
+    results = await asyncio.gather(
+        *(DASHBOARD_SECTIONS[name](city, limit) for name in runnable), return_exceptions=True
+    )
+    summary = {name: None for name in names}
+    errors = {}
+    for name, result in zip(runnable, results):
+        if isinstance(result, Exception):
+            print(f"⚠️ Error en sección {name} del resumen: {result}")
+            errors[name] = str(result) or type(result).__name__
+        else:
+            summary[name] = result
+    summary["generated_at"] = datetime.utcnow().isoformat()
+    if errors:
+        summary["errors"] = errors
+    return summary
+
 @app.get("/api/dashboard/test")
 def dashboard_test():
     """Endpoint de prueba específico para el dashboard"""
     return {
         "dashboard_status": "working",
         "endpoints_available": [
+            "/api/dashboard/summary",
+            "/api/dashboard/stream",
             "/api/stats/reservations",
             "/api/cleaned-reservations", 
             "/api/weather-history",
@@ -615,49 +2486,23 @@ class UserOut(BaseModel):
     email: EmailStr
     comment: Optional[str] = None
 
-def _sqlite_path_from_url(url: str) -> str:
-    if url.startswith("sqlite:////"):
-        return url.replace("sqlite:////", "/")
-    if url.startswith("sqlite:///"):
-        return url.replace("sqlite:///", "")
-    return url
-
-DB_URL = os.getenv("DATABASE_URL", "sqlite:///./hotel_reservas.db")
-DB_PATH = _sqlite_path_from_url(DB_URL)
-
-def ensure_users_table():
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                comment TEXT
-            );
-        """)
-        conn.commit()
-
-@app.on_event("startup")
-def _startup_create_users():
-    ensure_users_table()
-
 @app.post("/register", response_model=UserOut, tags=["security"])
-def register(user: UserCreate):
+def register(user: UserCreate, db: Session = Depends(get_db)):
     # permite <b>, <i>, <strong>, <em> y remueve todo lo demás (incl. <script>)
     allowed = ["b", "i", "strong", "em"]
+    import bleach
     safe_comment = bleach.clean(user.comment or "", tags=allowed, attributes={}, strip=True)
 
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        try:
-            cur.execute(
-                "INSERT INTO users (username, email, comment) VALUES (?, ?, ?)",
-                (user.username.strip(), user.email, safe_comment),
-            )
-            user_id = cur.lastrowid
-            conn.commit()
-        except sqlite3.IntegrityError:
-            raise HTTPException(status_code=400, detail="Usuario o email ya existe")
+    try:
+        result = db.execute(
+            text("INSERT INTO users (username, email, comment) VALUES (:username, :email, :comment)"),
+            {"username": user.username.strip(), "email": user.email, "comment": safe_comment},
+        )
+        user_id = result.lastrowid
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Usuario o email ya existe")
 
     # pa probarsh en el post --- error en el return 
     return {
@@ -65,14 +65,46 @@ CREATE TABLE IF NOT EXISTS payments (
 ) ENGINE=InnoDB;
 
 -- 3) Integración (opcional) clima para dashboards
+-- Agregados por ciudad que mantiene el backend (WeatherRollup) a partir de weather_data
+-- (las BD con el weather_daily(day UNIQUE) anterior las actualiza la migración 7 del backend)
+CREATE TABLE IF NOT EXISTS weather_hourly (
+  id        INT AUTO_INCREMENT PRIMARY KEY,
+  city      VARCHAR(100) NOT NULL,
+  hour      DATETIME NOT NULL,
+  t_min     DECIMAL(5,2),
+  t_max     DECIMAL(5,2),
+  t_sum     DOUBLE,
+  samples   INT DEFAULT 0,
+  cond_text VARCHAR(80),
+  UNIQUE (city, hour)
+) ENGINE=InnoDB;
+
 CREATE TABLE IF NOT EXISTS weather_daily (
   id        INT AUTO_INCREMENT PRIMARY KEY,
-  day       DATE NOT NULL UNIQUE,
+  city      VARCHAR(100) NOT NULL,
+  day       DATE NOT NULL,
   t_min     DECIMAL(5,2),
   t_max     DECIMAL(5,2),
-  cond_text VARCHAR(80)
+  t_sum     DOUBLE,
+  samples   INT DEFAULT 0,
+  cond_text VARCHAR(80),
+  UNIQUE (city, day)
 ) ENGINE=InnoDB;
 
+CREATE TABLE IF NOT EXISTS weather_rollup_state (
+  name    VARCHAR(50) PRIMARY KEY,
+  last_id INT NOT NULL DEFAULT 0
+) ENGINE=InnoDB;
+
+-- Versión por tabla para ETag / If-None-Match (API y ETL la incrementan)
+CREATE TABLE IF NOT EXISTS data_versions (
+  name    VARCHAR(64) PRIMARY KEY,
+  version INT NOT NULL DEFAULT 0
+) ENGINE=InnoDB;
+
+INSERT IGNORE INTO data_versions (name, version) VALUES
+  ('rooms', 0), ('reservations', 0), ('cleaned_reservations', 0), ('weather_data', 0);
+
 -- 4) Reglas de disponibilidad (vista + función + SP)
 -- Vista: reservas activas por habitación en una fecha dada (ej. hoy)
 CREATE OR REPLACE VIEW v_room_status_today AS
@@ -1,12 +1,24 @@
+import os
+import json
+import shutil
 import pytest
 import asyncio
+import tempfile
+import time
+
+# La app y las pruebas comparten una BD de prueba en un directorio temporal
+# (con WAL, SQLite deja además los archivos -wal y -shm junto a la BD)
+TEST_DB_DIR = tempfile.mkdtemp(prefix="hotel-tests-")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{os.path.join(TEST_DB_DIR, 'test.db')}"
+os.environ["DATABASE_URL"] = SQLALCHEMY_DATABASE_URL
+
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
-from backend.main import app, get_db, Base
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from backend.main import app, get_db, Base, BookingIndex, WeatherCache, WeatherResponse
 
-# Base de datos de prueba en memoria
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -25,12 +37,18 @@ def client():
     with TestClient(app) as c:
         yield c
     Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+    shutil.rmtree(TEST_DB_DIR, ignore_errors=True)
 
 def test_root(client):
     response = client.get("/")
     assert response.status_code == 200
     assert response.json() == {"message": "Hotel Costa Bella API"}
 
+def test_health_reports_async_driver(client):
+    # Sin el driver async los endpoints caen al threadpool: /health lo muestra
+    assert client.get("/health").json()["db_async"] == "aiosqlite"
+
 def test_create_reservation(client):
     reservation_data = {
         "first_name": "Juan",
@@ -78,3 +96,713 @@ def test_invalid_reservation_data(client):
     
     response = client.post("/reservations", json=invalid_data)
     assert response.status_code == 422  # Validation error
+
+def _make_reservation(n, room_type="Habitación Deluxe"):
+    return {
+        "first_name": f"Huésped{n}",
+        "last_name": "Prueba",
+        "email": f"huesped{n}@test.com",
+        "phone": "1234567890",
+        "checkin_date": f"2026-01-{n:02d}",
+        "checkout_date": f"2026-01-{n + 1:02d}",
+        "guests": 1,
+        "room_type": room_type,
+    }
+
+def test_reservations_keyset_pagination(client):
+    for n in range(1, 6):
+        assert client.post("/reservations", json=_make_reservation(n)).status_code == 200
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2, "room_type": "Habitación Deluxe"}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/reservations", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 2
+        seen.extend(r["id"] for r in page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert len(seen) == 5
+    assert seen == sorted(seen, reverse=True)
+
+def test_reservations_ndjson_stream(client):
+    response = client.get("/reservations", params={"format": "ndjson", "room_type": "Habitación Deluxe"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows and all(r["room_type"] == "Habitación Deluxe" for r in rows)
+
+def test_reservations_invalid_cursor(client):
+    assert client.get("/reservations", params={"cursor": "no-es-un-cursor"}).status_code == 400
+
+def _set_inventory(room_type, rooms):
+    # Configuración del hotel: los tipos sin fila en room_inventory no se controlan
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO room_inventory (room_type, rooms, lock_version) VALUES (:t, :n, 0)"),
+                     {"t": room_type, "n": rooms})
+
+def test_overlapping_reservation_rejected(client):
+    _set_inventory("Villa Privada", 1)
+    base = _make_reservation(20, room_type="Villa Privada")
+    assert client.post("/reservations", json=base).status_code == 200
+
+    overlap = dict(base, checkin_date="2026-01-19", checkout_date="2026-01-21")
+    assert client.post("/reservations", json=overlap).status_code == 409
+
+    adjacent = dict(base, checkin_date="2026-01-21", checkout_date="2026-01-23")
+    assert client.post("/reservations", json=adjacent).status_code == 200
+
+def test_room_type_without_inventory_is_not_limited(client):
+    base = _make_reservation(20, room_type="Tipo Sin Inventario")
+    assert client.post("/reservations", json=base).status_code == 200
+    assert client.post("/reservations", json=base).status_code == 200
+
+def test_booking_sees_reservations_from_other_workers(client):
+    from backend.main import SessionLocal, ThreadpoolSession, ReservationCreate, _insert_reservation_chunk
+
+    _set_inventory("Cabaña Compartida", 1)
+    first = _make_reservation(10, room_type="Cabaña Compartida")
+    assert client.post("/reservations", json=first).status_code == 200
+
+    async def other_worker_books(payload):
+        # Otro proceso: su propio índice en memoria, la misma BD
+        index = BookingIndex()
+        db = ThreadpoolSession(SessionLocal(expire_on_commit=False))
+        try:
+            await index.sync(db, payload["room_type"])
+            row = dict(ReservationCreate.parse_obj(payload).dict(), created_at=datetime.utcnow())
+            hold = index.reserve(row["room_type"], row["checkin_date"], row["checkout_date"])
+            assert hold is not None
+            await _insert_reservation_chunk(db, [(0, row, hold)])
+        finally:
+            await db.close()
+
+    asyncio.run(other_worker_books(dict(first, checkin_date="2026-02-01", checkout_date="2026-02-05")))
+    overlap = dict(first, checkin_date="2026-02-03", checkout_date="2026-02-04")
+    assert client.post("/reservations", json=overlap).status_code == 409
+    later = dict(first, checkin_date="2026-02-05", checkout_date="2026-02-07")
+    assert client.post("/reservations", json=later).status_code == 200
+
+def test_threadpool_commit_runs_callbacks_in_event_loop():
+    from backend.main import SessionLocal, ThreadpoolSession, WeatherRollup, on_commit
+
+    async def commit_without_async_driver():
+        loop = asyncio.get_running_loop()
+        rollup = WeatherRollup(interval=3600)
+        rollup._wake = asyncio.Event()
+        in_loop = []
+        db = ThreadpoolSession(SessionLocal(expire_on_commit=False))
+        try:
+            await db.execute(text("SELECT 1"))
+            on_commit(db, rollup.notify)
+            on_commit(db, lambda: in_loop.append(asyncio.get_running_loop() is loop))
+            await db.commit()
+        finally:
+            await db.close()
+        # La notificación despierta a la tarea de agregados
+        await asyncio.wait_for(rollup._wake.wait(), 1)
+        return in_loop
+
+    assert asyncio.run(commit_without_async_driver()) == [True]
+
+def test_booking_index_respects_inventory():
+    index = BookingIndex()
+    index._fill("Suite", 2, [])
+    checkin, checkout = date(2026, 3, 1), date(2026, 3, 5)
+    assert index.reserve("Suite", checkin, checkout) is not None
+    hold = index.reserve("Suite", date(2026, 3, 3), date(2026, 3, 4))
+    assert hold is not None
+    assert index.reserve("Suite", date(2026, 3, 2), date(2026, 3, 4)) is None
+
+    index.release(hold)
+    assert index.reserve("Suite", date(2026, 3, 2), date(2026, 3, 4)) is not None
+
+def test_booking_index_checks_peak_occupancy_not_room_units():
+    # Con habitaciones fijas: [1,3)→h0, [2,5)→h1, [6,8)→h0 y [4,7) no cabría
+    # en ninguna, aunque nunca hay más de 2 estancias a la vez
+    index = BookingIndex()
+    index._fill("Suite", 2, [(date(2026, 1, 1), date(2026, 1, 3)),
+                             (date(2026, 1, 2), date(2026, 1, 5)),
+                             (date(2026, 1, 6), date(2026, 1, 8))])
+    assert index.reserve("Suite", date(2026, 1, 4), date(2026, 1, 7)) is not None
+    # Ahora el 4 y el 6 están completos
+    assert index.reserve("Suite", date(2026, 1, 6), date(2026, 1, 7)) is None
+    assert index.reserve("Suite", date(2026, 1, 5), date(2026, 1, 6)) is not None
+    assert index.reserve("Suite", date(2026, 1, 5), date(2026, 1, 6)) is None
+
+def test_booking_index_concurrent_requests():
+    index = BookingIndex()
+    index._fill("Estandar", 1, [])
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        holds = list(pool.map(
+            lambda _: index.reserve("Estandar", date(2026, 4, 1), date(2026, 4, 3)),
+            range(50),
+        ))
+    assert sum(h is not None for h in holds) == 1
+
+def test_stats_follow_new_reservations(client):
+    before = client.get("/api/stats/reservations").json()
+    assert client.post("/reservations", json=_make_reservation(25, room_type="Suite Estadísticas")).status_code == 200
+    after = client.get("/api/stats/reservations").json()
+
+    assert after["total_reservations"] == before["total_reservations"] + 1
+    assert after["monthly_reservations"] == before["monthly_reservations"] + 1
+    assert after["reservations_by_room_type"]["Suite Estadísticas"] == 1
+
+def test_stats_rebuild_matches_incremental(client):
+    from backend.main import reservation_stats
+    assert client.post("/reservations/bulk", json=_bulk_rows(300, 3, room_type="Suite Conteo")).json()["ok"]
+    incremental = client.get("/api/stats/reservations").json()
+    assert incremental["reservations_by_room_type"]["Suite Conteo"] == 3
+    with engine.begin() as conn:
+        reservation_stats.rebuild(conn)
+    assert client.get("/api/stats/reservations").json() == incremental
+
+def _write_from_other_worker(delta):
+    # Lo que hace record() en otro proceso: contador y versión en una transacción
+    from backend.main import data_versions
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE reservation_stats SET count = count + :d WHERE dimension = 'total'"), {"d": delta})
+        conn.execute(text("UPDATE data_versions SET version = version + 1 WHERE name = 'reservations'"))
+    data_versions.invalidate()  # equivale a que venza DATA_VERSION_TTL
+
+def test_stats_are_shared_through_the_table(client):
+    before = client.get("/api/stats/reservations").json()["total_reservations"]
+    _write_from_other_worker(5)
+    assert client.get("/api/stats/reservations").json()["total_reservations"] == before + 5
+    _write_from_other_worker(-5)
+
+def _counting_fetch(calls, delay=0.01, fail=False):
+    async def fetch(city):
+        calls.append(city)
+        await asyncio.sleep(delay)
+        if fail:
+            return None
+        return WeatherResponse(city=city, temperature=25.0, description="soleado", humidity=70)
+    return fetch
+
+def test_weather_cache_single_flight():
+    calls = []
+    cache = WeatherCache(_counting_fetch(calls), ttl=60)
+
+    async def scenario():
+        results = await asyncio.gather(*(cache.get("Liberia") for _ in range(20)))
+        again = await cache.get("Liberia")
+        return results, again
+
+    results, again = asyncio.run(scenario())
+    assert calls == ["Liberia"]
+    assert all(r.city == "Liberia" for r in results) and again.city == "Liberia"
+    assert cache.hits == 1 and cache.misses == 20
+
+def test_weather_cache_serves_stale_when_upstream_fails():
+    calls = []
+    cache = WeatherCache(_counting_fetch(calls), ttl=0, stale_ttl=60)
+
+    async def scenario():
+        first = await cache.get("Cartago")
+        cache.fetch = _counting_fetch(calls, fail=True)
+        stale = await cache.get("Cartago")
+        await asyncio.sleep(0.05)
+        return first, stale
+
+    first, stale = asyncio.run(scenario())
+    assert stale == first
+    assert cache.stale_hits == 1 and cache.upstream_errors == 1
+
+def test_weather_cache_is_bounded():
+    calls = []
+    cache = WeatherCache(_counting_fetch(calls, delay=0), ttl=60, maxsize=3)
+
+    async def scenario():
+        for i in range(10):
+            await cache.get(f"Ciudad {i}")
+        # Un acierto la marca como reciente: sobrevive a la siguiente expulsión
+        await cache.get("Ciudad 7")
+        await cache.get("Ciudad 10")
+
+    asyncio.run(scenario())
+    assert list(cache._entries) == ["Ciudad 9", "Ciudad 7", "Ciudad 10"]
+    assert cache.stats()["cities_cached"] == 3 and not cache._inflight
+
+def test_weather_city_is_normalized():
+    from backend.main import normalize_city
+    assert normalize_city("  san   josé ") == "San José"
+    assert normalize_city("PUERTO LIMÓN") == "Puerto Limón"
+    assert normalize_city(" Nosara ") == "Nosara"
+
+def test_weather_cache_stats_endpoint(client):
+    assert client.get("/api/weather/Heredia").status_code == 200
+    assert client.get("/api/weather/Heredia").status_code == 200
+    stats = client.get("/api/weather-cache").json()
+    assert stats["hits"] >= 1 and stats["upstream_calls"] >= 1
+
+def test_threadpool_session_fallback(client):
+    from sqlalchemy import func, select
+    from backend.main import Reservation, SessionLocal, ThreadpoolSession
+
+    async def count():
+        db = ThreadpoolSession(SessionLocal())
+        try:
+            return (await db.execute(select(func.count(Reservation.id)))).scalar()
+        finally:
+            await db.close()
+
+    assert asyncio.run(count()) >= 1
+
+def _bulk_rows(first_day, count, room_type="Bungalow Bulk"):
+    return [
+        dict(_make_reservation(1, room_type=room_type),
+             email=f"bulk{day}@test.com",
+             checkin_date=f"2027-{(day // 28) + 1:02d}-{(day % 28) + 1:02d}",
+             checkout_date=f"2027-{(day // 28) + 1:02d}-{(day % 28) + 2:02d}")
+        for day in range(first_day, first_day + count)
+    ]
+
+def test_bulk_import_json_array(client):
+    _set_inventory("Bungalow Bulk", 1)
+    rows = _bulk_rows(0, 20)
+    rows.append(dict(rows[0]))                 # choque con la primera
+    rows.append(dict(rows[1], guests=15))      # inválida
+    response = client.post("/reservations/bulk", json=rows)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["inserted"] == 20 and body["failed"] == 2
+    assert [r["status"] for r in body["results"][20:]] == [409, 422]
+    ids = [r["reservation_id"] for r in body["results"][:20]]
+    assert len(set(ids)) == 20
+
+def test_bulk_import_ndjson(client):
+    rows = _bulk_rows(100, 5)
+    payload = "\n".join(json.dumps(r) for r in rows)
+    response = client.post("/reservations/bulk", content=payload,
+                           headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 5
+
+def test_bulk_import_rejects_malformed_body(client):
+    response = client.post("/reservations/bulk", content="{no es json",
+                           headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 400
+
+def test_weather_recorder_dedupes_and_batches(client):
+    from sqlalchemy import func
+    from backend.main import SessionLocal, WeatherData, WeatherRecorder
+
+    def count(city):
+        with SessionLocal() as db:
+            return db.query(func.count(WeatherData.id)).filter(WeatherData.city == city).scalar()
+
+    reading = WeatherResponse(city="Golfito", temperature=30.0, description="soleado", humidity=80)
+    other = WeatherResponse(city="Nosara", temperature=29.0, description="soleado", humidity=75)
+    recorder = WeatherRecorder(interval=600, batch_size=10, flush_every=0.05)
+
+    async def scenario():
+        recorder.start()
+        accepted = [recorder.submit(reading) for _ in range(5)] + [recorder.submit(other)]
+        await asyncio.sleep(0.2)
+        await recorder.stop()
+        return accepted
+
+    accepted = asyncio.run(scenario())
+    assert accepted == [True, False, False, False, False, True]
+    assert recorder.written == 2 and recorder.skipped == 4
+    assert count("Golfito") == 1 and count("Nosara") == 1
+
+def test_weather_recorder_bounds_city_marks():
+    from backend.main import WeatherRecorder
+
+    recorder = WeatherRecorder(interval=600, max_cities=3)
+    recorder._queue = asyncio.Queue()
+    for i in range(10):
+        assert recorder.submit(WeatherResponse(city=f"Ciudad {i}", temperature=25.0,
+                                               description="soleado", humidity=70))
+    assert list(recorder._last_recorded) == ["Ciudad 7", "Ciudad 8", "Ciudad 9"]
+
+    # Tras un lote se olvidan las marcas fuera del intervalo
+    recorder.interval = 0
+    recorder._prune(time.monotonic())
+    assert recorder._last_recorded == {}
+
+def test_weather_readings_batch_ingest(client):
+    from sqlalchemy import func
+    from backend.main import SessionLocal, WeatherData
+
+    def rows(city):
+        with SessionLocal() as db:
+            return db.query(WeatherData).filter(WeatherData.city == city).order_by(WeatherData.id).all()
+
+    readings = [
+        {"city": "Tamarindo", "temperature": 31.5, "description": "soleado", "humidity": 70,
+         "recorded_at": "2026-03-01T18:00:00+00:00"},
+        {"city": "Tamarindo", "temperature": 29.0, "description": "despejado", "humidity": 75,
+         "recorded_at": "2026-03-01T19:00:00Z"},
+        {"city": "Monteverde", "temperature": 16.0, "description": "neblina", "humidity": 95},
+    ]
+    res = client.post("/api/weather/readings", json={"readings": readings})
+    assert res.status_code == 200, res.text
+    assert res.json() == {"ok": True, "inserted": 3}
+
+    stored = rows("Tamarindo")
+    assert [float(r.temperature) for r in stored] == [31.5, 29.0]
+    assert stored[0].recorded_at == datetime(2026, 3, 1, 18, 0)
+    assert len(rows("Monteverde")) == 1
+
+    # Un lote inválido no guarda nada
+    bad = readings[:1] + [{"city": "Jacó", "temperature": 30, "description": "soleado", "humidity": 140}]
+    assert client.post("/api/weather/readings", json={"readings": bad}).status_code == 422
+    assert client.post("/api/weather/readings", json={"readings": []}).status_code == 422
+    assert len(rows("Tamarindo")) == 2 and rows("Jacó") == []
+
+def test_weather_history_downsamples_from_rollups(client):
+    from backend.main import weather_rollup
+
+    # Un año de lecturas cada 6 horas para una ciudad
+    start = datetime(2025, 1, 1)
+    readings = [
+        {"city": "Uvita", "temperature": 20 + (i % 4) * 2, "description": "variable",
+         "humidity": 80, "recorded_at": (start + timedelta(hours=6 * i)).isoformat()}
+        for i in range(365 * 4)
+    ]
+    for chunk in range(0, len(readings), 1000):
+        res = client.post("/api/weather/readings", json={"readings": readings[chunk:chunk + 1000]})
+        assert res.status_code == 200
+
+    # Los agregados se ponen al día en segundo plano; aquí, sin esperar
+    client.portal.call(weather_rollup.refresh)
+    year = client.get("/api/weather-history", params={
+        "city": "Uvita", "start": "2025-01-01T00:00:00", "end": "2025-12-31T23:59:59"}).json()
+    assert year["resolution"] == "day" and len(year["points"]) == 365
+    day = year["points"][0]
+    assert day == {"city": "Uvita", "time": "2025-01-01", "temperature": 23.0,
+                   "t_min": 20.0, "t_max": 26.0, "samples": 4}
+
+    # Incremental: una lectura nueva se fusiona en los buckets existentes
+    assert client.portal.call(weather_rollup.refresh) == 0
+    client.post("/api/weather/readings", json={"readings": [
+        {"city": "Uvita", "temperature": 35, "description": "caluroso", "humidity": 60,
+         "recorded_at": "2025-01-01T00:30:00"}]})
+    client.portal.call(weather_rollup.refresh)
+    week = client.get("/api/weather-history", params={
+        "city": "Uvita", "start": "2025-01-01T00:00:00", "end": "2025-01-10T00:00:00"}).json()
+    assert week["resolution"] == "hour"
+    first = week["points"][0]
+    assert first["time"] == "2025-01-01T00:00:00" and first["samples"] == 2 and first["t_max"] == 35.0
+    assert len(week["points"]) == 9 * 4 + 1
+
+    raw = client.get("/api/weather-history", params={
+        "city": "Uvita", "start": "2025-01-01T00:00:00", "end": "2025-01-01T12:00:00"}).json()
+    assert raw["resolution"] == "raw" and [p["temperature"] for p in raw["points"]] == [20.0, 35.0, 22.0, 24.0]
+    assert client.get("/api/weather-history", params={"resolution": "minute"}).status_code == 422
+
+def test_concurrent_rollups_count_each_reading_once(client):
+    from sqlalchemy import func, select
+    from backend.main import SessionLocal, WeatherDaily, WeatherRollup, weather_rollup
+
+    client.portal.call(weather_rollup.refresh)
+    readings = [
+        {"city": "Sámara", "temperature": 28, "description": "soleado", "humidity": 70,
+         "recorded_at": (datetime(2025, 3, 1) + timedelta(hours=i)).isoformat()}
+        for i in range(48)
+    ]
+    assert client.post("/api/weather/readings", json={"readings": readings}).status_code == 200
+
+    async def two_processes():
+        # Lotes pequeños: los dos compiten por la misma marca varias veces
+        return await asyncio.gather(WeatherRollup(batch_size=10).refresh(),
+                                    WeatherRollup(batch_size=10).refresh())
+
+    # En el bucle de la app, junto a su propia tarea de fondo
+    client.portal.call(two_processes)
+    with SessionLocal() as db:
+        samples = db.scalar(select(func.sum(WeatherDaily.samples)).where(WeatherDaily.city == "Sámara"))
+    assert samples == 48
+
+def _query_plan(conn, stmt):
+    from sqlalchemy import text
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})) if not isinstance(stmt, str) else stmt
+    return " | ".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+def test_migration_rebuilds_legacy_weather_daily(tmp_path):
+    from sqlalchemy import create_engine, inspect, insert, select, text
+    from backend.main import run_migrations, SCHEMA_VERSION, WeatherHourly, WeatherDaily
+
+    legacy = create_engine(f"sqlite:///{tmp_path / 'legacy-daily.db'}")
+    with legacy.begin() as conn:
+        # weather_daily tal como la creaba el schema.sql anterior
+        conn.execute(text("""
+            CREATE TABLE weather_daily (
+              id INTEGER PRIMARY KEY, day DATE NOT NULL UNIQUE,
+              t_min DECIMAL(5,2), t_max DECIMAL(5,2), cond_text VARCHAR(80))
+        """))
+        conn.execute(text("INSERT INTO weather_daily (day, t_min, t_max) VALUES ('2025-01-01', 18, 27)"))
+        WeatherHourly.__table__.create(bind=conn)
+        conn.execute(insert(WeatherHourly), [
+            {"city": "Uvita", "hour": datetime(2025, 1, 1, h), "t_min": 20 + h, "t_max": 21 + h,
+             "t_sum": 41.0 + 2 * h, "samples": 2, "cond_text": "variable"}
+            for h in (0, 6)
+        ])
+
+    assert run_migrations(legacy) == SCHEMA_VERSION
+    assert {"city", "t_sum", "samples"} <= {c["name"] for c in inspect(legacy).get_columns("weather_daily")}
+    with legacy.connect() as conn:
+        days = conn.execute(select(WeatherDaily.city, WeatherDaily.day, WeatherDaily.t_min,
+                                   WeatherDaily.t_max, WeatherDaily.t_sum, WeatherDaily.samples)).all()
+        kept = conn.execute(text("SELECT COUNT(*) FROM weather_daily_legacy")).scalar()
+    assert [tuple(d) for d in days] == [("Uvita", date(2025, 1, 1), 20, 27, 94.0, 4)]
+    assert kept == 1
+    legacy.dispose()
+
+def test_migrations_add_indexes_to_existing_db(tmp_path):
+    from sqlalchemy import create_engine, inspect, select, text, func
+    from backend.main import (
+        run_migrations, SCHEMA_VERSION, Reservation, WeatherData, CleanedReservation,
+        _reservations_select,
+    )
+
+    legacy = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    Base.metadata.create_all(bind=legacy)
+    with legacy.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name.startswith("ix_"):
+                    index.drop(bind=conn)
+
+    assert run_migrations(legacy) == SCHEMA_VERSION
+    assert run_migrations(legacy) == SCHEMA_VERSION
+    with legacy.connect() as conn:
+        versions = conn.execute(text("SELECT version FROM schema_migrations ORDER BY version")).scalars().all()
+    assert versions == list(range(1, SCHEMA_VERSION + 1))
+    names = {ix["name"] for t in ("reservations", "weather_data", "cleaned_reservations")
+             for ix in inspect(legacy).get_indexes(t)}
+    assert {"ix_reservations_created_at", "ix_reservations_room_type", "ix_weather_data_recorded_at",
+            "ix_cleaned_reservations_processed_at", "ix_cleaned_reservations_original_id"} <= names
+
+    since = datetime(2026, 1, 1)
+    with legacy.connect() as conn:
+        assert "ix_reservations_created_at" in _query_plan(
+            conn, select(func.count(Reservation.id)).where(Reservation.created_at >= since))
+        assert "ix_reservations_room_type" in _query_plan(
+            conn, _reservations_select(None, None, "Suite", None).limit(50))
+        assert "ix_weather_data_recorded_at" in _query_plan(
+            conn, select(WeatherData).order_by(WeatherData.recorded_at.desc()).limit(50))
+        assert "ix_cleaned_reservations_processed_at" in _query_plan(
+            conn, select(CleanedReservation.id).where(CleanedReservation.processed_at >= since))
+        # Consulta delta del ETL (pipeline/etl_flow.py)
+        assert "ix_reservations_created_at" in _query_plan(
+            conn, "SELECT id FROM reservations WHERE created_at IS NOT NULL AND "
+                  "(created_at > '2026-01-01' OR (created_at = '2026-01-01' AND id > 5)) "
+                  "ORDER BY created_at, id LIMIT 1000")
+
+def test_import_has_no_side_effects_and_lifespan_prepares_db(tmp_path):
+    import subprocess
+    import sys
+    import pathlib
+
+    db_file = tmp_path / "fresh.db"
+    code = (
+        "import sys, os\n"
+        "import backend.main as m\n"
+        "assert not os.path.exists(sys.argv[1]), 'import tocó la BD'\n"
+        "assert 'httpx' not in sys.modules and 'bleach' not in sys.modules\n"
+        "from starlette.testclient import TestClient\n"
+        "with TestClient(m.app) as c:\n"
+        "    assert c.get('/health').status_code == 200\n"
+        "    assert c.get('/api/stats/reservations').json()['total_reservations'] == 1\n"
+        "with m.engine.connect() as conn:\n"
+        "    assert m.schema_version(conn) == m.SCHEMA_VERSION\n"
+    )
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_file}")
+    root = pathlib.Path(__file__).resolve().parents[2]
+    result = subprocess.run([sys.executable, "-c", code, str(db_file)], cwd=root, env=env,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "Semilla insertada" in result.stdout
+
+def test_sqlite_profile_applied_to_pooled_connections():
+    from backend.main import engine as app_engine, SQLITE_PRAGMAS
+
+    with app_engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == SQLITE_PRAGMAS["busy_timeout"]
+        assert conn.exec_driver_sql("PRAGMA cache_size").scalar() == SQLITE_PRAGMAS["cache_size"]
+
+def test_register_uses_pool_and_rejects_duplicates(client):
+    user = {"username": "ana", "email": "ana@test.com",
+            "comment": "<b>hola</b><script>x</script>"}
+    response = client.post("/register", json=user)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["id"] > 0
+    assert body["comment"] == "<b>hola</b>x"
+
+    response = client.post("/register", json=user)
+    assert response.status_code == 400
+
+def test_read_endpoints_answer_304_until_data_changes(client):
+    from backend.main import data_versions
+
+    for url in ("/rooms", "/reservations", "/api/stats/reservations",
+                "/api/cleaned-reservations", "/api/weather-history"):
+        first = client.get(url)
+        etag = first.headers["etag"]
+        assert first.headers["cache-control"] == "no-cache"
+        again = client.get(url, headers={"If-None-Match": etag})
+        assert again.status_code == 304, url
+        assert again.headers["etag"] == etag and again.content == b""
+
+    etag = client.get("/reservations").headers["etag"]
+    stats_etag = client.get("/api/stats/reservations").headers["etag"]
+    created = client.post("/reservations", json={
+        "first_name": "Eva", "last_name": "Mora", "email": "eva@test.com", "phone": "1",
+        "country": "Costa Rica", "city": "Liberia", "checkin_date": "2031-03-01",
+        "checkout_date": "2031-03-02", "guests": 1, "room_type": "Habitación Estándar",
+    })
+    assert created.status_code == 200
+    changed = client.get("/reservations", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert client.get("/api/stats/reservations", headers={"If-None-Match": stats_etag}).status_code == 200
+
+    # Una carga del ETL (otro proceso) se ve al vencer el TTL
+    cleaned_etag = client.get("/api/cleaned-reservations").headers["etag"]
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT OR REPLACE INTO data_versions (name, version) VALUES ('cleaned_reservations', "
+            "COALESCE((SELECT version FROM data_versions WHERE name = 'cleaned_reservations'), 0) + 1)")
+    data_versions.invalidate()
+    response = client.get("/api/cleaned-reservations", headers={"If-None-Match": cleaned_etag})
+    assert response.status_code == 200
+
+def test_dashboard_stream_sends_snapshot_and_ends_on_close(client):
+    import threading
+    from backend.main import dashboard_broker
+
+    def close_when_subscribed():
+        for _ in range(100):
+            if dashboard_broker.subscribers:
+                dashboard_broker.close()
+                return
+            threading.Event().wait(0.02)
+
+    closer = threading.Thread(target=close_when_subscribed)
+    closer.start()
+    response = client.get("/api/dashboard/stream")
+    closer.join()
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert "event: snapshot" in response.text
+    # El streaming no pasa por el compresor (retendría los eventos)
+    assert "content-encoding" not in response.headers
+    assert dashboard_broker.subscribers == 0
+
+def test_dashboard_stream_unsubscribes_when_snapshot_fails(client, monkeypatch):
+    from backend.main import dashboard_broker, reservation_stats
+
+    async def broken_snapshot():
+        raise RuntimeError("BD caída")
+
+    monkeypatch.setattr(reservation_stats, "snapshot", broken_snapshot)
+    with pytest.raises(RuntimeError):
+        client.get("/api/dashboard/stream")
+    assert dashboard_broker.subscribers == 0
+
+def test_writes_publish_one_delta_to_every_subscriber(client):
+    from backend.main import dashboard_broker
+
+    async def scenario():
+        queues = [dashboard_broker.subscribe() for _ in range(3)]
+        try:
+            created = await asyncio.to_thread(client.post, "/reservations", json={
+                "first_name": "Leo", "last_name": "Mora", "email": "leo@test.com", "phone": "1",
+                "country": "Costa Rica", "city": "Liberia", "checkin_date": "2031-04-01",
+                "checkout_date": "2031-04-02", "guests": 1, "room_type": "Habitación Estándar",
+            })
+            assert created.status_code == 200
+            messages = [await asyncio.wait_for(q.get(), 2) for q in queues]
+            await asyncio.to_thread(client.post, "/api/weather/readings", json={"readings": [
+                {"city": "Liberia", "temperature": 31.5, "description": "soleado", "humidity": 55}
+            ]})
+            weather = await asyncio.wait_for(queues[0].get(), 2)
+        finally:
+            for q in queues:
+                dashboard_broker.unsubscribe(q)
+        return created.json()["reservation_id"], messages, weather
+
+    reservation_id, messages, weather = asyncio.run(scenario())
+    # Serializado una sola vez: el mismo objeto str en las tres colas
+    assert messages[0] is messages[1] is messages[2]
+    assert messages[0].startswith("id: ") and "event: reservations" in messages[0]
+    payload = json.loads(messages[0].split("data: ", 1)[1])
+    assert payload["reservations"][0]["id"] == reservation_id
+    assert payload["stats"]["total_reservations"] >= 1
+    assert "event: weather" in weather and '"Liberia"' in weather
+
+def test_dashboard_summary_gathers_sections_in_one_response(client):
+    response = client.get("/api/dashboard/summary")
+    assert response.status_code == 200
+    body = response.json()
+    assert "errors" not in body, body.get("errors")
+    assert body["stats"]["total_reservations"] >= 1
+    assert 1 <= len(body["reservations"]) <= 100
+    assert body["weather"]["city"] == "San José"
+    assert set(body["quality"]) == {"cleaned_reservations", "avg_quality_score",
+                                    "min_quality_score", "last_processed_at"}
+    assert isinstance(body["weather_trend"], list)
+
+    partial = client.get("/api/dashboard/summary", params={"fields": "stats,reservations", "limit": 1}).json()
+    assert set(partial) == {"stats", "reservations", "generated_at"}
+    assert len(partial["reservations"]) == 1
+
+    assert client.get("/api/dashboard/summary", params={"fields": "stats,nope"}).status_code == 400
+
+def test_list_endpoints_serialize_plain_rows_and_compress(client):
+    from backend.main import WeatherDataOut, COMPRESS_MIN_SIZE
+
+    rows = client.get("/api/weather-history").json()
+    assert rows and set(rows[0]) == set(WeatherDataOut.model_fields)
+    # DECIMAL → número, igual que antes con jsonable_encoder
+    assert isinstance(rows[0]["temperature"], float)
+
+    plain = client.get("/reservations", params={"limit": 1000}, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert int(plain.headers["content-length"]) >= COMPRESS_MIN_SIZE
+    packed = client.get("/reservations", params={"limit": 1000}, headers={"Accept-Encoding": "gzip"})
+    assert packed.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in packed.headers["vary"].lower()
+    assert packed.headers["etag"] == plain.headers["etag"]
+    assert packed.json() == plain.json()
+    assert {"id", "created_at", "checkin_date"} <= set(plain.json()[0])
+
+def test_load_test_harness_percentiles_and_regression_check(tmp_path):
+    import subprocess
+    import sys
+    import pathlib
+    from benchmarks.load_test import compare, percentile
+
+    samples = [i / 1000 for i in range(1, 101)]
+    assert percentile(samples, 50) == 0.05 and percentile(samples, 99) == 0.099
+    baseline = {"GET /rooms": {"p95_ms": 10.0}}
+    assert compare({"GET /rooms": {"p95_ms": 14.0, "errors": 0}}, baseline, 0.5) == []
+    assert compare({"GET /rooms": {"p95_ms": 16.0, "errors": 0}}, baseline, 0.5)
+    assert compare({"GET /rooms": {"p95_ms": 16.0, "errors": 0}}, baseline, 0.5, min_delta_ms=10) == []
+    assert compare({"GET /rooms": {"p95_ms": 1.0, "errors": 2}}, baseline, 0.5)
+
+    # Corrida corta de punta a punta contra su propia BD sembrada
+    root = pathlib.Path(__file__).resolve().parents[2]
+    out = tmp_path / "baseline.json"
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.load_test", "--requests", "4", "--concurrency", "2",
+         "--reservations", "100", "--baseline", str(out), "--update-baseline"],
+        cwd=root, env={k: v for k, v in os.environ.items() if k != "DATABASE_URL"},
+        capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    endpoints = json.loads(out.read_text(encoding="utf-8"))["endpoints"]
+    assert "GET /reservations" in endpoints and "GET /api/stats/reservations" in endpoints
+    assert all(r["errors"] == 0 and r["requests"] == 4 for r in endpoints.values())
@@ -0,0 +1,70 @@
+"""
+Benchmark: carga de cleaned_reservations (DELETE + to_sql vs staging + INSERT multi-fila)
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_cleaned_load --rows 200000
+"""
+
+import argparse
+import sys
+import pathlib
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text, bindparam
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "pipeline"))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+import etl_flow
+import loaders
+from backend.main import Base
+from benchmarks.bench_etl_cleaning import make_raw_frame
+
+def legacy_upsert(conn, df, batch_size=500):
+    """Carga anterior: DELETE por lotes de ids + DataFrame.to_sql"""
+    delete = text(
+        "DELETE FROM cleaned_reservations WHERE original_id IN :ids"
+    ).bindparams(bindparam("ids", expanding=True))
+    ids = [int(i) for i in df["original_id"]]
+    for start in range(0, len(ids), batch_size):
+        conn.execute(delete, {"ids": ids[start:start + batch_size]})
+    df.to_sql('cleaned_reservations', conn, if_exists='append', index=False, chunksize=batch_size)
+
+def _timed_load(load, frame, workdir, name):
+    engine = create_engine(f"sqlite:///{workdir / name}")
+    Base.metadata.create_all(bind=engine)
+    elapsed = []
+    # Primera carga (tabla vacía) y segunda (reemplaza todas las filas)
+    for _ in range(2):
+        t0 = time.perf_counter()
+        with engine.begin() as conn:
+            load(conn, frame)
+        elapsed.append(time.perf_counter() - t0)
+    with engine.connect() as conn:
+        count = conn.execute(text("SELECT COUNT(*) FROM cleaned_reservations")).scalar()
+    engine.dispose()
+    return elapsed, count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    clean, _ = etl_flow.clean_and_validate_data.fn(make_raw_frame(args.rows))
+    frame = etl_flow._prepare_cleaned_frame(clean)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = pathlib.Path(tmp)
+        legacy, legacy_count = _timed_load(legacy_upsert, frame, workdir, "legacy.db")
+        bulk, bulk_count = _timed_load(loaders.bulk_upsert, frame, workdir, "bulk.db")
+
+    assert legacy_count == bulk_count == len(frame)
+    print(f"📊 {len(frame):,} registros limpios (carga inicial / recarga)")
+    for label, times in (("anterior", legacy), ("staging", bulk)):
+        rates = " / ".join(f"{len(frame) / t:,.0f} filas/s" for t in times)
+        print(f"   {label:9} {times[0]:.2f}s / {times[1]:.2f}s  ({rates})")
+    print(f"   aceleración: {legacy[0] / bulk[0]:.1f}x / {legacy[1] / bulk[1]:.1f}x")
+
+if __name__ == "__main__":
+    main()
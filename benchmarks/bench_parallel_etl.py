@@ -0,0 +1,87 @@
+"""
+Benchmark: ETL secuencial vs modo paralelo por particiones de ids
+(extracción + limpieza + carga + backup) con 1, 2, 4... procesos
+
+Cada ejecución parte de una copia de la misma BD SQLite sembrada. La
+aceleración está limitada por el único escritor (carga y backup en el
+proceso principal) y por los núcleos disponibles.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_parallel_etl --rows 300000 --workers 1 2 4
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import pathlib
+import tempfile
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "pipeline"))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+import etl_flow
+import loaders
+import backup_store
+from benchmarks.bench_etl_cleaning import make_raw_frame
+
+def _seed(path: pathlib.Path, rows: int):
+    # Import local: los procesos hijos (spawn) reimportan este módulo
+    from backend.main import Base
+
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    raw = make_raw_frame(rows)
+    # created_at distinto por fila, como en producción
+    raw["created_at"] = pd.Timestamp("2024-01-01") + pd.to_timedelta(raw["id"], unit="s")
+    with engine.begin() as conn:
+        loaders.bulk_insert(conn, "reservations", raw)
+    engine.dispose()
+
+def sequential():
+    raw, watermark = etl_flow.extract_raw_reservations.fn()
+    clean, _ = etl_flow.clean_and_validate_data.fn(raw)
+    loaded = etl_flow.load_cleaned_data.fn(clean, watermark)
+    etl_flow.write_backup_chunk(clean)
+    return loaded
+
+def _timed(run, seed_db: pathlib.Path, workdir: pathlib.Path, label: str):
+    """Ejecuta ``run`` sobre una copia fresca de la BD y su propio backup"""
+    db = workdir / f"{label}.db"
+    shutil.copyfile(seed_db, db)
+    etl_flow.engine = create_engine(f"sqlite:///{db}")
+    backup_store.BACKUP_ROOT = str(workdir / f"backup-{label}")
+    try:
+        t0 = time.perf_counter()
+        loaded = run()
+        return time.perf_counter() - t0, loaded
+    finally:
+        etl_flow.engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=300_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = pathlib.Path(tmp)
+        seed_db = workdir / "seed.db"
+        _seed(seed_db, args.rows)
+
+        base, loaded = _timed(sequential, seed_db, workdir, "secuencial")
+        print(f"📊 {args.rows:,} reservas RAW → {loaded:,} limpias ({os.cpu_count()} CPUs)")
+        print(f"   secuencial    {base:7.2f}s  {args.rows / base:10,.0f} filas/s")
+        for workers in args.workers:
+            elapsed, count = _timed(lambda: etl_flow.run_parallel_etl.fn(workers)["loaded_count"],
+                                    seed_db, workdir, f"paralelo-{workers}")
+            assert count == loaded, (count, loaded)
+            print(f"   {workers} proceso{'s' if workers > 1 else ' '}    {elapsed:7.2f}s  "
+                  f"{args.rows / elapsed:10,.0f} filas/s  aceleración {base / elapsed:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark: serialización de listados (objetos ORM + jsonable_encoder + json
+vs columnas planas + orjson) y tamaño comprimido de la respuesta
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_serialization --rows 10000
+"""
+
+import argparse
+import gzip
+import sys
+import pathlib
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from backend.main import (
+    Base, CleanedReservation, CleanedReservationOut, FastJSONResponse, orjson, rows_as_dicts, schema_columns,
+)
+
+def _seed(engine, rows):
+    now = datetime(2026, 5, 1, 12, 0, 0)
+    with engine.begin() as conn:
+        conn.execute(insert(CleanedReservation), [
+            {
+                "original_id": i, "first_name": f"Ana{i}", "last_name": "Pérez", "email": f"ana{i}@test.com",
+                "phone": "8888-1234", "country": "Costa Rica", "city": "San José",
+                "checkin_date": date(2026, 6, 1) + timedelta(days=i % 90),
+                "checkout_date": date(2026, 6, 3) + timedelta(days=i % 90),
+                "guests": 2, "room_type": "Suite Vista al Mar", "comments": "Vista al mar",
+                "processed_at": now + timedelta(seconds=i), "data_quality_score": Decimal("0.95"),
+            }
+            for i in range(rows)
+        ])
+
+def legacy(engine) -> bytes:
+    """Antes: objetos ORM completos, jsonable_encoder por reflexión y json"""
+    with Session(engine) as db:
+        objects = db.execute(select(CleanedReservation)).scalars().all()
+        return JSONResponse(jsonable_encoder(objects)).body
+
+def fast(engine) -> bytes:
+    """Ahora: solo las columnas del esquema como filas planas y orjson"""
+    with engine.connect() as conn:
+        result = conn.execute(select(*schema_columns(CleanedReservation, CleanedReservationOut)))
+        return FastJSONResponse(rows_as_dicts(result)).body
+
+def _best_of(fn, engine, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        body = fn(engine)
+        times.append(time.perf_counter() - t0)
+    return min(times), body
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{pathlib.Path(tmp) / 'bench.db'}")
+        Base.metadata.create_all(bind=engine)
+        _seed(engine, args.rows)
+        legacy_time, legacy_body = _best_of(legacy, engine, args.repeat)
+        fast_time, fast_body = _best_of(fast, engine, args.repeat)
+        engine.dispose()
+
+    per_10k = 10_000 / args.rows * 1000
+    print(f"📊 {args.rows:,} filas de cleaned_reservations (mejor de {args.repeat}, "
+          f"{'orjson' if orjson is not None else 'json (orjson no instalado)'})")
+    print(f"   ORM + jsonable_encoder  {legacy_time * per_10k:8.1f} ms / 10k filas  ({len(legacy_body):,} bytes)")
+    print(f"   columnas + orjson       {fast_time * per_10k:8.1f} ms / 10k filas  ({len(fast_body):,} bytes)")
+    print(f"   aceleración: {legacy_time / fast_time:.1f}x")
+
+    t0 = time.perf_counter()
+    packed = gzip.compress(fast_body, compresslevel=6)
+    print(f"   gzip-6  {len(packed):,} bytes ({len(packed) / len(fast_body):.0%}) "
+          f"en {(time.perf_counter() - t0) * 1000:.1f} ms")
+    try:
+        import brotli
+    except ImportError:
+        print("   brotli no instalado (pip install brotli)")
+        return
+    t0 = time.perf_counter()
+    packed = brotli.compress(fast_body, quality=4)
+    print(f"   br-4    {len(packed):,} bytes ({len(packed) / len(fast_body):.0%}) "
+          f"en {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
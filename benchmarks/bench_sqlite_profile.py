@@ -0,0 +1,99 @@
+"""
+Benchmark: lecturas y escrituras concurrentes en SQLite (configuración por
+defecto vs perfil de backend/main.py: WAL, synchronous=NORMAL, busy_timeout...)
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_sqlite_profile --seconds 5 --readers 4 --writers 2
+"""
+
+import argparse
+import sys
+import pathlib
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from backend.main import Base, _apply_sqlite_profile
+
+READ_SQL = text(
+    "SELECT room_type, COUNT(*), SUM(guests) FROM reservations "
+    "WHERE created_at >= :since GROUP BY room_type"
+)
+WRITE_SQL = text(
+    "INSERT INTO reservations (first_name, last_name, email, phone, country, city, checkin_date, "
+    "checkout_date, guests, room_type, comments, created_at) VALUES ('Ana', 'Mora', 'a@b.cr', '1', "
+    "'Costa Rica', 'Liberia', '2026-05-01', '2026-05-03', 2, 'Suite', '', CURRENT_TIMESTAMP)"
+)
+
+def _make_engine(path, profiled):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    if profiled:
+        event.listen(engine, "connect", _apply_sqlite_profile)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for _ in range(2000):
+            conn.execute(WRITE_SQL)
+    return engine
+
+def _worker(engine, sql, stop, counts, errors, key):
+    done = failed = 0
+    while not stop.is_set():
+        try:
+            with engine.begin() as conn:
+                conn.execute(sql, {"since": "2000-01-01"} if sql is READ_SQL else {})
+            done += 1
+        except OperationalError:
+            # "database is locked": la operación se pierde
+            failed += 1
+    counts[key] += done
+    errors[key] += failed
+
+def run(path, profiled, seconds, readers, writers):
+    engine = _make_engine(path, profiled)
+    stop = threading.Event()
+    counts = {"read": 0, "write": 0}
+    errors = {"read": 0, "write": 0}
+    threads = [
+        threading.Thread(target=_worker, args=(engine, READ_SQL, stop, counts, errors, "read"))
+        for _ in range(readers)
+    ] + [
+        threading.Thread(target=_worker, args=(engine, WRITE_SQL, stop, counts, errors, "write"))
+        for _ in range(writers)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    engine.dispose()
+    return {k: counts[k] / seconds for k in counts}, errors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"📊 {args.readers} lectores + {args.writers} escritores durante {args.seconds:.0f}s")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, profiled in (("defecto", False), ("perfil", True)):
+            rates, errors = run(pathlib.Path(tmp) / f"{label}.db", profiled,
+                                args.seconds, args.readers, args.writers)
+            results[label] = rates
+            print(f"   {label:8} lecturas {rates['read']:9,.0f}/s  escrituras {rates['write']:7,.0f}/s  "
+                  f"bloqueos {errors['read'] + errors['write']}")
+    for kind in ("read", "write"):
+        base = results["defecto"][kind] or 1
+        print(f"   aceleración {('lecturas' if kind == 'read' else 'escrituras'):10} "
+              f"{results['perfil'][kind] / base:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: arranque del backend (import en frío y tiempo hasta la primera respuesta)
+
+- import: ``import backend.main`` en un proceso nuevo
+- primera respuesta: desde lanzar uvicorn hasta el primer 200 de /health,
+  con BD nueva (migra y siembra) y con BD ya migrada (solo verifica versión)
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_startup --runs 5
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import backend.main; "
+    "print(time.perf_counter() - t)"
+)
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def cold_import(env) -> float:
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+def time_to_first_request(env, timeout: float = 30.0) -> float:
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as res:
+                    if res.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("el servidor no respondió")
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        imports = [cold_import(env) for _ in range(args.runs)]
+        fresh = []
+        for run in range(args.runs):
+            env_fresh = dict(env, DATABASE_URL=f"sqlite:///{os.path.join(tmp, f'fresh{run}.db')}")
+            fresh.append(time_to_first_request(env_fresh))
+        warm = [time_to_first_request(env) for _ in range(args.runs)]
+
+    print(f"📊 Arranque del backend (mediana de {args.runs} procesos)")
+    print(f"   import en frío:                  {statistics.median(imports) * 1000:.0f} ms")
+    print(f"   primera respuesta, BD nueva:     {statistics.median(fresh) * 1000:.0f} ms")
+    print(f"   primera respuesta, BD migrada:   {statistics.median(warm) * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    main()
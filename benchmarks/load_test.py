@@ -0,0 +1,254 @@
+"""
+Prueba de carga en proceso y regresión de latencia del backend
+
+- Levanta la app (con su lifespan) contra una BD SQLite temporal sembrada
+- Recorre cada endpoint con httpx.AsyncClient sobre ASGITransport (sin red
+  ni servicios externos) con ``--concurrency`` peticiones simultáneas
+- Mide throughput y latencias p50/p95/p99 por endpoint
+- Compara con benchmarks/load_baseline.json: si el p95 de un endpoint supera
+  la línea base en más de ``--threshold`` (1.0 = el doble) y en más de
+  ``--min-delta-ms``, o algún endpoint responde con un estado inesperado,
+  termina con código 1
+
+Las latencias absolutas dependen de la máquina: regenerar la línea base en
+el entorno donde se compara (``--update-baseline``).
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.load_test --requests 300 --concurrency 20
+    python -m benchmarks.load_test --update-baseline
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import pathlib
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+BASELINE_FILE = ROOT / "benchmarks" / "load_baseline.json"
+ROOM_TYPES = ["Suite Vista al Mar", "Villa Privada", "Habitación Deluxe", "Habitación Estándar"]
+CITIES = ["San José", "Liberia", "Puntarenas"]
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Percentil por rango más cercano"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, min(len(ordered), math.ceil(pct / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+def summarize(latencies: List[float], elapsed: float, errors: int) -> Dict[str, Any]:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            threshold: float, min_delta_ms: float = 0.0) -> List[str]:
+    """Regresiones: p95 por encima de la línea base * (1 + threshold) o errores.
+
+    ``min_delta_ms`` evita falsos positivos en endpoints de menos de un
+    milisegundo, donde una pausa del GC ya supera cualquier porcentaje."""
+    problems = []
+    for name, current in results.items():
+        if current["errors"]:
+            problems.append(f"{name}: {current['errors']} respuestas con estado inesperado")
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        limit = reference["p95_ms"] * (1 + threshold)
+        if current["p95_ms"] > limit and current["p95_ms"] - reference["p95_ms"] > min_delta_ms:
+            problems.append(f"{name}: p95 {current['p95_ms']:.1f} ms > {limit:.1f} ms "
+                            f"(línea base {reference['p95_ms']:.1f} ms, +{threshold:.0%})")
+    return problems
+
+def _seed(main, reservations: int, cleaned: int, readings: int):
+    """Datos de partida: reservas, reservas limpias y lecturas del clima"""
+    from sqlalchemy import insert
+    from decimal import Decimal
+
+    now = datetime.utcnow().replace(microsecond=0)
+    with main.engine.begin() as conn:
+        conn.execute(insert(main.Reservation), [
+            {
+                "first_name": f"Ana{i}", "last_name": "Pérez", "email": f"ana{i}@test.com",
+                "phone": "8888-1234", "country": "Costa Rica", "city": CITIES[i % len(CITIES)],
+                "checkin_date": date(2026, 1, 1) + timedelta(days=i % 365),
+                "checkout_date": date(2026, 1, 3) + timedelta(days=i % 365),
+                "guests": 1 + i % 4, "room_type": ROOM_TYPES[i % len(ROOM_TYPES)],
+                "comments": None, "created_at": now - timedelta(minutes=i),
+            }
+            for i in range(reservations)
+        ])
+        conn.execute(insert(main.CleanedReservation), [
+            {
+                "original_id": i + 1, "first_name": f"Ana{i}", "last_name": "Pérez",
+                "email": f"ana{i}@test.com", "room_type": ROOM_TYPES[i % len(ROOM_TYPES)],
+                "processed_at": now - timedelta(minutes=i), "data_quality_score": Decimal("0.95"),
+            }
+            for i in range(cleaned)
+        ])
+        conn.execute(insert(main.WeatherData), [
+            {
+                "city": CITIES[i % len(CITIES)], "temperature": Decimal("24.5") + i % 7,
+                "description": "parcialmente nublado", "humidity": 70 + i % 20,
+                "recorded_at": now - timedelta(minutes=10 * i),
+            }
+            for i in range(readings)
+        ])
+        # Las reservas sembradas no pasan por la API: recalcular los contadores
+        main.reservation_stats.rebuild(conn)
+
+def _scenarios(now: datetime) -> List[Dict[str, Any]]:
+    """Endpoints a recorrer: (nombre, método, url, cuerpo por iteración, estados válidos)"""
+    week = {"start": (now - timedelta(days=7)).isoformat(), "end": now.isoformat(), "city": "San José"}
+
+    def new_reservation(i):
+        # Fechas distintas por petición: no chocan en el índice de disponibilidad
+        checkin = date(2030, 1, 1) + timedelta(days=2 * i)
+        return {
+            "first_name": "Carga", "last_name": "Prueba", "email": f"carga{i}@test.com",
+            "phone": "8888-0000", "country": "Costa Rica", "city": "Liberia",
+            "checkin_date": checkin.isoformat(), "checkout_date": (checkin + timedelta(days=1)).isoformat(),
+            "guests": 2, "room_type": ROOM_TYPES[i % len(ROOM_TYPES)],
+        }
+
+    def new_readings(i):
+        return {"readings": [
+            {"city": city, "temperature": 25 + i % 5, "description": "soleado", "humidity": 60}
+            for city in CITIES
+        ]}
+
+    return [
+        {"name": "GET /health", "method": "GET", "url": "/health"},
+        {"name": "GET /rooms", "method": "GET", "url": "/rooms"},
+        {"name": "GET /reservations", "method": "GET", "url": "/reservations?limit=100"},
+        {"name": "GET /api/stats/reservations", "method": "GET", "url": "/api/stats/reservations"},
+        {"name": "GET /api/cleaned-reservations", "method": "GET", "url": "/api/cleaned-reservations"},
+        {"name": "GET /api/weather-history", "method": "GET", "url": "/api/weather-history"},
+        {"name": "GET /api/weather-history (semana)", "method": "GET", "url": "/api/weather-history",
+         "params": week},
+        {"name": "GET /api/weather/{city}", "method": "GET", "url": "/api/weather/San José"},
+        {"name": "GET /api/dashboard/summary", "method": "GET", "url": "/api/dashboard/summary"},
+        {"name": "POST /reservations", "method": "POST", "url": "/reservations", "json": new_reservation,
+         "ok": {200, 409}},
+        {"name": "POST /api/weather/readings", "method": "POST", "url": "/api/weather/readings",
+         "json": new_readings},
+    ]
+
+async def _drive(client, scenario: Dict[str, Any], requests: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    ok = scenario.get("ok", {200})
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            body = scenario.get("json")
+            t0 = time.perf_counter()
+            response = await client.request(
+                scenario["method"], scenario["url"], params=scenario.get("params"),
+                json=body(i) if callable(body) else body,
+            )
+            latencies.append(time.perf_counter() - t0)
+            if response.status_code not in ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+async def run_load(main, requests: int, concurrency: int, warmup: int = 5,
+                   only: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    import httpx
+
+    results = {}
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+            for scenario in _scenarios(datetime.utcnow()):
+                if only and scenario["name"] not in only:
+                    continue
+                if scenario["method"] == "GET":
+                    # Calienta caché de clima, agregados y planes de consulta
+                    await _drive(client, scenario, warmup, 1)
+                results[scenario["name"]] = await _drive(client, scenario, requests, concurrency)
+    return results
+
+def _load_app(db_path: pathlib.Path):
+    """Importa el backend apuntando a la BD temporal (el import no toca la BD)"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("WEATHER_API_KEY", "demo_key")
+    sys.path.insert(0, str(ROOT))
+    import backend.main as main
+    return main
+
+def _print_table(results, baseline):
+    print(f"{'endpoint':36} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'base p95':>9}")
+    for name, r in results.items():
+        base = baseline.get(name, {}).get("p95_ms")
+        print(f"{name:36} {r['rps']:8.1f} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['p99_ms']:8.2f} "
+              f"{base if base is not None else '-':>9}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Peticiones por endpoint")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--reservations", type=int, default=5000, help="Reservas sembradas")
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("LOAD_TEST_THRESHOLD", "1.0")),
+                        help="Regresión tolerada del p95 (1.0 = +100 %%, el doble)")
+    parser.add_argument("--min-delta-ms", type=float, default=float(os.getenv("LOAD_TEST_MIN_DELTA_MS", "5")),
+                        help="Diferencia mínima de p95 para considerar regresión")
+    parser.add_argument("--baseline", type=pathlib.Path, default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true", help="Guarda los resultados como línea base")
+    parser.add_argument("--endpoint", action="append", dest="only", help="Solo este endpoint (repetible)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        main_module = _load_app(pathlib.Path(tmp) / "load.db")
+        main_module.prepare_database()
+        _seed(main_module, args.reservations, cleaned=args.reservations // 2, readings=2000)
+        results = asyncio.run(run_load(main_module, args.requests, args.concurrency, only=args.only))
+        main_module.engine.dispose()
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else {}
+    endpoints = baseline.get("endpoints", {})
+    print(f"\n📊 {args.requests} peticiones por endpoint, concurrencia {args.concurrency}, "
+          f"{args.reservations:,} reservas sembradas")
+    _print_table(results, endpoints)
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps({
+            "generated_at": datetime.utcnow().replace(microsecond=0).isoformat(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "reservations": args.reservations,
+            "endpoints": results,
+        }, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"💾 Línea base actualizada: {args.baseline}")
+        return 0
+
+    problems = compare(results, endpoints, args.threshold, args.min_delta_ms)
+    if not endpoints:
+        print(f"⚠️ Sin línea base en {args.baseline} (usar --update-baseline)")
+    if problems:
+        print("❌ Regresiones de latencia:")
+        for problem in problems:
+            print(f"   - {problem}")
+        return 1
+    print(f"✅ Sin regresiones (umbral +{args.threshold:.0%} sobre el p95)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
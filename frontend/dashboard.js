@@ -38,7 +38,7 @@ async function initializeDashboard() {
         console.log("🔄 Usando datos simulados como respaldo...");
         updateKPIs();
         createAllCharts();
-        startAutoUpdate();
+        startSimulatedUpdates();
     }
 }
 
@@ -54,40 +54,41 @@ let realData = {
     weather: null
 };
 
+// Todas las reservas: /reservations pagina de a 100; format=ndjson las
+// transmite todas, una por línea (el backend las lee por lotes)
+async function fetchAllReservations() {
+    const response = await fetch(`${API_BASE}/reservations?format=ndjson`);
+    if (!response.ok) {
+        throw new Error(`Error en reservas: ${response.status}`);
+    }
+    const text = await response.text();
+    return text.split('\n').filter(line => line.trim()).map(line => JSON.parse(line));
+}
+
 // Cargar datos reales del backend
 async function loadRealData() {
     console.log("🔗 Conectando con backend...");
     
     try {
-        // Verificar conectividad
-        const healthCheck = await fetch(`${API_BASE}/health`);
-        if (!healthCheck.ok) {
+        // Estadísticas y clima en un solo viaje (/api/dashboard/summary); las
+        // gráficas necesitan todas las reservas, no solo la primera página
+        console.log("📊 Cargando resumen del dashboard...");
+        const params = new URLSearchParams({ fields: 'stats,weather', city: 'San José' });
+        const [summaryResponse, reservations] = await Promise.all([
+            fetch(`${API_BASE}/api/dashboard/summary?${params}`),
+            fetchAllReservations(),
+        ]);
+        if (!summaryResponse.ok) {
             throw new Error('Backend no disponible');
         }
-        
-        // Cargar estadísticas
-        console.log("📊 Cargando estadísticas...");
-        const statsResponse = await fetch(`${API_BASE}/api/stats/reservations`);
-        if (statsResponse.ok) {
-            realData.stats = await statsResponse.json();
-            console.log("✅ Estadísticas cargadas:", realData.stats);
-        }
-        
-        // Cargar reservas
-        console.log("🏨 Cargando reservas...");
-        const reservationsResponse = await fetch(`${API_BASE}/reservations`);
-        if (reservationsResponse.ok) {
-            realData.reservations = await reservationsResponse.json();
-            console.log("✅ Reservas cargadas:", realData.reservations.length);
-        }
-        
-        // Cargar datos del clima
-        console.log("🌤️ Cargando clima...");
-        const weatherResponse = await fetch(`${API_BASE}/api/weather/${encodeURIComponent('San José')}`);
-        if (weatherResponse.ok) {
-            realData.weather = await weatherResponse.json();
-            console.log("✅ Clima cargado:", realData.weather);
+        const summary = await summaryResponse.json();
+        if (summary.errors) {
+            console.warn("⚠️ Secciones con error:", summary.errors);
         }
+        realData.stats = summary.stats;
+        realData.reservations = reservations;
+        realData.weather = summary.weather;
+        console.log("✅ Resumen cargado:", realData.reservations.length, "reservas", realData.stats, realData.weather);
         
         // Actualizar KPIs con datos reales
         updateKPIsWithRealData();
@@ -400,29 +401,56 @@ function createOriginChart() {
     });
 }
 
-// Iniciar actualización automática cada 30 segundos
+// Actualizaciones en vivo: el backend empuja los cambios por SSE
+// (/api/dashboard/stream) en lugar de consultar cada 30 segundos
+let dashboardStream = null;
+
 function startAutoUpdate() {
-    setInterval(async () => {
-        try {
-            console.log("🔄 Actualizando datos...");
-            
-            // Intentar cargar datos reales
-            const statsResponse = await fetch(`${API_BASE}/api/stats/reservations`);
-            if (statsResponse.ok) {
-                realData.stats = await statsResponse.json();
-                updateKPIsWithRealData();
-                showNotification('📊 Datos actualizados desde base de datos', 'info');
-            } else {
-                // Fallback a datos simulados
-                updateKPIs();
-                showNotification('📊 Datos simulados actualizados', 'info');
-            }
-        } catch (error) {
-            console.error("❌ Error actualizando datos:", error);
-            // Fallback a datos simulados
-            updateKPIs();
-            showNotification('📊 Usando datos simulados', 'warning');
+    if (typeof EventSource === 'undefined') {
+        startSimulatedUpdates();
+        return;
+    }
+    if (dashboardStream) return;
+
+    dashboardStream = new EventSource(`${API_BASE}/api/dashboard/stream`);
+
+    dashboardStream.addEventListener('snapshot', (e) => {
+        const data = JSON.parse(e.data);
+        if (data.stats) {
+            realData.stats = data.stats;
+            updateKPIsWithRealData();
         }
+    });
+
+    dashboardStream.addEventListener('reservations', (e) => {
+        const data = JSON.parse(e.data);
+        realData.stats = data.stats;
+        realData.reservations = data.reservations.concat(realData.reservations);
+        updateKPIsWithRealData();
+        showNotification(`📊 ${data.count} reserva(s) nueva(s)`, 'info');
+    });
+
+    dashboardStream.addEventListener('weather', (e) => {
+        const data = JSON.parse(e.data);
+        const reading = data.readings.find(r => r.city === 'San José') || data.readings[0];
+        if (reading) realData.weather = reading;
+    });
+
+    dashboardStream.addEventListener('cleaned_reservations', () => {
+        showNotification('🧹 Pipeline ETL: datos limpios actualizados', 'info');
+    });
+
+    // EventSource reconecta solo (retry del servidor); al volver llega un snapshot
+    dashboardStream.onerror = () => {
+        console.warn("⚠️ Conexión de actualizaciones en vivo interrumpida, reintentando...");
+    };
+}
+
+// Respaldo sin backend: datos simulados cada 30 segundos
+function startSimulatedUpdates() {
+    setInterval(() => {
+        updateKPIs();
+        showNotification('📊 Usando datos simulados', 'warning');
     }, 30000);
 }
 
@@ -338,12 +338,30 @@ function createOriginChart() {
     });
 }
 
-// Iniciar actualización automática cada 30 segundos
+// API endpoint (dinámico: local vs Docker/Nginx)
+const API_BASE = (location.hostname === 'localhost' || location.hostname === '127.0.0.1')
+    ? 'http://localhost:8000'
+    : '';
+
+// Actualizaciones en vivo por SSE; sin EventSource, refresco simulado cada 30 segundos
 function startAutoUpdate() {
-    setInterval(() => {
-        updateKPIs();
+    if (typeof EventSource === 'undefined') {
+        setInterval(() => {
+            updateKPIs();
+            showNotification('📊 Datos actualizados', 'info');
+        }, 30000);
+        return;
+    }
+    const stream = new EventSource(`${API_BASE}/api/dashboard/stream`);
+    const showStats = (e) => {
+        const data = JSON.parse(e.data);
+        if (data.stats) animateValue('bookings-value', data.stats.total_reservations);
+    };
+    stream.addEventListener('snapshot', showStats);
+    stream.addEventListener('reservations', (e) => {
+        showStats(e);
         showNotification('📊 Datos actualizados', 'info');
-    }, 30000);
+    });
 }
 
 // Funciones auxiliares para generar datos realistas
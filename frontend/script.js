@@ -503,7 +503,8 @@ document.addEventListener("DOMContentLoaded", () => {
   // Initialize title on first load inside changeProvince call
   changeProvince();
   
-  // Actualizar clima cada 10 minutos
+  // Actualizar clima cada 10 minutos (la página pública no abre el stream
+  // SSE del dashboard: lleva reservas y estadísticas internas)
   setInterval(() => {
     const select = document.getElementById('provinceSelect');
     const selectedProvince = select.value;
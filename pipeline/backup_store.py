@@ -0,0 +1,211 @@
+"""
+Backups columnares de cleaned_reservations
+
+- Parquet comprimido (zstd), particionado por mes de check-in:
+  backups/cleaned_reservations/checkin_month=AAAA-MM/part-<ejecución>-<n>.parquet
+- Escritura incremental: cada lote agrega un archivo nuevo en los meses que
+  toca, sin releer ni reescribir los anteriores; la lectura se queda con la
+  versión más reciente de cada original_id
+- Compactación: funde los archivos de un mes en data.parquet (automática
+  al superar ETL_BACKUP_MAX_PARTS archivos, o con ``compact``)
+- Restauración: lee los archivos con memory-map y los carga masivamente
+
+Uso (desde pipeline/):
+    python backup_store.py restore [--month 2026-05] [--root ruta]
+    python backup_store.py compact [--month 2026-05] [--root ruta]
+"""
+
+import os
+import argparse
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from loaders import bulk_upsert, bulk_replace
+
+# Relativo a este archivo: el mismo directorio desde la raíz del repo o desde pipeline/
+BACKUP_ROOT = os.getenv(
+    "ETL_BACKUP_ROOT",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "backups", "cleaned_reservations"),
+)
+BACKUP_COMPRESSION = os.getenv("ETL_BACKUP_COMPRESSION", "zstd")
+# Archivos por mes antes de compactarlo al escribir (0 = nunca)
+BACKUP_MAX_PARTS = int(os.getenv("ETL_BACKUP_MAX_PARTS", "32"))
+PARTITION_PREFIX = "checkin_month="
+# Resultado de la compactación; los lotes van en part-<ejecución>-<n>.parquet
+PARTITION_FILE = "data.parquet"
+PART_PREFIX = "part-"
+UNKNOWN_MONTH = "sin_fecha"
+
+
+def _partition_dir(root: str, month: str) -> Path:
+    return Path(root) / f"{PARTITION_PREFIX}{month}"
+
+
+def _partition_files(root: str, month: str) -> List[Path]:
+    """Archivos de un mes en orden de escritura: el compactado primero y
+    luego los lotes (el id de ejecución ordena cronológicamente)"""
+    directory = _partition_dir(root, month)
+    compacted = directory / PARTITION_FILE
+    parts = sorted(directory.glob(f"{PART_PREFIX}*.parquet"))
+    return ([compacted] if compacted.exists() else []) + parts
+
+
+def new_run_id() -> str:
+    """Identificador de ejecución para los nombres de archivo (ordenable)"""
+    return datetime.now().strftime("%Y%m%dT%H%M%S%f")
+
+
+def _checkin_months(df: pd.DataFrame) -> pd.Series:
+    return pd.to_datetime(df["checkin_date"]).dt.strftime("%Y-%m").fillna(UNKNOWN_MONTH)
+
+
+def _write_partition(path: Path, df: pd.DataFrame):
+    """Escribe a un temporal y renombra: una partición nunca queda a medias"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".parquet.tmp")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, tmp, compression=BACKUP_COMPRESSION)
+    os.replace(tmp, path)
+
+
+def write_partitions(df: pd.DataFrame, root: Optional[str] = None, run_id: Optional[str] = None) -> List[str]:
+    """Agrega ``df`` (esquema de cleaned_reservations) como un archivo nuevo
+    en cada mes de check-in que toca; no lee ni reescribe los archivos
+    existentes. Devuelve los meses escritos."""
+    root = root or BACKUP_ROOT
+    if df.empty:
+        return []
+    run_id = run_id or new_run_id()
+    months = _checkin_months(df)
+    touched = []
+    for month, part in df.groupby(months.to_numpy(), sort=True):
+        directory = _partition_dir(root, month)
+        seq = len(list(directory.glob(f"{PART_PREFIX}{run_id}-*.parquet")))
+        part = part.drop_duplicates("original_id", keep="last").sort_values("original_id")
+        _write_partition(directory / f"{PART_PREFIX}{run_id}-{seq:05d}.parquet", part)
+        touched.append(month)
+        if BACKUP_MAX_PARTS and len(_partition_files(root, month)) > BACKUP_MAX_PARTS:
+            compact_partitions(root, [month])
+    return touched
+
+
+def list_partitions(root: Optional[str] = None) -> List[str]:
+    """Meses con backup, en orden"""
+    root = root or BACKUP_ROOT
+    base = Path(root)
+    if not base.exists():
+        return []
+    return sorted(
+        p.name[len(PARTITION_PREFIX):]
+        for p in base.glob(f"{PARTITION_PREFIX}*")
+        if any(p.glob("*.parquet"))
+    )
+
+
+def _latest_versions(tables: List[pa.Table]) -> pd.DataFrame:
+    """Concatena en orden de escritura y conserva la versión procesada más
+    recientemente de cada original_id (a igualdad, la escrita después)"""
+    df = pa.concat_tables(tables, promote_options="default").to_pandas()
+    df = df.sort_values(["processed_at", "original_id"], kind="stable")
+    return df.drop_duplicates("original_id", keep="last").sort_values("original_id").reset_index(drop=True)
+
+
+def read_backup(root: Optional[str] = None, months: Optional[List[str]] = None) -> pd.DataFrame:
+    """Lee el backup con memory-map (todas las reservas o las de ``months``).
+
+    Una reserva puede aparecer en varios archivos (lotes posteriores o un
+    cambio de mes de check-in); se conserva la versión más reciente. Por eso
+    se deduplica sobre todas las particiones antes de filtrar por mes: si el
+    check-in cambió de mes, la versión nueva está en otra partición y la del
+    mes viejo no debe volver."""
+    root = root or BACKUP_ROOT
+    tables = [
+        pq.read_table(path, memory_map=True)
+        for month in list_partitions(root)
+        for path in _partition_files(root, month)
+    ]
+    if not tables:
+        return pd.DataFrame()
+    df = _latest_versions(tables)
+    if months is not None:
+        df = df[_checkin_months(df).isin(months)].reset_index(drop=True)
+    return df
+
+
+def compact_partitions(root: Optional[str] = None, months: Optional[List[str]] = None) -> List[str]:
+    """Funde los archivos de cada mes en su data.parquet y borra los
+    fundidos. Un lector concurrente puede ver el compactado y los lotes a la
+    vez: la deduplicación de la lectura lo cubre. Devuelve los meses compactados."""
+    root = root or BACKUP_ROOT
+    months = months if months is not None else list_partitions(root)
+    compacted = []
+    for month in months:
+        files = _partition_files(root, month)
+        if not any(path.name.startswith(PART_PREFIX) for path in files):
+            continue
+        merged = _latest_versions([pq.read_table(path, memory_map=True) for path in files])
+        target = _partition_dir(root, month) / PARTITION_FILE
+        _write_partition(target, merged)
+        for path in files:
+            if path != target:
+                path.unlink()
+        compacted.append(month)
+    return compacted
+
+
+def restore_backup(engine, root: Optional[str] = None, months: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Carga el backup en cleaned_reservations.
+
+    Sin ``months`` la tabla se reemplaza completa (staging + intercambio);
+    con ``months`` solo se fusionan por original_id las reservas cuya versión
+    más reciente tiene el check-in en esos meses."""
+    root = root or BACKUP_ROOT
+    df = read_backup(root, months)
+    if df.empty:
+        raise FileNotFoundError(f"No hay particiones de backup en {root}")
+    with engine.begin() as conn:
+        if months is None:
+            report = bulk_replace(conn, df)
+        else:
+            report = bulk_upsert(conn, df)
+    report["partitions"] = months if months is not None else list_partitions(root)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backups Parquet de cleaned_reservations")
+    sub = parser.add_subparsers(dest="command", required=True)
+    restore = sub.add_parser("restore", help="Restaura el backup en cleaned_reservations")
+    restore.add_argument("--month", action="append", dest="months",
+                         help="Mes AAAA-MM a restaurar (repetible); por defecto todos")
+    restore.add_argument("--root")
+    sub.add_parser("list", help="Lista las particiones disponibles").add_argument("--root")
+    compact = sub.add_parser("compact", help="Funde los archivos de cada mes en data.parquet")
+    compact.add_argument("--month", action="append", dest="months",
+                         help="Mes AAAA-MM a compactar (repetible); por defecto todos")
+    compact.add_argument("--root")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for month in list_partitions(args.root):
+            print(month)
+        return
+    if args.command == "compact":
+        months = compact_partitions(args.root, args.months)
+        print(f"✅ Compactadas {len(months)} particiones")
+        return
+
+    # Import diferido: etl_flow importa este módulo
+    from etl_flow import engine
+    report = restore_backup(engine, args.root, args.months)
+    print(f"✅ Restaurados {report['rows']} registros de {len(report['partitions'])} particiones "
+          f"en {report['seconds']}s ({report['rows_per_sec']} filas/s)")
+
+
+if __name__ == "__main__":
+    main()
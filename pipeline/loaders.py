@@ -0,0 +1,212 @@
+"""
+Cargadores masivos para cleaned_reservations
+
+- SQLite: INSERT multi-fila en lotes ajustados al límite de variables
+- MySQL: LOAD DATA LOCAL INFILE (opcional) o executemany con sentencia preparada
+- Los datos se cargan primero en una tabla staging y luego se fusionan
+  (upsert por original_id) o se intercambian con la tabla final
+- Cada carga incrementa la versión de la tabla en data_versions (ETag de
+  los GET del backend) dentro de la misma transacción
+"""
+
+import os
+import time
+import tempfile
+from typing import Any, Dict, List, Sequence
+
+import pandas as pd
+from sqlalchemy import inspect, text
+
+TARGET_TABLE = "cleaned_reservations"
+UPSERT_KEY = "original_id"
+
+# SQLite >= 3.32 admite 32766 variables por sentencia
+SQLITE_MAX_VARIABLES = int(os.getenv("SQLITE_MAX_VARIABLES", "32766"))
+SQLITE_ROWS_PER_INSERT = int(os.getenv("SQLITE_ROWS_PER_INSERT", "500"))
+MYSQL_BATCH_SIZE = int(os.getenv("MYSQL_BATCH_SIZE", "5000"))
+# Requiere local_infile=1 en el servidor y en el cliente
+MYSQL_LOAD_DATA = os.getenv("ETL_MYSQL_LOAD_DATA", "0") == "1"
+VERSIONS_TABLE = "data_versions"
+# Formato por defecto de LOAD DATA: tabuladores, '\' como escape y \N = NULL
+MYSQL_NULL = "\\N"
+MYSQL_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r", "\0": "\\0"})
+
+
+def frame_to_rows(df: pd.DataFrame) -> List[tuple]:
+    """Convierte el DataFrame a tuplas con tipos nativos de Python (None para nulos)"""
+    columns = []
+    for name in df.columns:
+        series = df[name]
+        if pd.api.types.is_datetime64_dtype(series):
+            values = series.to_numpy().astype("datetime64[us]").astype(object)
+        else:
+            values = series.astype(object).to_numpy()
+        values[series.isna().to_numpy()] = None
+        columns.append(values)
+    return list(zip(*columns))
+
+
+def _dialect(conn) -> str:
+    return conn.dialect.name
+
+
+def _sqlite_rows_per_insert(n_columns: int) -> int:
+    return max(1, min(SQLITE_ROWS_PER_INSERT, SQLITE_MAX_VARIABLES // max(1, n_columns)))
+
+
+def _insert_sqlite(cursor, table: str, columns: Sequence[str], rows: List[tuple]):
+    """INSERT multi-fila: una sentencia preparada por lote completo"""
+    per_insert = _sqlite_rows_per_insert(len(columns))
+    placeholders = "(" + ", ".join("?" * len(columns)) + ")"
+    head = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+    full_stmt = head + ", ".join([placeholders] * per_insert)
+    full = len(rows) - len(rows) % per_insert
+    for start in range(0, full, per_insert):
+        batch = rows[start:start + per_insert]
+        cursor.execute(full_stmt, [value for row in batch for value in row])
+    rest = rows[full:]
+    if rest:
+        cursor.execute(head + ", ".join([placeholders] * len(rest)), [value for row in rest for value in row])
+
+
+def _insert_mysql_executemany(cursor, table: str, columns: Sequence[str], rows: List[tuple]):
+    """executemany: el driver reescribe el INSERT preparado como multi-fila"""
+    stmt = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    for start in range(0, len(rows), MYSQL_BATCH_SIZE):
+        cursor.executemany(stmt, rows[start:start + MYSQL_BATCH_SIZE])
+
+
+def mysql_load_data_line(row: tuple) -> str:
+    """Una fila en el formato por defecto de LOAD DATA. El marcador de NULL
+    va sin escapar (escapado, MySQL cargaría el texto literal "\\N")."""
+    return "\t".join(
+        MYSQL_NULL if value is None else str(value).translate(MYSQL_ESCAPES) for value in row
+    ) + "\n"
+
+
+def _insert_mysql_load_data(cursor, table: str, columns: Sequence[str], rows: List[tuple]):
+    """LOAD DATA LOCAL INFILE desde un archivo temporal (\\N = NULL)"""
+    with tempfile.NamedTemporaryFile("w", suffix=".tsv", newline="", encoding="utf-8", delete=False) as tmp:
+        tmp.writelines(mysql_load_data_line(row) for row in rows)
+        path = tmp.name
+    try:
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE {table} CHARACTER SET utf8mb4 "
+            "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' "
+            f"LINES TERMINATED BY '\\n' ({', '.join(columns)})"
+        )
+    finally:
+        os.unlink(path)
+
+
+def bulk_insert(conn, table: str, df: pd.DataFrame) -> str:
+    """Inserta el DataFrame con la vía rápida del dialecto; devuelve el método usado"""
+    columns = list(df.columns)
+    rows = frame_to_rows(df)
+    if not rows:
+        return "none"
+    cursor = conn.connection.cursor()
+    try:
+        if _dialect(conn) == "sqlite":
+            _insert_sqlite(cursor, table, columns, rows)
+            return "sqlite-multirow"
+        if _dialect(conn) == "mysql":
+            if MYSQL_LOAD_DATA:
+                try:
+                    _insert_mysql_load_data(cursor, table, columns, rows)
+                    return "mysql-load-data"
+                except Exception as e:
+                    print(f"⚠️ LOAD DATA no disponible, usando executemany: {e}")
+            _insert_mysql_executemany(cursor, table, columns, rows)
+            return "mysql-executemany"
+    finally:
+        cursor.close()
+    df.to_sql(table, conn, if_exists="append", index=False, method="multi", chunksize=1000)
+    return "pandas-multi"
+
+
+def bump_data_version(conn, table: str):
+    """Incrementa la versión de ``table``; no hace nada si el backend aún no
+    creó data_versions (migración 4)"""
+    if not inspect(conn).has_table(VERSIONS_TABLE):
+        return
+    updated = conn.execute(
+        text(f"UPDATE {VERSIONS_TABLE} SET version = version + 1 WHERE name = :t"), {"t": table}
+    )
+    if updated.rowcount == 0:
+        conn.execute(text(f"INSERT INTO {VERSIONS_TABLE} (name, version) VALUES (:t, 1)"), {"t": table})
+
+
+def _report(method: str, rows: int, started: float) -> Dict[str, Any]:
+    seconds = time.perf_counter() - started
+    return {
+        "method": method,
+        "rows": rows,
+        "seconds": round(seconds, 4),
+        "rows_per_sec": round(rows / seconds) if seconds > 0 else rows,
+    }
+
+
+def bulk_upsert(conn, df: pd.DataFrame, target: str = TARGET_TABLE, key: str = UPSERT_KEY) -> Dict[str, Any]:
+    """Carga en una tabla staging temporal y fusiona con ``target`` por ``key``.
+
+    Todo ocurre en la transacción de ``conn``: las filas previas con la
+    misma clave se reemplazan por las nuevas (idempotente)."""
+    started = time.perf_counter()
+    if df.empty:
+        return _report("none", 0, started)
+    columns = ", ".join(df.columns)
+    staging = f"{target}_staging"
+    if _dialect(conn) == "mysql":
+        conn.execute(text(f"DROP TEMPORARY TABLE IF EXISTS {staging}"))
+        conn.execute(text(f"CREATE TEMPORARY TABLE {staging} SELECT {columns} FROM {target} WHERE 1 = 0"))
+    else:
+        conn.execute(text(f"DROP TABLE IF EXISTS temp.{staging}"))
+        conn.execute(text(f"CREATE TEMP TABLE {staging} AS SELECT {columns} FROM {target} WHERE 1 = 0"))
+
+    method = bulk_insert(conn, staging, df)
+    conn.execute(text(f"DELETE FROM {target} WHERE {key} IN (SELECT {key} FROM {staging})"))
+    conn.execute(text(f"INSERT INTO {target} ({columns}) SELECT {columns} FROM {staging}"))
+    conn.execute(text(f"DROP {'TEMPORARY ' if _dialect(conn) == 'mysql' else ''}TABLE {staging}"))
+    bump_data_version(conn, target)
+    return _report(method, len(df), started)
+
+
+def bulk_replace(conn, df: pd.DataFrame, target: str = TARGET_TABLE) -> Dict[str, Any]:
+    """Carga completa: llena una copia vacía de ``target`` y la intercambia.
+
+    La tabla final nunca queda a medio cargar y todo ocurre en la
+    transacción de ``conn`` (junto con la marca de agua del ETL). En SQLite
+    el DDL es transaccional y los índices secundarios se recrean sobre la
+    tabla nueva; en MySQL el DDL confirma implícitamente, así que la copia
+    es una tabla TEMPORARY y el intercambio es DELETE + INSERT ... SELECT."""
+    started = time.perf_counter()
+    staging = f"{target}_staging"
+    columns = list(df.columns)
+    if _dialect(conn) == "mysql":
+        names = ", ".join(columns)
+        conn.execute(text(f"DROP TEMPORARY TABLE IF EXISTS {staging}"))
+        conn.execute(text(f"CREATE TEMPORARY TABLE {staging} LIKE {target}"))
+        method = bulk_insert(conn, staging, df[columns])
+        conn.execute(text(f"DELETE FROM {target}"))
+        conn.execute(text(f"INSERT INTO {target} ({names}) SELECT {names} FROM {staging}"))
+        conn.execute(text(f"DROP TEMPORARY TABLE {staging}"))
+        bump_data_version(conn, target)
+        return _report(method, len(df), started)
+
+    ddl = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :t"), {"t": target}
+    ).scalar_one()
+    index_ddl = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = :t AND sql IS NOT NULL"),
+        {"t": target},
+    ).scalars().all()
+    conn.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+    conn.execute(text(ddl.replace(target, staging, 1)))
+    method = bulk_insert(conn, staging, df[columns])
+    conn.execute(text(f"DROP TABLE {target}"))
+    conn.execute(text(f"ALTER TABLE {staging} RENAME TO {target}"))
+    for statement in index_ddl:
+        conn.execute(text(statement))
+    bump_data_version(conn, target)
+    return _report(method, len(df), started)
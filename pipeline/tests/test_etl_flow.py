@@ -0,0 +1,377 @@
+import os
+import sys
+import pathlib
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[2]))
+
+import etl_flow
+import loaders
+import backup_store
+import pandas as pd
+from backend.main import Base, Reservation
+
+@pytest.fixture
+def etl_engine(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'etl.db'}")
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(etl_flow, "engine", engine)
+    # Keyset exacto salvo en los tests de la ventana de relectura
+    monkeypatch.setattr(etl_flow, "ETL_WATERMARK_LAG", timedelta(0))
+    return engine
+
+@pytest.fixture
+def backup_root(tmp_path, monkeypatch):
+    root = tmp_path / "backups"
+    monkeypatch.setattr(backup_store, "BACKUP_ROOT", str(root))
+    # El log de calidad va a pipeline/logs relativo al cwd: también a tmp
+    monkeypatch.chdir(tmp_path)
+    return root
+
+def _insert_reservations(engine, start, count, created_at=None):
+    rows = [
+        {
+            "first_name": f" ana{i} ", "last_name": "pérez", "email": f"Ana{i}@Test.com",
+            "phone": "8888", "country": "costa rica", "city": "san josé",
+            "checkin_date": date(2026, 5, 1), "checkout_date": date(2026, 5, 3),
+            "guests": 2, "room_type": "Suite", "comments": None,
+            "created_at": created_at or datetime(2026, 4, 1, 12, 0, 0) + timedelta(seconds=i),
+        }
+        for i in range(start, start + count)
+    ]
+    with engine.begin() as conn:
+        conn.execute(Reservation.__table__.insert(), rows)
+
+def _run_once(full_refresh=False):
+    raw, watermark = etl_flow.extract_raw_reservations.fn(full_refresh)
+    clean, metrics = etl_flow.clean_and_validate_data.fn(raw)
+    loaded = etl_flow.load_cleaned_data.fn(clean, watermark)
+    return len(raw), loaded
+
+def _cleaned_count(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT COUNT(*), COUNT(DISTINCT original_id) FROM cleaned_reservations")).one()
+
+def test_incremental_runs_only_extract_delta(etl_engine):
+    _insert_reservations(etl_engine, 0, 3)
+    assert _run_once() == (3, 3)
+    assert _run_once() == (0, 0)
+
+    _insert_reservations(etl_engine, 3, 2)
+    assert _run_once() == (2, 2)
+    assert tuple(_cleaned_count(etl_engine)) == (5, 5)
+
+def test_same_timestamp_rows_are_not_skipped(etl_engine):
+    moment = datetime(2026, 4, 2, 8, 30)
+    _insert_reservations(etl_engine, 0, 2, created_at=moment)
+    assert _run_once() == (2, 2)
+    _insert_reservations(etl_engine, 2, 1, created_at=moment)
+    assert _run_once() == (1, 1)
+
+def test_lag_window_picks_up_late_commits(etl_engine, monkeypatch):
+    monkeypatch.setattr(etl_flow, "ETL_WATERMARK_LAG", timedelta(minutes=10))
+    _insert_reservations(etl_engine, 0, 3, created_at=datetime(2026, 4, 1, 12, 0))
+    assert _run_once() == (3, 3)
+    # Confirmada después de la ejecución, pero con created_at anterior a la marca
+    _insert_reservations(etl_engine, 3, 1, created_at=datetime(2026, 4, 1, 11, 55))
+    _insert_reservations(etl_engine, 4, 1, created_at=datetime(2026, 4, 1, 11, 0))
+    raw, watermark = etl_flow.extract_raw_reservations.fn()
+    # La ventana relee las 3 ya cargadas (upsert) y recoge la tardía; la
+    # anterior a la ventana queda fuera
+    assert sorted(raw["id"]) == [1, 2, 3, 4]
+    assert watermark == (datetime(2026, 4, 1, 12, 0), 3)
+    clean, _ = etl_flow.clean_and_validate_data.fn(raw)
+    etl_flow.load_cleaned_data.fn(clean, watermark)
+    assert tuple(_cleaned_count(etl_engine)) == (4, 4)
+
+def test_full_refresh_is_idempotent(etl_engine):
+    _insert_reservations(etl_engine, 0, 4)
+    _run_once()
+    assert _run_once(full_refresh=True) == (4, 4)
+    assert tuple(_cleaned_count(etl_engine)) == (4, 4)
+
+def test_streaming_mode_processes_in_chunks(etl_engine, backup_root):
+    _insert_reservations(etl_engine, 0, 7)
+    with etl_engine.begin() as conn:
+        conn.execute(text("UPDATE reservations SET email = 'sin-arroba' WHERE id = 3"))
+
+    result = etl_flow.run_streaming_etl.fn(chunksize=3)
+    assert result["chunks"] == 3
+    assert result["loaded_count"] == 6
+    metrics = result["quality_metrics"]
+    assert metrics["records_initial"] == 7 and metrics["records_with_invalid_emails"] == 1
+    assert metrics["data_quality_score"] == round(6 / 7 * 100, 2)
+
+    assert result["backup_file"] == str(backup_root)
+    backup = backup_store.read_backup(result["backup_file"])
+    assert len(backup) == 6 and 3 not in set(backup["original_id"])
+    # Un archivo nuevo por lote, sin reescribir los anteriores
+    parts = sorted(p.name for p in (backup_root / "checkin_month=2026-05").iterdir())
+    assert len(parts) == 3 and len({name.rsplit("-", 1)[0] for name in parts}) == 1
+    assert parts[-1].endswith("-00002.parquet")
+    assert etl_flow.run_streaming_etl.fn(chunksize=3)["loaded_count"] == 0
+
+def test_cleaning_metrics_and_per_record_scores():
+    import pandas as pd
+    raw = pd.DataFrame({
+        "id": [1, 2, 3, 4, 5, 6],
+        "first_name": [" ana ", None, "luis", "  ", "eva", "sol"],
+        "last_name": ["pérez", "mora", "soto", "rojas", "vega", "luna"],
+        "email": ["Ana@Test.com ", "x@y.com", "sin-arroba", "r@y.com", "e@y.com", "s@y.com"],
+        "phone": ["8888", "8888", "8888", "8888", None, "8888"],
+        "country": ["costa rica"] * 6,
+        "city": ["san josé", "liberia", "cartago", None, "heredia", "limón"],
+        "checkin_date": ["2026-01-01"] * 6,
+        "checkout_date": ["2026-01-03", "2026-01-03", "2026-01-03", "2026-01-03", "2026-01-03", "2025-12-31"],
+        "guests": [2, 2, 2, 2, 2, 2],
+    })
+    clean, metrics = etl_flow.clean_and_validate_data.fn(raw)
+
+    assert metrics["records_with_null_names"] == 2
+    assert metrics["records_with_invalid_emails"] == 1
+    assert metrics["records_with_invalid_dates"] == 1
+    assert list(clean["id"]) == [1, 4, 5]
+    assert clean.loc[0, "first_name"] == "Ana" and clean.loc[0, "email"] == "ana@test.com"
+    rules = len(etl_flow.QUALITY_RULES)
+    assert list(clean["data_quality_score"]) == [1.0, round(1 - 2 / rules, 2), round(1 - 1 / rules, 2)]
+
+def test_parallel_mode_matches_sequential(etl_engine, backup_root, monkeypatch):
+    _insert_reservations(etl_engine, 0, 9)
+    with etl_engine.begin() as conn:
+        conn.execute(text("UPDATE reservations SET guests = 20 WHERE id IN (2, 7)"))
+    backup_writes = []
+    write_partitions = backup_store.write_partitions
+    monkeypatch.setattr(backup_store, "write_partitions",
+                        lambda df, root=None, run_id=None:
+                        backup_writes.append(len(df)) or write_partitions(df, root, run_id))
+
+    result = etl_flow.run_parallel_etl.fn(workers=2)
+    assert 1 < result["partitions"] <= 4
+    assert result["loaded_count"] == 7
+    assert result["quality_metrics"]["records_initial"] == 9
+    assert tuple(_cleaned_count(etl_engine)) == (7, 7)
+    # Un solo backup por ejecución, con todas las particiones
+    assert backup_writes == [7]
+
+    # La marca de agua avanzó hasta la última reserva
+    assert _run_once() == (0, 0)
+
+def test_parallel_mode_writes_backup_while_loading(etl_engine, backup_root, monkeypatch):
+    import threading
+    _insert_reservations(etl_engine, 0, 6)
+    backup_started = threading.Event()
+    overlapped = []
+    write_partitions = backup_store.write_partitions
+    write_watermark = etl_flow.write_watermark
+
+    def tracked_backup(df, root=None, run_id=None):
+        backup_started.set()
+        return write_partitions(df, root, run_id)
+
+    def watermark_waits_for_backup(conn, watermark):
+        # En serie el backup empezaría después de la marca y esto vencería
+        overlapped.append(backup_started.wait(5))
+        write_watermark(conn, watermark)
+
+    monkeypatch.setattr(backup_store, "write_partitions", tracked_backup)
+    monkeypatch.setattr(etl_flow, "write_watermark", watermark_waits_for_backup)
+    result = etl_flow.run_parallel_etl.fn(workers=2)
+    assert overlapped == [True]
+    assert os.path.exists(result["log_file"])
+    assert _run_once() == (0, 0)
+
+def test_parallel_full_refresh_replaces_table(etl_engine, backup_root):
+    _insert_reservations(etl_engine, 0, 6)
+    etl_flow.run_parallel_etl.fn(workers=2)
+    with etl_engine.begin() as conn:
+        conn.execute(text("DELETE FROM reservations WHERE id IN (1, 4)"))
+
+    result = etl_flow.run_parallel_etl.fn(workers=2, full_refresh=True)
+    assert result["loaded_count"] == 4
+    # Las reservas borradas en origen desaparecen (un upsert las dejaría)
+    assert tuple(_cleaned_count(etl_engine)) == (4, 4)
+    assert _run_once() == (0, 0)
+
+def test_plan_id_partitions_covers_delta(etl_engine):
+    _insert_reservations(etl_engine, 0, 10)
+    with etl_engine.connect() as conn:
+        ranges = etl_flow.plan_id_partitions(conn, (None, None), 3)
+    assert ranges[0][0] == 1 and ranges[-1][1] == 10
+    assert all(a[1] + 1 == b[0] for a, b in zip(ranges, ranges[1:]))
+
+def test_bulk_upsert_merges_by_original_id_without_mutating_input(etl_engine):
+    _insert_reservations(etl_engine, 0, 1203)
+    raw, _ = etl_flow.extract_raw_reservations.fn()
+    clean, _ = etl_flow.clean_and_validate_data.fn(raw)
+    frame = etl_flow._prepare_cleaned_frame(clean)
+    snapshot = frame.copy()
+
+    with etl_engine.begin() as conn:
+        report = loaders.bulk_upsert(conn, frame)
+    assert report["method"] == "sqlite-multirow" and report["rows"] == 1203
+    assert report["rows_per_sec"] > 0
+    pd.testing.assert_frame_equal(frame, snapshot)
+
+    frame.loc[frame["original_id"] == 1, "first_name"] = "Cambiado"
+    with etl_engine.begin() as conn:
+        loaders.bulk_upsert(conn, frame.head(10))
+    assert tuple(_cleaned_count(etl_engine)) == (1203, 1203)
+    with etl_engine.connect() as conn:
+        row = conn.execute(text(
+            "SELECT first_name, checkin_date, processed_at FROM cleaned_reservations WHERE original_id = 1"
+        )).one()
+        tables = conn.execute(text("SELECT name FROM sqlite_master WHERE name LIKE '%staging%'")).all()
+    assert row.first_name == "Cambiado" and row.checkin_date == "2026-05-01"
+    assert datetime.fromisoformat(row.processed_at)
+    assert tables == []
+
+def test_full_refresh_swaps_staging_table(etl_engine):
+    with etl_engine.begin() as conn:
+        conn.execute(text("CREATE INDEX ix_cleaned_processed ON cleaned_reservations (processed_at)"))
+    _insert_reservations(etl_engine, 0, 5)
+    _run_once()
+    with etl_engine.begin() as conn:
+        conn.execute(text("DELETE FROM reservations WHERE id = 5"))
+
+    raw, watermark = etl_flow.extract_raw_reservations.fn(full_refresh=True)
+    clean, _ = etl_flow.clean_and_validate_data.fn(raw)
+    assert etl_flow.load_cleaned_data.fn(clean, watermark, replace=True) == 4
+    assert tuple(_cleaned_count(etl_engine)) == (4, 4)
+    with etl_engine.connect() as conn:
+        names = {r.name for r in conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE tbl_name = 'cleaned_reservations'"
+        ))}
+        ids = conn.execute(text("SELECT id FROM cleaned_reservations ORDER BY id")).scalars().all()
+    assert "ix_cleaned_processed" in names
+    assert ids == [1, 2, 3, 4]
+    # Cada carga (upsert y recarga) invalida los ETag del backend
+    with etl_engine.connect() as conn:
+        version = conn.execute(text(
+            "SELECT version FROM data_versions WHERE name = 'cleaned_reservations'"
+        )).scalar()
+    assert version == 2
+
+def test_mysql_load_data_lines_keep_nulls_and_escape():
+    line = loaders.mysql_load_data_line((1, None, "a\tb\\N", "línea\nnueva", date(2026, 5, 1)))
+    # NULL sin escapar; los separadores y '\' del texto, escapados
+    assert line == "1\t\\N\ta\\tb\\\\N\tlínea\\nnueva\t2026-05-01\n"
+
+def test_mysql_bulk_replace_runs_without_implicit_commits(monkeypatch):
+    from types import SimpleNamespace
+    statements = []
+    conn = SimpleNamespace(dialect=SimpleNamespace(name="mysql"),
+                           execute=lambda stmt, *args: statements.append(str(stmt)))
+    monkeypatch.setattr(loaders, "bulk_insert", lambda conn, table, df: statements.append(f"LOAD {table}") or "fake")
+    monkeypatch.setattr(loaders, "bump_data_version", lambda conn, table: None)
+
+    loaders.bulk_replace(conn, pd.DataFrame({"original_id": [1, 2], "first_name": ["Ana", "Eva"]}))
+    assert statements == [
+        "DROP TEMPORARY TABLE IF EXISTS cleaned_reservations_staging",
+        "CREATE TEMPORARY TABLE cleaned_reservations_staging LIKE cleaned_reservations",
+        "LOAD cleaned_reservations_staging",
+        "DELETE FROM cleaned_reservations",
+        "INSERT INTO cleaned_reservations (original_id, first_name) "
+        "SELECT original_id, first_name FROM cleaned_reservations_staging",
+        "DROP TEMPORARY TABLE cleaned_reservations_staging",
+    ]
+
+@pytest.mark.skipif(not os.getenv("TEST_MYSQL_URL"), reason="TEST_MYSQL_URL no definido")
+def test_mysql_load_data_and_replace_roll_back_together(monkeypatch):
+    engine = create_engine(os.environ["TEST_MYSQL_URL"], connect_args={"allow_local_infile": True})
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(loaders, "MYSQL_LOAD_DATA", True)
+    frame = pd.DataFrame({"original_id": [1, 2], "first_name": ["Ana", "Eva\\N"], "comments": [None, "con\ttab"]})
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM cleaned_reservations"))
+            assert loaders.bulk_upsert(conn, frame)["method"] == "mysql-load-data"
+        with engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT first_name, comments FROM cleaned_reservations ORDER BY original_id")).all()
+        assert [tuple(r) for r in rows] == [("Ana", None), ("Eva\\N", "con\ttab")]
+
+        # La recarga completa no confirma nada si la transacción falla después
+        with pytest.raises(RuntimeError):
+            with engine.begin() as conn:
+                loaders.bulk_replace(conn, frame.head(1))
+                raise RuntimeError("falla antes de la marca de agua")
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT COUNT(*) FROM cleaned_reservations")).scalar() == 2
+    finally:
+        engine.dispose()
+
+def test_backup_partitions_by_month_and_restores(etl_engine, backup_root):
+    _insert_reservations(etl_engine, 0, 4)
+    with etl_engine.begin() as conn:
+        conn.execute(text("UPDATE reservations SET checkin_date = '2026-06-10', checkout_date = '2026-06-12' WHERE id = 4"))
+    raw, watermark = etl_flow.extract_raw_reservations.fn()
+    clean, _ = etl_flow.clean_and_validate_data.fn(raw)
+    etl_flow.load_cleaned_data.fn(clean, watermark)
+    assert etl_flow.write_backup_chunk(clean) == ["2026-05", "2026-06"]
+
+    # Cada lote agrega un archivo en sus meses; los existentes no se tocan
+    may, june = backup_root / "checkin_month=2026-05", backup_root / "checkin_month=2026-06"
+    first_may = sorted(may.iterdir())
+    first_may_mtime = first_may[0].stat().st_mtime_ns
+    june_files = sorted(june.iterdir())
+    assert etl_flow.write_backup_chunk(clean.head(2)) == ["2026-05"]
+    assert len(list(may.iterdir())) == 2 and first_may[0].stat().st_mtime_ns == first_may_mtime
+    assert sorted(june.iterdir()) == june_files
+    assert backup_store.list_partitions() == ["2026-05", "2026-06"]
+    assert len(backup_store.read_backup()) == 4
+
+    # La compactación deja un archivo por mes con las mismas filas
+    assert backup_store.compact_partitions() == ["2026-05", "2026-06"]
+    assert [p.name for p in may.iterdir()] == ["data.parquet"]
+    assert len(backup_store.read_backup()) == 4
+
+    with etl_engine.begin() as conn:
+        conn.execute(text("DELETE FROM cleaned_reservations"))
+    report = backup_store.restore_backup(etl_engine)
+    assert report["rows"] == 4 and report["partitions"] == ["2026-05", "2026-06"]
+    with etl_engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT original_id, checkin_date, guests FROM cleaned_reservations ORDER BY original_id"
+        )).all()
+    assert [r.original_id for r in rows] == [1, 2, 3, 4]
+    assert rows[3].checkin_date == "2026-06-10" and rows[0].guests == 2
+
+def test_restore_month_skips_reservation_moved_to_another_month(etl_engine, backup_root):
+    _insert_reservations(etl_engine, 0, 3)
+    raw, _ = etl_flow.extract_raw_reservations.fn()
+    clean, _ = etl_flow.clean_and_validate_data.fn(raw)
+    etl_flow.write_backup_chunk(clean)
+
+    # La reserva 2 pasa a junio en un lote posterior: su versión nueva vive
+    # en otra partición y la de mayo queda obsoleta
+    moved = clean[clean["id"] == 2].copy()
+    moved["checkin_date"] = pd.Timestamp("2026-06-10")
+    moved["checkout_date"] = pd.Timestamp("2026-06-12")
+    moved["processed_at"] = clean["processed_at"].max() + timedelta(seconds=1)
+    assert etl_flow.write_backup_chunk(moved) == ["2026-06"]
+
+    assert list(backup_store.read_backup(months=["2026-05"])["original_id"]) == [1, 3]
+    report = backup_store.restore_backup(etl_engine, months=["2026-05"])
+    assert report["rows"] == 2
+    report = backup_store.restore_backup(etl_engine, months=["2026-06"])
+    assert report["rows"] == 1
+    with etl_engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT original_id, checkin_date FROM cleaned_reservations ORDER BY original_id"
+        )).all()
+    assert [r.original_id for r in rows] == [1, 2, 3]
+    assert rows[1].checkin_date == "2026-06-10"
+
+def test_backup_compacts_month_after_max_parts(etl_engine, backup_root, monkeypatch):
+    monkeypatch.setattr(backup_store, "BACKUP_MAX_PARTS", 2)
+    _insert_reservations(etl_engine, 0, 3)
+    raw, _ = etl_flow.extract_raw_reservations.fn()
+    clean, _ = etl_flow.clean_and_validate_data.fn(raw)
+    for i in range(3):
+        etl_flow.write_backup_chunk(clean.iloc[[i]])
+    assert [p.name for p in (backup_root / "checkin_month=2026-05").iterdir()] == ["data.parquet"]
+    assert list(backup_store.read_backup()["original_id"]) == [1, 2, 3]
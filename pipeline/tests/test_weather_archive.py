@@ -0,0 +1,54 @@
+import sys
+import pathlib
+from datetime import datetime, timezone
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from weather_archive import WeatherArchive
+
+def _ts(day, hour):
+    return datetime(2026, 3, day, hour, tzinfo=timezone.utc).timestamp()
+
+def _sweep(archive, day, hour):
+    archive.append([{"city": "Liberia", "temp": hour}, {"city": "Cartago", "temp": -hour}], ts=_ts(day, hour))
+
+def test_daily_rotation_compresses_previous_segment(tmp_path):
+    archive = WeatherArchive(tmp_path, retention_days=0)
+    for hour in range(0, 24, 6):
+        _sweep(archive, 1, hour)
+    _sweep(archive, 2, 0)
+
+    files = sorted(p.name for p in tmp_path.iterdir())
+    assert "weather-20260301.jsonl.gz" in files and "weather-20260301.jsonl" not in files
+    assert "weather-20260302.jsonl" in files
+    assert archive.segments["20260301"]["compressed"] is True
+
+    # El manifiesto permite reabrir sin listar el directorio
+    reopened = WeatherArchive(tmp_path, retention_days=0)
+    assert reopened.segments == archive.segments
+
+def test_time_range_read_uses_offset_index(tmp_path):
+    archive = WeatherArchive(tmp_path, retention_days=0)
+    for day in (1, 2):
+        for hour in range(24):
+            _sweep(archive, day, hour)
+    archive.rotate("20260303")
+
+    records = list(archive.read(_ts(1, 22), _ts(2, 1), city="Liberia"))
+    assert [r["temp"] for r in records] == [22, 23, 0, 1]
+    assert len(list(archive.read(_ts(2, 23), _ts(2, 23)))) == 2
+    assert list(archive.read(_ts(5, 0), _ts(6, 0))) == []
+
+def test_retention_by_age_and_size(tmp_path):
+    archive = WeatherArchive(tmp_path, retention_days=2)
+    for day in range(1, 6):
+        _sweep(archive, day, 12)
+    # Al rotar al día 5 se descartan los segmentos anteriores al día 3
+    assert sorted(archive.segments) == ["20260303", "20260304", "20260305"]
+    assert not (tmp_path / "weather-20260301.jsonl.gz").exists()
+    assert not (tmp_path / "weather-20260301.idx").exists()
+
+    archive.max_bytes = archive.segments["20260305"]["bytes"] + 1
+    archive.retention_days = 0
+    assert archive.apply_retention("20260305") == ["20260303", "20260304"]
+    assert sorted(archive.segments) == ["20260305"]
@@ -0,0 +1,122 @@
+import sys
+import json
+import time
+import asyncio
+import pathlib
+
+import httpx
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from weather_service import WeatherService, TokenBucket, CITY_MAPPING
+
+def _reading(city, temp=25.0):
+    return {"name": city, "main": {"temp": temp, "humidity": 70},
+            "weather": [{"description": "soleado"}]}
+
+def _service(tmp_path, handler, **kwargs):
+    kwargs.setdefault("backoff", 0.01)
+    return WeatherService(api_key="test", backup_dir=str(tmp_path),
+                          transport=httpx.MockTransport(handler), **kwargs)
+
+def test_sweep_runs_cities_concurrently(tmp_path):
+    # Las siete ciudades por defecto caben en una sola ronda
+    cities = list(CITY_MAPPING)
+
+    async def handler(request):
+        await asyncio.sleep(0.2)
+        return httpx.Response(200, json=_reading(request.url.params["q"]))
+
+    async def scenario():
+        service = _service(tmp_path, handler, cities=cities)
+        assert service.max_concurrency == len(cities)
+        try:
+            started = time.perf_counter()
+            readings = await service.collect_all()
+            return readings, time.perf_counter() - started
+        finally:
+            await service.aclose()
+
+    readings, elapsed = asyncio.run(scenario())
+    assert list(readings) == cities
+    assert readings["Liberia"]["name"] == "Liberia"
+    # Un barrido dura lo que la llamada más lenta, no la suma ni dos rondas
+    assert elapsed < 0.38
+
+def test_concurrency_limit_is_respected(tmp_path):
+    active = {"now": 0, "max": 0}
+
+    async def handler(request):
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        await asyncio.sleep(0.05)
+        active["now"] -= 1
+        return httpx.Response(200, json=_reading("x"))
+
+    async def scenario():
+        service = _service(tmp_path, handler, cities=[f"c{i}" for i in range(8)], max_concurrency=2)
+        try:
+            return await service.collect_all()
+        finally:
+            await service.aclose()
+
+    assert len(asyncio.run(scenario())) == 8
+    assert active["max"] == 2
+
+def test_retries_transient_errors_with_backoff(tmp_path):
+    calls = {"Liberia": 0, "Cartago": 0}
+
+    async def handler(request):
+        city = request.url.params["q"].split(",")[0]
+        calls[city] += 1
+        if city == "Liberia" and calls[city] < 3:
+            return httpx.Response(503)
+        if city == "Cartago":
+            return httpx.Response(404)
+        return httpx.Response(200, json=_reading(city))
+
+    async def scenario():
+        service = _service(tmp_path, handler, cities=["Liberia", "Cartago"], retries=3)
+        try:
+            return await service.collect_all()
+        finally:
+            await service.aclose()
+
+    readings = asyncio.run(scenario())
+    assert list(readings) == ["Liberia"]
+    assert calls == {"Liberia": 3, "Cartago": 1}
+
+def test_token_bucket_limits_rate():
+    async def scenario():
+        bucket = TokenBucket(rate=20, capacity=2)
+        started = time.perf_counter()
+        for _ in range(6):
+            await bucket.acquire()
+        return time.perf_counter() - started
+
+    # 2 de ráfaga + 4 a 20/s ≈ 0.2s
+    assert 0.15 < asyncio.run(scenario()) < 0.5
+
+def test_sweep_is_saved_with_one_batch_post(tmp_path):
+    posts = []
+
+    async def handler(request):
+        if request.url.path == "/api/weather/readings":
+            posts.append(json.loads(request.content))
+            return httpx.Response(200, json={"ok": True, "inserted": 2})
+        city = request.url.params["q"].split(",")[0]
+        return httpx.Response(200, json=dict(_reading(city), dt=1772388000))
+
+    async def scenario():
+        service = _service(tmp_path, handler, cities=["Liberia", "Cartago"])
+        try:
+            return await service.update_weather()
+        finally:
+            await service.aclose()
+
+    assert list(asyncio.run(scenario())) == ["Liberia", "Cartago"]
+    assert len(posts) == 1
+    assert posts[0]["readings"][0] == {
+        "city": "Liberia", "temperature": 25.0, "description": "soleado",
+        "humidity": 70, "recorded_at": "2026-03-01T18:00:00+00:00",
+    }
@@ -0,0 +1,170 @@
+"""
+Archivo histórico del clima (solo-anexar, segmentado por día)
+
+- Un segmento JSON Lines por día UTC: weather-AAAAMMDD.jsonl
+- Índice de offsets por segmento (weather-AAAAMMDD.idx): una entrada
+  "ts offset" por lote anexado, para leer rangos de tiempo sin parsear
+  el segmento completo
+- Manifiesto (manifest.json) con tamaño y rango de cada segmento: la
+  retención por antigüedad o tamaño se decide sin listar el directorio
+- Al rotar, el segmento del día anterior se comprime con gzip
+"""
+
+import os
+import json
+import gzip
+import shutil
+import bisect
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+WEATHER_ARCHIVE_RETENTION_DAYS = int(os.getenv("WEATHER_ARCHIVE_RETENTION_DAYS", "30"))
+# 0 = sin límite de tamaño
+WEATHER_ARCHIVE_MAX_BYTES = int(os.getenv("WEATHER_ARCHIVE_MAX_BYTES", "0"))
+
+MANIFEST_FILE = "manifest.json"
+
+
+def _day(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y%m%d")
+
+
+class WeatherArchive:
+    def __init__(self, root, retention_days: int = WEATHER_ARCHIVE_RETENTION_DAYS,
+                 max_bytes: int = WEATHER_ARCHIVE_MAX_BYTES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.retention_days = retention_days
+        self.max_bytes = max_bytes
+        self.segments: Dict[str, Dict[str, Any]] = self._load_manifest()
+
+    # -- manifiesto -------------------------------------------------------
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        path = self.root / MANIFEST_FILE
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                return {seg["day"]: seg for seg in json.load(f)["segments"]}
+        # Primera vez (o manifiesto perdido): se reconstruye una sola vez
+        segments = {}
+        for file in sorted(self.root.glob("weather-*.jsonl*")):
+            day = file.name[len("weather-"):len("weather-") + 8]
+            segments[day] = {"day": day, "file": file.name, "bytes": file.stat().st_size,
+                             "compressed": file.suffix == ".gz"}
+        return segments
+
+    def _save_manifest(self):
+        path = self.root / MANIFEST_FILE
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"segments": [self.segments[d] for d in sorted(self.segments)]}, f)
+        os.replace(tmp, path)
+
+    def _active_day(self) -> Optional[str]:
+        open_days = [d for d, seg in self.segments.items() if not seg["compressed"]]
+        return max(open_days) if open_days else None
+
+    def total_bytes(self) -> int:
+        return sum(seg["bytes"] for seg in self.segments.values())
+
+    # -- escritura --------------------------------------------------------
+    def append(self, records: List[Dict[str, Any]], ts: Optional[float] = None) -> str:
+        """Anexa un lote de lecturas con la misma marca de tiempo ``ts``
+        (epoch UTC). Devuelve el segmento usado."""
+        ts = ts if ts is not None else datetime.now(timezone.utc).timestamp()
+        day = _day(ts)
+        active = self._active_day()
+        if active is not None and active < day:
+            self.rotate(day)
+        seg = self.segments.get(day)
+        if seg is None:
+            seg = self.segments[day] = {"day": day, "file": f"weather-{day}.jsonl", "bytes": 0,
+                                        "compressed": False}
+        elif seg["compressed"]:
+            raise ValueError(f"El segmento {day} ya está cerrado")
+
+        lines = "".join(
+            json.dumps({"ts": ts, **record}, ensure_ascii=False) + "\n" for record in records
+        ).encode("utf-8")
+        path = self.root / seg["file"]
+        with open(path, "ab") as f:
+            offset = f.tell()
+            f.write(lines)
+        with open(self.root / f"weather-{day}.idx", "a", encoding="utf-8") as f:
+            f.write(f"{ts} {offset}\n")
+        seg["bytes"] = offset + len(lines)
+        seg.setdefault("first_ts", ts)
+        seg["last_ts"] = ts
+        self._save_manifest()
+        return seg["file"]
+
+    def rotate(self, today: Optional[str] = None):
+        """Comprime los segmentos abiertos de días anteriores y aplica retención"""
+        today = today or _day(datetime.now(timezone.utc).timestamp())
+        for day, seg in sorted(self.segments.items()):
+            if seg["compressed"] or day >= today:
+                continue
+            plain = self.root / seg["file"]
+            packed = plain.with_name(plain.name + ".gz")
+            with open(plain, "rb") as src, gzip.open(packed, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            plain.unlink()
+            seg.update(file=packed.name, compressed=True, bytes=packed.stat().st_size)
+        self.apply_retention(today)
+        self._save_manifest()
+
+    def apply_retention(self, today: Optional[str] = None) -> List[str]:
+        """Elimina segmentos cerrados más viejos que la retención o que
+        excedan el tamaño máximo (los más antiguos primero)"""
+        today = today or _day(datetime.now(timezone.utc).timestamp())
+        cutoff = (datetime.strptime(today, "%Y%m%d") - timedelta(days=self.retention_days)).strftime("%Y%m%d")
+        removed = []
+        total = self.total_bytes()
+        for day in sorted(self.segments):
+            seg = self.segments[day]
+            if not seg["compressed"]:
+                continue
+            too_old = self.retention_days > 0 and day < cutoff
+            too_big = self.max_bytes > 0 and total > self.max_bytes
+            if not (too_old or too_big):
+                break
+            (self.root / seg["file"]).unlink(missing_ok=True)
+            (self.root / f"weather-{day}.idx").unlink(missing_ok=True)
+            total -= seg["bytes"]
+            del self.segments[day]
+            removed.append(day)
+        return removed
+
+    # -- lectura ----------------------------------------------------------
+    def _start_offset(self, day: str, start: float) -> Optional[int]:
+        """Offset del primer lote con ts >= ``start`` (None si no hay ninguno)"""
+        idx = self.root / f"weather-{day}.idx"
+        if not idx.exists():
+            return 0
+        stamps, offsets = [], []
+        with open(idx, encoding="utf-8") as f:
+            for line in f:
+                ts, offset = line.split()
+                stamps.append(float(ts))
+                offsets.append(int(offset))
+        pos = bisect.bisect_left(stamps, start)
+        return offsets[pos] if pos < len(offsets) else None
+
+    def read(self, start: float, end: float, city: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Lecturas con ``start <= ts <= end`` (epoch UTC), en orden"""
+        first, last = _day(start), _day(end)
+        for day in sorted(d for d in self.segments if first <= d <= last):
+            seg = self.segments[day]
+            offset = self._start_offset(day, start)
+            if offset is None:
+                continue
+            path = self.root / seg["file"]
+            opener = gzip.open if seg["compressed"] else open
+            with opener(path, "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    record = json.loads(line)
+                    if record["ts"] > end:
+                        return
+                    if record["ts"] >= start and (city is None or record.get("city") == city):
+                        yield record
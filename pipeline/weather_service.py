@@ -1,25 +1,95 @@
 """
 Weather Service para Hotel Costa Bella
-- Obtiene datos del clima cada hora
-- Guarda logs en backups/
-- Integración con API externa OpenWeatherMap
+- Obtiene datos del clima de varias ciudades cada hora, en paralelo
+- Guarda logs en backups/ y las lecturas en un archivo JSON Lines por día
+- Integración con API externa OpenWeatherMap (límite de concurrencia,
+  token bucket para la cuota y reintentos con backoff)
 """
 
 import asyncio
-import json
 import os
+import random
+import time
 import logging
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List
 import httpx
 from pathlib import Path
 
+from weather_archive import WeatherArchive
+
+OPENWEATHER_URL = "http://api.openweathermap.org/data/2.5/weather"
+
+# Mismas ciudades que CITY_MAPPING en backend/main.py (nombre → consulta API)
+CITY_MAPPING = {
+    "San José": "San Jose, CR",
+    "Alajuela": "Alajuela, CR",
+    "Cartago": "Cartago, CR",
+    "Heredia": "Heredia, CR",
+    "Liberia": "Liberia, CR",
+    "Puntarenas": "Puntarenas, CR",
+    "Puerto Limón": "Limon, CR"
+}
+
+# Lista de ciudades configurable: WEATHER_CITIES="San José,Liberia"
+WEATHER_CITIES = [c.strip() for c in os.getenv("WEATHER_CITIES", ",".join(CITY_MAPPING)).split(",") if c.strip()]
+# Sin valor, el límite es el número de ciudades: un barrido cabe en una sola
+# ronda y dura lo que la llamada más lenta
+WEATHER_MAX_CONCURRENCY = int(os.getenv("WEATHER_MAX_CONCURRENCY", "0")) or None
+# Plan gratuito de OpenWeatherMap: 60 llamadas por minuto
+WEATHER_RATE_PER_MINUTE = float(os.getenv("WEATHER_RATE_PER_MINUTE", "60"))
+WEATHER_RETRIES = int(os.getenv("WEATHER_RETRIES", "3"))
+WEATHER_BACKOFF = float(os.getenv("WEATHER_BACKOFF", "0.5"))
+WEATHER_UPDATE_INTERVAL = int(os.getenv("WEATHER_UPDATE_INTERVAL", "3600"))
+
+# Códigos que vale la pena reintentar (cuota excedida y errores del servidor)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """Limitador de tasa: ``rate`` fichas por segundo, ráfagas de hasta ``capacity``"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Espera hasta que haya una ficha disponible y la consume"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
 class WeatherService:
-    def __init__(self, api_key: str = "demo_key", base_url: str = "http://localhost:8000"):
+    def __init__(self, api_key: str = "demo_key", base_url: str = "http://localhost:8000",
+                 cities: Optional[List[str]] = None, max_concurrency: Optional[int] = WEATHER_MAX_CONCURRENCY,
+                 rate_per_minute: float = WEATHER_RATE_PER_MINUTE, retries: int = WEATHER_RETRIES,
+                 backoff: float = WEATHER_BACKOFF, backup_dir: str = "../pipeline/backups",
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
         self.api_key = api_key
         self.base_url = base_url
-        self.backup_dir = Path("../pipeline/backups")
+        self.cities = list(cities) if cities is not None else list(WEATHER_CITIES)
+        self.retries = retries
+        self.backoff = backoff
+        self.backup_dir = Path(backup_dir)
         self.backup_dir.mkdir(exist_ok=True)
+        self.archive = WeatherArchive(self.backup_dir / "weather_archive")
+        
+        # Un solo cliente con pool de conexiones para todas las llamadas
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self.max_concurrency = max_concurrency or max(1, len(self.cities))
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        # Ráfaga de un barrido completo sin pasarse de la cuota por minuto
+        burst = min(rate_per_minute, max(len(self.cities), self.max_concurrency))
+        self._bucket = TokenBucket(rate_per_minute / 60.0, capacity=burst)
         
         # Configurar logging
         self.setup_logging()
@@ -38,151 +108,179 @@ class WeatherService:
         )
         self.logger = logging.getLogger('WeatherService')
         
-    async def get_weather_data(self, city: str = "San José, CR") -> Optional[Dict[str, Any]]:
-        """Obtener datos del clima desde OpenWeatherMap"""
-        try:
-            # URL de la API de OpenWeatherMap (demo)
-            # En producción, usar una clave real de https://openweathermap.org/api
-            url = "http://api.openweathermap.org/data/2.5/weather"
-            
-            params = {
-                "q": city,
-                "appid": self.api_key,
-                "units": "metric",
-                "lang": "es"
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=10.0,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                transport=self.transport,
+            )
+        return self._client
+    
+    async def aclose(self):
+        """Cerrar el cliente HTTP compartido"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def _retry_delay(self, attempt: int) -> float:
+        """Backoff exponencial con jitter"""
+        return self.backoff * (2 ** attempt) * (0.5 + random.random() / 2)
+    
+    async def get_weather_data(self, city: str = "San José") -> Optional[Dict[str, Any]]:
+        """Obtener datos del clima de una ciudad desde OpenWeatherMap"""
+        if self.api_key == "demo_key":
+            # Simular datos para demo
+            self.logger.info(f"🌡️ Usando datos de clima simulados (demo): {city}")
+            return {
+                "name": city,
+                "main": {
+                    "temp": 24.5,
+                    "humidity": 78,
+                    "feels_like": 26.2
+                },
+                "weather": [
+                    {
+                        "description": "parcialmente nublado",
+                        "main": "Clouds"
+                    }
+                ],
+                "wind": {
+                    "speed": 3.2
+                }
             }
+        
+        # En producción, usar una clave real de https://openweathermap.org/api
+        params = {
+            "q": CITY_MAPPING.get(city, f"{city}, CR"),
+            "appid": self.api_key,
+            "units": "metric",
+            "lang": "es"
+        }
+        client = self._get_client()
+        for attempt in range(self.retries + 1):
+            try:
+                await self._bucket.acquire()
+                async with self._semaphore:
+                    response = await client.get(OPENWEATHER_URL, params=params)
+                if response.status_code == 200:
+                    data = response.json()
+                    # Conservar el nombre con el que se pidió la ciudad
+                    data["name"] = city
+                    return data
+                if response.status_code not in RETRYABLE_STATUS:
+                    self.logger.error(f"❌ Error API OpenWeatherMap ({city}): {response.status_code}")
+                    return None
+                error = f"HTTP {response.status_code}"
+                retry_after = response.headers.get("Retry-After")
+            except httpx.TransportError as e:
+                error = repr(e)
+                retry_after = None
+            except Exception as e:
+                self.logger.error(f"❌ Error obteniendo datos del clima ({city}): {e}")
+                return None
             
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                if self.api_key == "demo_key":
-                    # Simular datos para demo
-                    self.logger.info("🌡️ Usando datos de clima simulados (demo)")
-                    return {
-                        "name": "San José",
-                        "main": {
-                            "temp": 24.5,
-                            "humidity": 78,
-                            "feels_like": 26.2
-                        },
-                        "weather": [
-                            {
-                                "description": "parcialmente nublado",
-                                "main": "Clouds"
-                            }
-                        ],
-                        "wind": {
-                            "speed": 3.2
-                        }
-                    }
-                else:
-                    # Llamada real a la API
-                    response = await client.get(url, params=params)
-                    if response.status_code == 200:
-                        return response.json()
-                    else:
-                        self.logger.error(f"❌ Error API OpenWeatherMap: {response.status_code}")
-                        return None
-                        
-        except Exception as e:
-            self.logger.error(f"❌ Error obteniendo datos del clima: {e}")
-            return None
+            if attempt < self.retries:
+                delay = float(retry_after) if retry_after and retry_after.isdigit() else self._retry_delay(attempt)
+                self.logger.warning(f"⚠️ {city}: {error}, reintento {attempt + 1}/{self.retries} en {delay:.1f}s")
+                await asyncio.sleep(delay)
+        
+        self.logger.error(f"❌ {city}: sin datos tras {self.retries + 1} intentos ({error})")
+        return None
     
-    async def save_to_backend(self, weather_data: Dict[str, Any]) -> bool:
-        """Guardar datos del clima en el backend"""
+    async def collect_all(self) -> Dict[str, Dict[str, Any]]:
+        """Consultar todas las ciudades en paralelo; omite las que fallan
+
+        Con ``max_concurrency`` >= número de ciudades el barrido dura lo que la
+        llamada más lenta; con un límite menor hay ceil(ciudades / límite) rondas.
+        """
+        results = await asyncio.gather(*(self.get_weather_data(city) for city in self.cities))
+        return {city: data for city, data in zip(self.cities, results) if data}
+    
+    @staticmethod
+    def to_reading(weather_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Lectura en el formato de POST /api/weather/readings"""
+        measured = weather_data.get("dt")
+        recorded_at = datetime.fromtimestamp(measured, timezone.utc) if measured else datetime.now(timezone.utc)
+        return {
+            "city": weather_data["name"],
+            "temperature": weather_data["main"]["temp"],
+            "description": weather_data["weather"][0]["description"],
+            "humidity": weather_data["main"]["humidity"],
+            "recorded_at": recorded_at.isoformat(),
+        }
+    
+    async def save_to_backend(self, readings: List[Dict[str, Any]]) -> bool:
+        """Guardar un barrido completo en el backend (un solo POST, una transacción)"""
         try:
-            url = f"{self.base_url}/api/weather/{weather_data['name']}"
+            url = f"{self.base_url}/api/weather/readings"
+            payload = {"readings": [self.to_reading(data) for data in readings]}
             
-            payload = {
-                "city": weather_data["name"],
-                "temperature": weather_data["main"]["temp"],
-                "description": weather_data["weather"][0]["description"],
-                "humidity": weather_data["main"]["humidity"]
-            }
+            response = await self._get_client().post(url, json=payload)
             
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(url)  # Endpoint ya maneja el guardado
-                
-                if response.status_code == 200:
-                    self.logger.info(f"✅ Datos del clima guardados: {payload}")
-                    return True
-                else:
-                    self.logger.error(f"❌ Error guardando en backend: {response.status_code}")
-                    return False
+            if response.status_code == 200:
+                self.logger.info(f"✅ Datos del clima guardados: {len(payload['readings'])} lecturas")
+                return True
+            else:
+                self.logger.error(f"❌ Error guardando en backend: {response.status_code} {response.text[:200]}")
+                return False
                     
         except Exception as e:
             self.logger.error(f"❌ Error conectando con backend: {e}")
             return False
     
-    def save_backup(self, weather_data: Dict[str, Any]):
-        """Guardar backup local de los datos del clima"""
+    def save_backup(self, readings: Dict[str, Dict[str, Any]]):
+        """Anexar el barrido al archivo histórico (JSON Lines por día)"""
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_file = self.backup_dir / f"weather_backup_{timestamp}.json"
-            
-            backup_data = {
-                "timestamp": datetime.now().isoformat(),
-                "weather_data": weather_data,
-                "source": "OpenWeatherMap API",
-                "city": weather_data.get("name", "Unknown")
-            }
-            
-            with open(backup_file, 'w', encoding='utf-8') as f:
-                json.dump(backup_data, f, indent=2, ensure_ascii=False)
-            
-            self.logger.info(f"💾 Backup guardado: {backup_file}")
-            
-            # Limpiar backups antiguos (mantener solo últimos 48)
-            self.cleanup_old_backups()
-            
+            records = [
+                {"city": city, "source": "OpenWeatherMap API", "weather_data": data}
+                for city, data in readings.items()
+            ]
+            segment = self.archive.append(records)
+            self.logger.info(f"💾 Backup guardado: {segment} ({len(records)} lecturas)")
         except Exception as e:
             self.logger.error(f"❌ Error guardando backup: {e}")
     
-    def cleanup_old_backups(self):
-        """Limpiar backups antiguos (mantener solo últimos 48 = 2 días)"""
-        try:
-            weather_files = list(self.backup_dir.glob("weather_backup_*.json"))
-            weather_files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
-            
-            # Mantener solo los últimos 48 archivos
-            for old_file in weather_files[48:]:
-                old_file.unlink()
-                self.logger.info(f"🗑️ Backup antiguo eliminado: {old_file.name}")
-                
-        except Exception as e:
-            self.logger.error(f"❌ Error limpiando backups: {e}")
-    
     async def update_weather(self):
-        """Actualización completa del clima"""
-        self.logger.info("🔄 Iniciando actualización del clima...")
+        """Actualización completa del clima (todas las ciudades)"""
+        self.logger.info(f"🔄 Iniciando actualización del clima ({len(self.cities)} ciudades)...")
+        started = time.perf_counter()
         
-        # Obtener datos del clima
-        weather_data = await self.get_weather_data()
+        # Obtener datos del clima en paralelo
+        readings = await self.collect_all()
+        elapsed = time.perf_counter() - started
         
-        if weather_data:
+        if readings:
             # Guardar backup local
-            self.save_backup(weather_data)
+            self.save_backup(readings)
             
             # Intentar guardar en backend
-            success = await self.save_to_backend(weather_data)
+            success = await self.save_to_backend(list(readings.values()))
             
             if success:
-                self.logger.info("✅ Actualización del clima completada exitosamente")
+                self.logger.info(f"✅ Actualización del clima completada: {len(readings)} ciudades en {elapsed:.2f}s")
             else:
                 self.logger.warning("⚠️ Clima obtenido pero no se pudo guardar en backend")
         else:
             self.logger.error("❌ No se pudieron obtener datos del clima")
+        
+        missing = [city for city in self.cities if city not in readings]
+        if missing:
+            self.logger.warning(f"⚠️ Ciudades sin datos: {', '.join(missing)}")
+        return readings
     
     async def start_hourly_updates(self):
         """Iniciar actualizaciones automáticas cada hora"""
-        self.logger.info("🚀 Iniciando servicio de clima automático (cada hora)")
+        self.logger.info(f"🚀 Iniciando servicio de clima automático (cada {WEATHER_UPDATE_INTERVAL}s)")
         
         while True:
             try:
                 # Actualizar clima
                 await self.update_weather()
                 
-                # Esperar 1 hora (3600 segundos)
-                self.logger.info("⏰ Próxima actualización en 1 hora...")
-                await asyncio.sleep(3600)
+                # Esperar hasta el próximo barrido (1 hora por defecto)
+                self.logger.info(f"⏰ Próxima actualización en {WEATHER_UPDATE_INTERVAL}s...")
+                await asyncio.sleep(WEATHER_UPDATE_INTERVAL)
                 
             except Exception as e:
                 self.logger.error(f"❌ Error en ciclo automático: {e}")
@@ -196,11 +294,14 @@ async def main():
     
     weather_service = WeatherService(api_key=api_key)
     
-    # Hacer una actualización inmediata
-    await weather_service.update_weather()
-    
-    # Iniciar actualizaciones automáticas
-    await weather_service.start_hourly_updates()
+    try:
+        # Hacer una actualización inmediata
+        await weather_service.update_weather()
+        
+        # Iniciar actualizaciones automáticas
+        await weather_service.start_hourly_updates()
+    finally:
+        await weather_service.aclose()
 
 if __name__ == "__main__":
     print("🌤️ Servicio de Clima - Hotel Costa Bella")